@@ -0,0 +1,339 @@
+# accuracy.py
+# 목표주가 적중 분석 - 애널리스트 / 증권사 리더보드
+#
+# 리포트마다 작성일부터 HORIZON_DAYS 동안의 일봉(price_history)으로 아래 지표를 계산해 report_accuracy에 저장하고,
+# 애널리스트 / 증권사별로 묶어 리더보드를 만듭니다. 계산은 리포트 묶음 단위 NumPy 배열 연산 (리포트별 루프 없음).
+#   - hit              기간 안에 목표주가 도달 (목표가 ≥ 기준가면 고가 ≥ 목표가, 아니면 저가 ≤ 목표가)
+#   - days_to_target   작성일 → 처음 도달한 날 (일)
+#   - mfe / mae        목표 방향으로 가장 유리했던 / 불리했던 수익률 (%)
+#   - horizon_return   기간 마지막(기간이 안 끝났으면 최신) 종가 수익률 (%)
+#   - rating_return    horizon_return × 투자의견 방향 (Buy +1 / Sell -1, 그 외는 빈 값)
+# 기간이 끝난 리포트(resolved)는 값이 더 바뀌지 않으므로, 새 일봉이 들어오면 새 리포트와 기간이 남은 리포트만 다시 계산.
+#
+#   python accuracy.py refresh [--full]              # 새 리포트 / 기간이 안 끝난 리포트만 (--full: 전부) 다시 계산
+#   python accuracy.py board broker --sort hit_rate  # 리더보드 출력
+import argparse
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from db import (
+    engine, read_engine, init_db, read_array, bump_data_version, get_data_version, ReportAccuracy, BULK_CHUNK_SIZE,
+)
+from price_history import load_price_table
+
+HORIZON_DAYS = 365        # 목표주가 평가 기간 (국내 리포트의 목표가는 보통 12개월 기준)
+EVAL_CHUNK_SIZE = 8192    # 한 번에 계산하는 리포트 수 (리포트 × 기간 일봉 2차원 배열 크기 제한)
+MIN_DECIDED = 5           # 리더보드에 올리는 최소 판정 리포트 수 (적중했거나 기간이 끝난 리포트)
+LEADERBOARD_LIMIT = 20
+MAX_ENTRY_GAP_DAYS = 10   # 작성일 → 기준 일봉 최대 간격 (일). 더 멀면 그 사이 일봉이 빠진 것 → 계산 보류 (연휴 포함 여유)
+ACCURACY_VERSION_KEY = "accuracy_version"
+RATING_SIGN = {"Buy": 1.0, "Sell": -1.0}
+
+_KEY_STRIDE = 1 << 20     # (종목 순번, 날짜) → 정수 키. 날짜(1970-01-01부터 일수)가 이 값보다 작으면 충분
+
+_REPORT_DTYPE = np.dtype([
+    ("report_id", np.int64), ("stock_code", "U20"), ("written_date", "datetime64[D]"),
+    ("fair_price", np.float64), ("rating_code", "U10"),
+])
+_REPORTS_SQL = """
+    SELECT r.id, s.stock_code, r.written_date, r.fair_price, r.rating_code
+    FROM reports r
+    JOIN stocks s ON s.id = r.stock_id
+    LEFT JOIN report_accuracy a ON a.report_id = r.id
+    WHERE r.fair_price > 0
+"""
+_METRIC_COLUMNS = ("direction", "hit", "days_to_target", "mfe", "mae", "horizon_return", "rating_return")
+
+
+# ============================
+# 지표 계산 (NumPy)
+# ============================
+
+def _excursions(e, n, ep, tgt, up, wday, day, high, low):
+    """
+    리포트 묶음의 기간 일봉(기준 일봉 다음부터 n개)을 (리포트 × 최대 일봉 수) 2차원으로 모아 한 번에 계산.
+    반환값: hit, days_to_target, mfe, mae (수익률은 비율)
+    """
+    width = int(n.max()) if len(n) else 0
+    if width == 0:
+        nan = np.full(len(e), np.nan)
+        return np.zeros(len(e), dtype=bool), nan, nan, nan.copy()
+
+    j = np.arange(width)
+    mask = j < n[:, None]
+    idx = np.where(mask, e[:, None] + 1 + j, 0)
+    hi = high[idx] / ep[:, None] - 1
+    lo = low[idx] / ep[:, None] - 1
+    up2 = up[:, None]
+
+    favorable = np.where(mask, np.where(up2, hi, -lo), -np.inf).max(axis=1)
+    adverse = np.where(mask, np.where(up2, lo, -hi), np.inf).min(axis=1)
+    reached = mask & np.where(up2, high[idx] >= tgt[:, None], low[idx] <= tgt[:, None])
+    hit = reached.any(axis=1)
+    first = idx[np.arange(len(e)), reached.argmax(axis=1)]
+    days_to_target = np.where(hit, day[first] - wday, np.nan)
+
+    has_bars = n > 0
+    return (hit, days_to_target,
+            np.where(has_bars, favorable, np.nan), np.where(has_bars, adverse, np.nan))
+
+
+def evaluate(reports: np.ndarray, codes: np.ndarray, offsets: np.ndarray, bars,
+             horizon_days: int = HORIZON_DAYS, chunk_size: int = EVAL_CHUNK_SIZE,
+             max_entry_gap: int = MAX_ENTRY_GAP_DAYS) -> dict[str, np.ndarray]:
+    """
+    reports(_REPORT_DTYPE 구조화 배열)의 지표를 계산합니다. codes / offsets / bars는 price_history.load_price_table 결과.
+    반환값: 리포트 순서대로의 열 배열 {"evaluable", "missing_history", "entry_date", "entry_price", "resolved",
+    *_METRIC_COLUMNS}
+    evaluable=False: 작성일 이후 일봉이 아직 없거나, 첫 일봉이 작성일보다 max_entry_gap일 넘게 뒤인 리포트
+    (missing_history=True, 저장된 일봉이 작성일 뒤부터 시작하는 경우) - 나머지 값은 의미 없음
+    """
+    count = len(reports)
+    day = bars.dates.astype(np.int64)
+    close = bars.close
+    high = np.where(np.isnan(bars.high), close, bars.high)
+    low = np.where(np.isnan(bars.low), close, bars.low)
+
+    # 종목 순번 × stride + 날짜 → 전체 일봉이 정렬된 키 하나. 기준 일봉 / 기간 끝은 searchsorted 한 번씩
+    key = np.repeat(np.arange(len(codes), dtype=np.int64), np.diff(offsets)) * _KEY_STRIDE + day
+    pos = np.minimum(np.searchsorted(codes, reports["stock_code"]), max(len(codes) - 1, 0))
+    known = (codes[pos] == reports["stock_code"]) if len(codes) else np.zeros(count, dtype=bool)
+    wday = reports["written_date"].astype(np.int64)
+    base = pos * _KEY_STRIDE + wday
+    entry = np.searchsorted(key, base, side="left")              # 작성일 이후 첫 일봉
+    end = np.searchsorted(key, base + horizon_days, side="right")  # 기간 마지막 일봉 다음
+    stock_end = offsets[pos + 1] if len(codes) else np.zeros(count, dtype=np.int64)
+    has_entry = known & (entry < stock_end)
+    entry_day = day[np.minimum(entry, len(day) - 1)] if len(day) else np.zeros(count, dtype=np.int64)
+    missing_history = has_entry & (entry_day - wday > max_entry_gap)
+    evaluable = has_entry & ~missing_history
+
+    result = {
+        "evaluable": evaluable,
+        "missing_history": missing_history,
+        "entry_date": np.full(count, np.datetime64("NaT"), dtype="datetime64[D]"),
+        "entry_price": np.full(count, np.nan),
+        "resolved": np.zeros(count, dtype=bool),
+        **{column: np.full(count, np.nan) for column in _METRIC_COLUMNS},
+    }
+    rows = np.flatnonzero(evaluable)
+    for start in range(0, len(rows), chunk_size):
+        r = rows[start:start + chunk_size]
+        e, w, wd = entry[r], end[r], wday[r]
+        ep = close[e]
+        tgt = reports["fair_price"][r]
+        up = tgt >= ep
+        n = w - e - 1  # 기준 일봉 다음부터 기간 끝까지의 일봉 수
+
+        hit, days_to_target, mfe, mae = _excursions(e, n, ep, tgt, up, wd, day, high, low)
+        horizon_return = np.where(n > 0, close[np.maximum(w - 1, 0)] / ep - 1, np.nan)
+        rating = reports["rating_code"][r]
+        rating_sign = np.select([rating == code for code in RATING_SIGN], list(RATING_SIGN.values()), np.nan)
+
+        result["entry_date"][r] = bars.dates[e]
+        result["entry_price"][r] = ep
+        result["resolved"][r] = day[stock_end[r] - 1] >= wd + horizon_days
+        result["direction"][r] = np.where(up, 1, -1)
+        result["hit"][r] = hit
+        result["days_to_target"][r] = days_to_target
+        result["mfe"][r] = mfe * 100
+        result["mae"][r] = mae * 100
+        result["horizon_return"][r] = horizon_return * 100
+        result["rating_return"][r] = rating_sign * horizon_return * 100
+    return result
+
+
+# ============================
+# report_accuracy 갱신 (증분)
+# ============================
+
+def _none_if_nan(values: np.ndarray, digits: int | None = None) -> list:
+    if digits is not None:
+        values = np.round(values, digits)
+    return [None if v != v else v for v in values.tolist()]
+
+
+def refresh_report_accuracy(full: bool = False, horizon_days: int = HORIZON_DAYS) -> dict[str, int]:
+    """
+    새 리포트와 기간이 끝나지 않은 리포트의 지표를 다시 계산해 report_accuracy에 반영합니다 (full=True면 전부).
+    필요한 종목의 일봉을 가장 오래된 대상 리포트 작성일부터 한 번에 읽어 계산.
+    계산할 수 없게 된 리포트(기준 일봉이 작성일보다 너무 뒤)의 이전 값은 지움 → 리더보드에 섞이지 않음.
+    반환값: {"evaluated", "resolved", "pending", "missing_history"}
+    (pending: 계산 보류 리포트, 그중 missing_history: 작성일 무렵 일봉이 저장되지 않은 리포트 - 다음 주가 갱신에서 채움)
+    """
+    sql = _REPORTS_SQL if full else _REPORTS_SQL + " AND (a.resolved IS NULL OR a.resolved = 0)"
+    reports = read_array(sql, {}, _REPORT_DTYPE)
+    if len(reports) == 0:
+        return {"evaluated": 0, "resolved": 0, "pending": 0, "missing_history": 0}
+
+    first_written = reports["written_date"].min().item()
+    codes, offsets, bars = load_price_table(np.unique(reports["stock_code"]).tolist(), start=first_written)
+    metrics = evaluate(reports, codes, offsets, bars, horizon_days)
+
+    ok = metrics["evaluable"]
+    columns = {
+        "report_id": reports["report_id"][ok].tolist(),
+        "entry_date": metrics["entry_date"][ok].astype(object).tolist(),
+        "entry_price": metrics["entry_price"][ok].tolist(),
+        "direction": metrics["direction"][ok].astype(np.int64).tolist(),
+        "hit": metrics["hit"][ok].astype(np.int64).tolist(),
+        "days_to_target": [None if v != v else int(v) for v in metrics["days_to_target"][ok].tolist()],
+        "mfe": _none_if_nan(metrics["mfe"][ok], 2),
+        "mae": _none_if_nan(metrics["mae"][ok], 2),
+        "horizon_return": _none_if_nan(metrics["horizon_return"][ok], 2),
+        "rating_return": _none_if_nan(metrics["rating_return"][ok], 2),
+        "resolved": metrics["resolved"][ok].astype(np.int64).tolist(),
+    }
+    rows = [dict(zip(columns, values)) for values in zip(*columns.values())]
+
+    stmt = sqlite_insert(ReportAccuracy.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["report_id"],
+        set_={column: stmt.excluded[column] for column in columns if column != "report_id"},
+    )
+    with engine.begin() as conn:
+        if full:
+            conn.execute(text("DELETE FROM report_accuracy"))
+        elif (~ok).any():
+            conn.execute(text("DELETE FROM report_accuracy WHERE report_id = :report_id"),
+                         [{"report_id": report_id} for report_id in reports["report_id"][~ok].tolist()])
+        for i in range(0, len(rows), BULK_CHUNK_SIZE):
+            conn.execute(stmt, rows[i:i + BULK_CHUNK_SIZE])
+        bump_data_version(conn, ACCURACY_VERSION_KEY)
+
+    return {
+        "evaluated": len(rows),
+        "resolved": int(metrics["resolved"][ok].sum()),
+        "pending": int((~ok).sum()),
+        "missing_history": int(metrics["missing_history"].sum()),
+    }
+
+
+# ============================
+# 리더보드 (애널리스트 / 증권사)
+# ============================
+
+BOARD_KINDS = {"broker": ("broker_id", "brokers"), "author": ("author_id", "authors")}
+# 정렬 기준 → 오름차순 여부 (mae는 덜 불리할수록, days_to_target은 빠를수록 위)
+BOARD_SORTS = {
+    "hit_rate": False,
+    "rating_return": False,
+    "mfe": False,
+    "mae": False,
+    "days_to_target": True,
+    "decided": False,
+}
+
+_ACCURACY_DTYPE = np.dtype([
+    ("author_id", np.float64), ("broker_id", np.float64), ("hit", np.float64), ("resolved", np.float64),
+    ("days_to_target", np.float64), ("mfe", np.float64), ("mae", np.float64), ("rating_return", np.float64),
+])
+
+
+def _aggregate(df: pd.DataFrame, key: str, names: dict[int, str]) -> pd.DataFrame:
+    """
+    그룹별 집계. 적중률 = 적중 / 판정(적중했거나 기간이 끝난 리포트),
+    mfe / mae / rating_return 평균은 기간이 끝난 리포트만 (진행 중인 값은 섞지 않음), 도달 일수는 적중한 리포트만.
+    """
+    grouped = df[df[key].notna()].groupby(key)
+    table = grouped.agg(
+        reports=("hit", "size"),
+        decided=("decided", "sum"),
+        hits=("hit", "sum"),
+        days_to_target=("days_to_target", "mean"),
+        mfe=("final_mfe", "mean"),
+        mae=("final_mae", "mean"),
+        rating_return=("final_rating_return", "mean"),
+    )
+    table["hits"] = table["hits"].astype(np.int64)
+    table["hit_rate"] = np.where(table["decided"] > 0, table["hits"] * 100 / table["decided"].clip(lower=1), np.nan)
+    table.index = table.index.astype(np.int64)
+    table.insert(0, "name", table.index.map(names))
+    table.index.name = "id"
+    return table.reset_index()
+
+
+def build_leaderboards() -> dict[str, pd.DataFrame]:
+    """report_accuracy 전체를 읽어 {"broker": 집계표, "author": 집계표}"""
+    acc = read_array("""
+        SELECT r.author_id, r.broker_id, a.hit, a.resolved, a.days_to_target, a.mfe, a.mae, a.rating_return
+        FROM report_accuracy a JOIN reports r ON r.id = a.report_id
+    """, {}, _ACCURACY_DTYPE)
+    df = pd.DataFrame(acc)
+    resolved = df["resolved"] == 1
+    df["decided"] = (df["hit"] == 1) | resolved
+    for column in ("mfe", "mae", "rating_return"):
+        df[f"final_{column}"] = df[column].where(resolved)
+
+    tables = {}
+    for kind, (key, name_table) in BOARD_KINDS.items():
+        with read_engine.connect() as conn:
+            names = dict(conn.execute(text(f"SELECT id, name FROM {name_table}")).all())
+        tables[kind] = _aggregate(df, key, names)
+    return tables
+
+
+class Leaderboards:
+    """
+    집계표 캐시. accuracy_version(report_accuracy가 바뀔 때 증가)이 그대로면 메모리의 표에서 거르고 정렬만 하고,
+    바뀌었을 때만 report_accuracy 전체를 다시 읽어 groupby 합니다.
+    """
+
+    def __init__(self):
+        self._version: int | None = None
+        self._tables: dict[str, pd.DataFrame] = {}
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+
+    def tables(self) -> dict[str, pd.DataFrame]:
+        version = get_data_version(ACCURACY_VERSION_KEY)
+        with self._lock:
+            if version != self._version:
+                self._tables = build_leaderboards()
+                self._version = version
+                self.rebuilds += 1
+            return self._tables
+
+    def top(self, kind: str, sort: str = "hit_rate", min_decided: int = MIN_DECIDED,
+            limit: int = LEADERBOARD_LIMIT) -> list[dict]:
+        if kind not in BOARD_KINDS or sort not in BOARD_SORTS:
+            raise ValueError(f"지원하지 않는 리더보드: {kind} / {sort}")
+        table = self.tables()[kind]
+        table = table[table["decided"] >= min_decided]
+        table = table.sort_values([sort, "decided"], ascending=[BOARD_SORTS[sort], False], na_position="last")
+        table = table.head(limit).round(2).astype(object)
+        return table.where(table.notna(), None).to_dict("records")
+
+
+leaderboards = Leaderboards()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="목표주가 적중 분석")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("refresh", help="report_accuracy 갱신")
+    p.add_argument("--full", action="store_true", help="기간이 끝난 리포트까지 전부 다시 계산")
+    p = sub.add_parser("board", help="리더보드 출력")
+    p.add_argument("kind", choices=list(BOARD_KINDS))
+    p.add_argument("--sort", choices=list(BOARD_SORTS), default="hit_rate")
+    p.add_argument("--min-decided", type=int, default=MIN_DECIDED)
+    p.add_argument("--limit", type=int, default=LEADERBOARD_LIMIT)
+    args = parser.parse_args()
+
+    init_db()
+    if args.command == "refresh":
+        t0 = time.perf_counter()
+        stats = refresh_report_accuracy(full=args.full)
+        print(f"{stats} ({time.perf_counter() - t0:.2f}s)")
+    elif args.command == "board":
+        for row in leaderboards.top(args.kind, args.sort, args.min_decided, args.limit):
+            print(row)
+
+
+if __name__ == "__main__":
+    main()
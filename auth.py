@@ -0,0 +1,174 @@
+# auth.py
+# 비밀번호 해시 (프로세스 풀) / 서명된 세션 토큰
+#
+# pbkdf2는 일부러 느리게 만든 해시라(요청당 수십 ms의 CPU) 요청 처리 스레드에서 돌리면 그동안 다른 요청이 밀립니다.
+# 해시 계산/검증은 별도 프로세스 풀에서 하고, 로그인 뒤에는 HMAC 서명 토큰으로 사용자를 확인합니다
+# (토큰 검증은 DB 조회 없이 서명 비교 한 번).
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import multiprocessing
+import os
+import secrets
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from passlib.context import CryptContext
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+SECRET_PATH = os.path.join(BASE_DIR, ".session_secret")
+HASH_WORKERS = os.cpu_count() or 1
+SESSION_TTL = 7 * 24 * 60 * 60   # 세션 토큰 유효기간 (초)
+SESSION_COOKIE = "session"
+
+
+# ============================
+# 비밀번호 해시 (pbkdf2_sha256)
+# ============================
+pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+
+
+def hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def verify_password(password: str, password_hash: str) -> bool:
+    return pwd_context.verify(password, password_hash)
+
+
+# ============================
+# 해시 전용 프로세스 풀
+# ============================
+# fork는 서버의 스레드(DB 풀, 이벤트 루프) 상태까지 복사하므로 spawn으로 새 인터프리터를 띄운다.
+# 워커는 이 모듈만 import (passlib만 필요, DB 연결 없음).
+_hash_pool: ProcessPoolExecutor | None = None
+_pool_lock = threading.Lock()
+
+
+def _get_hash_pool() -> ProcessPoolExecutor:
+    global _hash_pool
+    with _pool_lock:
+        if _hash_pool is None:
+            _hash_pool = ProcessPoolExecutor(
+                max_workers=HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _hash_pool
+
+
+def _noop() -> None:
+    return None
+
+
+def start_hash_pool():
+    """워커 프로세스를 미리 띄움 (첫 로그인 요청이 프로세스 기동 시간을 기다리지 않도록)"""
+    pool = _get_hash_pool()
+    for future in [pool.submit(_noop) for _ in range(HASH_WORKERS)]:
+        future.result()
+
+
+def shutdown_hash_pool():
+    global _hash_pool
+    with _pool_lock:
+        pool, _hash_pool = _hash_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+async def _run_in_hash_pool(fn, *args):
+    pool = _get_hash_pool()
+    try:
+        return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+    except BrokenProcessPool:
+        # 워커가 죽으면 풀 전체가 못 쓰게 되므로 버리고, 다음 요청에서 새로 만든다
+        global _hash_pool
+        with _pool_lock:
+            if _hash_pool is pool:
+                _hash_pool = None
+        pool.shutdown(wait=False)
+        raise
+
+
+async def hash_password_async(password: str) -> str:
+    return await _run_in_hash_pool(hash_password, password)
+
+
+async def verify_password_async(password: str, password_hash: str) -> bool:
+    return await _run_in_hash_pool(verify_password, password, password_hash)
+
+
+# ============================
+# 세션 토큰 (HMAC-SHA256)
+# ============================
+# 형식: base64url(JSON {"uid", "email", "exp"}) + "." + base64url(HMAC-SHA256(비밀키, 앞부분))
+# 서버 여러 개(uvicorn --workers)가 같은 토큰을 받아들이도록 비밀키는 환경변수 SESSION_SECRET,
+# 없으면 BASE_DIR/.session_secret 파일(처음 한 번 생성)에서 읽는다.
+
+def _load_secret() -> bytes:
+    env_secret = os.environ.get("SESSION_SECRET")
+    if env_secret:
+        return env_secret.encode("utf-8")
+    try:
+        with open(SECRET_PATH, "rb") as f:
+            secret = f.read().strip()
+        if secret:
+            return secret
+    except FileNotFoundError:
+        pass
+
+    secret = secrets.token_hex(32).encode("ascii")
+    try:
+        # O_EXCL: 동시에 뜬 다른 워커가 먼저 만들었으면 그 키를 사용
+        fd = os.open(SECRET_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(SECRET_PATH, "rb") as f:
+            return f.read().strip()
+    except OSError as e:
+        print(f"⚠️ 세션 키 파일을 만들 수 없어 임시 키를 사용합니다 (재시작하면 로그인이 풀림): {e}")
+        return secret
+    with os.fdopen(fd, "wb") as f:
+        f.write(secret)
+    return secret
+
+
+_secret = _load_secret()
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(s: str) -> bytes:
+    return base64.urlsafe_b64decode(s + "=" * (-len(s) % 4))
+
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(_secret, payload.encode("ascii"), hashlib.sha256).digest())
+
+
+def issue_token(user_id: int, email: str, ttl: int = SESSION_TTL) -> str:
+    claims = {"uid": user_id, "email": email, "exp": int(time.time()) + ttl}
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    return f"{payload}.{_sign(payload)}"
+
+
+def verify_token(token: str) -> dict | None:
+    """
+    서명과 만료 시각을 확인하고 claims({"uid", "email", "exp"})를 돌려줍니다. 잘못된 토큰이면 None.
+    서명 비교는 hmac.compare_digest (일치하는 앞부분 길이에 따라 걸리는 시간이 달라지지 않음).
+    """
+    payload, sep, signature = token.partition(".")
+    if not sep or not payload.isascii() or not signature.isascii():
+        return None
+    if not hmac.compare_digest(_sign(payload), signature):
+        return None
+    try:
+        claims = json.loads(_b64decode(payload))
+    except ValueError:
+        return None
+    if not isinstance(claims, dict) or claims.get("exp", 0) < time.time():
+        return None
+    return claims
@@ -0,0 +1,985 @@
+# benchmark.py
+# 성능 측정용 스크립트 (임시 DB 파일에 대해 실행되므로 reports.db는 건드리지 않음)
+# 동작 확인(골든 비교 / 재시도 / 이어받기 등)은 tests/ 에 있음: python -m pytest tests
+#
+#   python benchmark.py save_reports            # 10k / 100k 행 적재 비교
+#   python benchmark.py save_reports --rows 5000
+#   python benchmark.py match_titles            # 제목 → 종목 매칭 10k건
+#   python benchmark.py statistic               # 100k 리포트에서 /statistic.html 지연시간 (뷰 vs 요약 테이블)
+#   python benchmark.py search                  # 100k 리포트에서 /api/search 지연시간 (FTS vs LIKE)
+#   python benchmark.py suggest                 # 종목 자동완성 (메모리 인덱스 vs LIKE)
+#   python benchmark.py download                # 로컬 서버에서 PDF 다운로드 처리량 (워커 수별) / 재실행
+#   python benchmark.py review                  # stub 백엔드로 리뷰 생성 단계 처리량 / 건너뛰기 쿼리 수
+#   python benchmark.py extract                 # PDF 텍스트 추출 (프로세스 수별) / 캐시 재실행
+#   python benchmark.py concurrency             # 일괄 적재 중 /data.html 읽기 지연시간 p99 (WAL / 읽기 풀)
+#   python benchmark.py load                    # 동시 클라이언트 수별 /data.html 처리량 (uvicorn 워커 1개)
+#   python benchmark.py login                   # 로그인 + 조회 혼합 트래픽 처리량 (요청 스레드 해시 vs 해시 프로세스 풀)
+#   python benchmark.py prices                  # 일봉 증분 수집 (처음 / 다시 / 다음 날) + NumPy 일괄 기간 조회
+#   python benchmark.py accuracy                # 100k 리포트 목표주가 적중 지표 (NumPy vs 루프) / 증분 갱신 / 리더보드 API
+#   python benchmark.py parse                   # 목록 페이지 파싱 시간 (BeautifulSoup vs lxml XPath)
+#   python benchmark.py crawl                   # 로컬 서버에서 목록 수집→적재 처리량 / 최대 메모리
+import argparse
+import os
+import random
+import signal
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+# db 모듈이 임시 DB를 바라보도록 import 전에 설정
+_tmp_dir = tempfile.mkdtemp(prefix="hci_bench_")
+os.environ["REPORTS_DB_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'bench.db')}"
+
+from sqlalchemy import event, text  # noqa: E402
+
+import db  # noqa: E402
+from db import (  # noqa: E402
+    SessionLocal, ReadSession, Stock, Broker, Author, Report, engine, read_engine, init_db,
+    normalize_str, normalize_rating,
+)
+from stock_matcher import StockMatcher  # noqa: E402
+from tests.helpers import (  # noqa: E402
+    BASE_DIR, FakeBarSource, FakePDFServer, StatementCounter, app_client, legacy_evaluate_report,
+    legacy_parse_list_page, list_page_html, make_rows, real_titles, reset_db, seed_pdfs,
+)
+
+
+# ============================
+# 기존 행 단위 적재 (비교 기준)
+# ============================
+
+def legacy_save_reports(reports_data: list[dict]):
+    session = SessionLocal()
+    stock_cache, broker_cache, author_cache = {}, {}, {}
+    try:
+        for row in reports_data:
+            written_date = row.get("written_date")
+            if isinstance(written_date, str):
+                written_date = date.fromisoformat(written_date)
+            stock_code = normalize_str(row.get("stock_code"))
+            broker_name = normalize_str(row.get("broker_name"))
+            author_name = normalize_str(row.get("author_name"))
+            attachment_url = normalize_str(row.get("attachment_url"))
+
+            if attachment_url and session.query(Report).filter_by(attachment_url=attachment_url).first():
+                continue
+
+            stock = stock_cache.get(stock_code)
+            if stock is None:
+                stock = session.query(Stock).filter_by(stock_code=stock_code).one_or_none()
+                if stock is None:
+                    stock = Stock(stock_code=stock_code, stock_name=row.get("stock_name") or "",
+                                  company_info_url=row.get("company_info_url"))
+                    session.add(stock)
+                    session.flush()
+                stock_cache[stock_code] = stock
+
+            broker = broker_cache.get(broker_name)
+            if broker_name and broker is None:
+                broker = session.query(Broker).filter_by(name=broker_name).one_or_none()
+                if broker is None:
+                    broker = Broker(name=broker_name)
+                    session.add(broker)
+                    session.flush()
+                broker_cache[broker_name] = broker
+
+            author = author_cache.get(author_name)
+            if author_name and author is None:
+                author = session.query(Author).filter_by(name=author_name).one_or_none()
+                if author is None:
+                    author = Author(name=author_name)
+                    session.add(author)
+                    session.flush()
+                author_cache[author_name] = author
+
+            session.add(Report(
+                written_date=written_date,
+                title=row.get("title") or "",
+                fair_price=row.get("fair_price"),
+                attachment_url=attachment_url,
+                stock_id=stock.id,
+                broker_id=broker.id if broker else None,
+                author_id=author.id if author else None,
+                rating_code=normalize_rating(row.get("rating_code")),
+            ))
+        session.commit()
+    finally:
+        session.close()
+
+
+# ============================
+# 벤치마크
+# ============================
+
+def _timed(fn, *args):
+    t0 = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - t0, result
+
+
+def bench_save_reports(sizes: list[int]):
+    init_db()
+    print(f"{'rows':>8} | {'legacy':>9} | {'bulk':>9} | {'bulk(재실행)':>11} | 결과")
+    for n in sizes:
+        rows = make_rows(n)
+
+        reset_db()
+        legacy_sec, _ = _timed(legacy_save_reports, rows)
+
+        reset_db()
+        bulk_sec, result = _timed(db.save_reports, rows)
+        rerun_sec, _ = _timed(db.save_reports, rows)  # 전부 중복으로 건너뜀
+
+        print(f"{n:>8} | {legacy_sec:>8.2f}s | {bulk_sec:>8.2f}s | {rerun_sec:>10.2f}s | {result}")
+
+
+def legacy_match(listing: list[tuple[str, str]], title: str):
+    # 기존 remove_noise_and_split_title의 전체 종목 순회 (마지막 매칭이 이김)
+    in_code, in_name = '', ''
+    for code, name in listing:
+        if code in title and name in title:
+            in_code, in_name = code, name
+    return (in_name, in_code) if in_name else None
+
+
+def bench_match_titles(n: int):
+    titles, listing = real_titles(n)
+    print(f"제목 {len(titles)}건 / 종목 {len(listing)}개")
+
+    legacy_sec, legacy = _timed(lambda: [legacy_match(listing, t) for t in titles])
+    build_sec, matcher = _timed(StockMatcher, listing)
+    match_sec, matched = _timed(lambda: [matcher.match(t) for t in titles])
+
+    diff = sum(1 for a, b in zip(legacy, matched) if a != b)
+    print(f"legacy  : {legacy_sec:.3f}s ({legacy_sec / len(titles) * 1e6:.1f}us/건)")
+    print(f"matcher : {match_sec:.3f}s ({match_sec / len(titles) * 1e6:.1f}us/건), 빌드 {build_sec * 1000:.1f}ms")
+    print(f"결과가 다른 제목: {diff}건 (여러 종목이 걸리는 경우 가장 긴 종목명을 선택)")
+
+
+# 예전 stock_summary 뷰 정의 (비교 기준)
+LEGACY_SUMMARY_VIEW = """
+    CREATE VIEW IF NOT EXISTS legacy_stock_summary AS
+    SELECT
+        s.stock_code AS stock_code,
+        s.stock_name AS stock_name,
+        (SELECT r2.current_price FROM reports r2 WHERE r2.stock_id = s.id
+         ORDER BY r2.written_date DESC, r2.id DESC LIMIT 1) AS current_price,
+        AVG(r.fair_price) AS avg_fair_price,
+        AVG(r.expected_return) AS avg_expected_return,
+        (SELECT r3.rating_code FROM reports r3 WHERE r3.stock_id = s.id
+         ORDER BY r3.written_date DESC, r3.id DESC LIMIT 1) AS main_rating
+    FROM stocks s
+    JOIN reports r ON r.stock_id = s.id
+    GROUP BY s.id, s.stock_code, s.stock_name
+    HAVING COUNT(r.id) >= 3
+"""
+
+
+def _latency_ms(fn, repeat: int) -> tuple[float, float]:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2], samples[-1]
+
+
+def bench_statistic(n: int, repeat: int):
+    init_db()
+    reset_db()
+    rows = make_rows(n)
+    # 기대수익률이 채워진 상태를 흉내내기 위해 임의 값 부여
+    rnd = random.Random(1)
+    for row in rows:
+        row["current_price"] = row["fair_price"] * rnd.uniform(0.6, 1.2) // 1
+        row["expected_return"] = round((row["fair_price"] - row["current_price"]) / row["current_price"] * 100, 2)
+    load_sec, _ = _timed(db.save_reports, rows)
+    rebuild_sec, _ = _timed(db.rebuild_stock_summary)
+
+    with engine.begin() as conn:
+        conn.execute(text(LEGACY_SUMMARY_VIEW))
+
+    def legacy_query():
+        with engine.connect() as conn:
+            conn.execute(text(
+                "SELECT * FROM legacy_stock_summary ORDER BY avg_expected_return DESC LIMIT 30"
+            )).all()
+
+    client = app_client()
+
+    def statistic_page():
+        assert client.get("/statistic.html").status_code == 200
+
+    # 증분 갱신: 새 리포트 100건 적재 (해당 종목만 다시 계산)
+    extra = make_rows(100, seed=7, start_idx=10_000_000)
+    incremental_sec, _ = _timed(db.save_reports, extra)
+
+    legacy_p50, legacy_max = _latency_ms(legacy_query, repeat)
+    page_p50, page_max = _latency_ms(statistic_page, repeat)
+    print(f"리포트 {n}건 적재 {load_sec:.2f}s, 요약 전체 재구성 {rebuild_sec * 1000:.0f}ms, "
+          f"100건 증분 적재(요약 포함) {incremental_sec * 1000:.0f}ms")
+    print(f"legacy 뷰 쿼리     : p50 {legacy_p50:8.1f}ms / max {legacy_max:8.1f}ms")
+    print(f"/statistic.html    : p50 {page_p50:8.1f}ms / max {page_max:8.1f}ms (템플릿 렌더링 포함)")
+
+
+SEARCH_WORDS = ["반도체", "실적", "성장", "수주", "회복", "로보틱스", "배터리", "바이오", "목표가", "상향",
+                "하향", "턴어라운드", "밸류에이션", "수출", "점유율", "신제품", "마진", "배당", "자사주", "인수"]
+
+
+def bench_search(n: int, repeat: int):
+    init_db()
+    reset_db()
+    rows = make_rows(n)
+    rnd = random.Random(3)
+    for row in rows:
+        words = rnd.sample(SEARCH_WORDS, 4)
+        row["title"] = f"{' '.join(words[:2])} {row['title']}"
+        row["summary"] = f"{row['stock_name']}의 {words[2]}과 {words[3]}에 주목. " * 5
+        row["expert_content"] = f"{words[3]} 관점에서 {words[0]} 모멘텀 지속 " * 8
+    load_sec, _ = _timed(db.save_reports, rows)
+    print(f"리포트 {n}건 적재(FTS 트리거 포함) {load_sec:.2f}s")
+
+    client = app_client()
+
+    def like_query(q):
+        with engine.connect() as conn:
+            conn.execute(text("""
+                SELECT r.id FROM reports r JOIN stocks s ON s.id = r.stock_id
+                WHERE r.title LIKE :q OR r.summary LIKE :q OR r.expert_content LIKE :q OR s.stock_name LIKE :q
+                ORDER BY r.written_date DESC LIMIT 20
+            """), {"q": f"%{q}%"}).all()
+
+    from query import search_reports
+
+    session = ReadSession()
+    try:
+        for q in ["로보틱스", "턴어라운드 배당", "종목1234", "애널리스트42", "종목", "배당 상향"]:
+            like_p50, _ = _latency_ms(lambda: like_query(q), repeat)
+            fts_p50, fts_max = _latency_ms(lambda: search_reports(session, q), repeat)
+            api_p50, _ = _latency_ms(lambda: client.get("/api/search", params={"q": q}), repeat)
+            body = client.get("/api/search", params={"q": q}).json()
+            print(f"{q:>14} | LIKE 스캔 p50 {like_p50:7.1f}ms | search_reports p50 {fts_p50:5.1f}ms "
+                  f"max {fts_max:5.1f}ms | /api/search(HTTP 포함) p50 {api_p50:5.1f}ms | {len(body['items'])}건"
+                  f"{' (최신 일부만)' if body['truncated'] else ''}")
+    finally:
+        session.close()
+
+
+SUGGEST_QUERIES = ["삼", "삼성", "ㅅㅅㅈ", "0059", "에코프로", "ㅋ", "lg", "현대차"]
+
+
+def bench_suggest(repeat: int):
+    from stock_suggest import StockSuggestIndex
+
+    init_db()
+    reset_db()
+    _, listing = real_titles(1)
+    # KRX 목록의 일부를 DB 종목(리포트가 있는 종목)으로 넣어둠
+    db.save_reports([
+        {**row, "stock_code": code, "stock_name": name}
+        for row, (code, name) in zip(make_rows(300), listing[::9])
+    ])
+
+    index = StockSuggestIndex()
+    build_sec, _ = _timed(index.build)
+    print(f"인덱스 빌드 {build_sec * 1000:.1f}ms, 종목 {len(index)}개")
+
+    def like_query(q):
+        with engine.connect() as conn:
+            conn.execute(text("SELECT stock_code, stock_name FROM stocks WHERE stock_name LIKE :q LIMIT 10"),
+                         {"q": f"{q}%"}).all()
+
+    for q in SUGGEST_QUERIES:
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            result = index.suggest(q)
+        suggest_us = (time.perf_counter() - t0) / repeat * 1e6
+        like_p50, _ = _latency_ms(lambda: like_query(q), repeat)
+        names = ", ".join(e.name for e in result[:3])
+        print(f"{q:>8} | suggest {suggest_us:7.1f}us | LIKE p50 {like_p50:6.2f}ms | {len(result)}건 ({names})")
+
+
+def bench_download(files: int, size: int, latency: float, workers_list: list[int], rate: float):
+    from get_pdf import download_pdfs
+
+    init_db()
+    server = FakePDFServer(size, latency)
+    urls = [server.url(700000 + i) for i in range(files)]
+    print(f"PDF {files}건 x {size // 1000}KB, 서버 지연 {latency * 1000:.0f}ms, 호스트당 {rate}/s 제한")
+
+    def run(pdf_dir, **kwargs):
+        t0 = time.perf_counter()
+        stats = download_pdfs(urls, pdf_dir, **kwargs)
+        return time.perf_counter() - t0, stats
+
+    # 워커 수별 처리량 (rate 한도 안쪽에서는 워커 수에 비례해야 함)
+    for workers in workers_list:
+        pdf_dir = tempfile.mkdtemp(dir=_tmp_dir)
+        sec, stats = run(pdf_dir, workers=workers, rate=rate)
+        print(f"==> workers {workers:>2}: {sec:6.2f}s, {files / sec:6.1f} files/s ({stats})")
+
+    # 재실행: report_pdfs 기준으로 전부 건너뜀 / 조건부 요청(304)으로 확인
+    before = server.requests
+    sec, stats = run(pdf_dir, workers=workers_list[-1], rate=rate)
+    print(f"==> 재실행: {sec * 1000:.0f}ms, 건너뜀 {stats['skipped']}건, 요청 {server.requests - before}건")
+    sec, stats = run(pdf_dir, workers=workers_list[-1], rate=rate, revalidate=True)
+    print(f"==> revalidate: {sec:.2f}s, 304 {stats['not_modified']}건")
+    server.httpd.shutdown()
+
+
+def bench_review(n: int, delay: float, workers_list: list[int]):
+    from get_review import StubReviewBackend, generate_reviews
+
+    init_db()
+    reset_db()
+    rows = make_rows(n)
+    db.save_reports(rows)
+    store = seed_pdfs(rows, _tmp_dir)
+    backend = StubReviewBackend(delay=delay)
+    print(f"리포트 {n}건 (PDF 10건 중 1건은 앞 리포트와 같은 내용), stub 응답 지연 {delay * 1000:.0f}ms")
+
+    for workers in workers_list:
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE reports SET summary = NULL, novice_content = NULL, expert_content = NULL"))
+        sec, stats = _timed(lambda: generate_reviews(backend=backend, workers=workers, rpm=100_000,
+                                                     tpm=10 ** 9, store=store))
+        print(f"==> workers {workers:>2}: {sec:6.2f}s, {n / sec:6.1f} reports/s "
+              f"(리뷰 {stats['reviewed']}건, 실패 {stats['failed']}건)")
+
+    # 이미 리뷰된 리포트 건너뛰기: 파일 수와 무관하게 청크당 쿼리 1회
+    counter = StatementCounter(read_engine)
+    report_idxs = [db.parse_report_idx(row["attachment_url"]) for row in rows]
+    statements = counter.measure(lambda: generate_reviews(report_idxs, backend=backend, store=store))
+    print(f"==> 리뷰된 {n}건 재실행: SQL {statements}문 (예전 check_review_exists: {n}문)")
+
+
+def bench_extract(n: int, workers_list: list[int]):
+    import pdf_text
+
+    init_db()
+    reset_db()
+    rows = make_rows(n)
+    db.save_reports(rows)
+    store = seed_pdfs(rows, _tmp_dir, duplicate_every=n + 1)
+    digests = pdf_text.stored_digests()
+    print(f"PDF {len(digests)}개, CPU {os.cpu_count()}개")
+
+    for workers in workers_list:
+        cache_dir = tempfile.mkdtemp(dir=_tmp_dir)
+        sec, stats = _timed(lambda: pdf_text.extract_texts(digests, store=store, cache_dir=cache_dir,
+                                                           workers=workers))
+        print(f"==> processes {workers:>2}: {sec:6.2f}s, {stats['extracted'] / sec:6.1f} files/s")
+
+    sec, _ = _timed(lambda: pdf_text.extract_texts(digests, store=store, cache_dir=cache_dir, workers=1))
+    load_sec, loaded = _timed(lambda: [pdf_text.load_text(d, cache_dir) for d in digests])
+    chunks = sum(len(t.chunks) for t in loaded)
+    cache_bytes = sum(os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(cache_dir) for f in files)
+    pdf_bytes = sum(os.path.getsize(store.path_for(d)) for d in digests)
+    print(f"==> 재실행(캐시) {sec * 1000:.0f}ms, 캐시 전체 로드 {load_sec * 1000:.0f}ms, 청크 {chunks}개, "
+          f"캐시 {cache_bytes / 1e3:.0f}KB (PDF {pdf_bytes / 1e3:.0f}KB)")
+
+
+class FakeListServer:
+    """
+    수집 벤치마크용 로컬 목록 페이지 서버. now_page=N 에 리포트 20건짜리 목록 HTML을,
+    pages를 넘는 페이지에는 빈 목록을 돌려줌 (report_idx는 최신순으로 감소).
+    """
+
+    def __init__(self, titles: list[str], pages: int):
+        import http.server
+        from urllib.parse import parse_qs, urlsplit
+
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                page_no = int(parse_qs(urlsplit(self.path).query)["now_page"][0])
+                body = server.page(page_no).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.titles = titles
+        self.pages = pages
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def page(self, page_no: int) -> str:
+        return list_page_html(self.titles, page_no, self.pages)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_port}/analysis/consensus"
+
+
+def bench_crawl(pages_list: list[int], batch_size: int):
+    import tracemalloc
+
+    import list_parser
+    import scraper
+
+    titles, listing = real_titles(2_000)
+    matcher = StockMatcher(listing)
+    list_parser.get_matcher = lambda: matcher  # KRX 목록을 내려받지 않도록 벤치마크용 매처 사용
+    server = FakeListServer(titles, max(pages_list))
+    options = {"concurrency": 8, "rate": 1000.0, "list_url": server.url}
+    init_db()
+
+    # 배치 크기를 무한대로 두면 예전처럼 전체를 모았다가 마지막에 한 번 적재하는 것과 같음
+    for label, size in [("스트리밍", batch_size), ("끝에 한 번 적재", 10 ** 9)]:
+        for pages in pages_list:
+            reset_db()
+            server.pages = pages
+            tracemalloc.start()
+            sec, stats = _timed(lambda: scraper.scrape("2025-01-01", "2025-12-31", pages + 1,
+                                                       batch_size=size, **options))
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(f"==> {label:<8} {pages:>4}페이지: {sec:6.2f}s, {stats['reports'] / sec:7.0f} rows/s, "
+                  f"커밋 {stats['batches']}회, 최대 메모리 {peak / 1e6:6.1f}MB")
+
+
+def bench_parse(pages: int, repeat: int):
+    import list_parser
+
+    titles, listing = real_titles(2_000)
+    matcher = StockMatcher(listing)
+    list_parser.get_matcher = lambda: matcher  # KRX 목록을 내려받지 않도록 벤치마크용 매처 사용
+
+    fixtures = [list_page_html(titles, page_no, pages) for page_no in range(1, pages + 1)]
+    print(f"픽스처 {len(fixtures)}페이지 ({sum(map(len, fixtures)) / len(fixtures) / 1e3:.0f}KB/페이지)")
+
+    def per_page_ms(parse) -> float:
+        t0 = time.perf_counter()
+        for _ in range(repeat):
+            for html in fixtures:
+                parse(html)
+        return (time.perf_counter() - t0) / (repeat * pages) * 1000
+
+    legacy_ms = per_page_ms(legacy_parse_list_page)
+    new_ms = per_page_ms(list_parser.parse_list_page)
+    print(f"==> 페이지당 파싱: BeautifulSoup {legacy_ms:.2f}ms → lxml XPath {new_ms:.2f}ms "
+          f"({legacy_ms / new_ms:.1f}배)")
+
+
+def _percentile(samples: list[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+def bench_concurrency(rows: int, ingest_rows: int, batch: int, readers: int, idle_sec: float):
+    """쓰기(save_reports 일괄 적재)가 도는 동안 여러 스레드가 /data.html을 읽을 때의 지연시간"""
+    init_db()
+    reset_db()
+    db.save_reports(make_rows(rows))
+    client = app_client()
+    with read_engine.connect() as conn:
+        names = [row[0] for row in conn.execute(text("SELECT stock_name FROM stocks"))]
+        journal_mode = conn.execute(text("PRAGMA journal_mode")).scalar()
+    print(f"리포트 {rows}건, 종목 {len(names)}개, journal_mode={journal_mode}, 읽기 스레드 {readers}개")
+
+    def run_readers(stop: threading.Event):
+        latencies: list[float] = []
+        errors = [0]
+        nonce = iter(range(10 ** 9))
+
+        def reader(seed: int):
+            rnd = random.Random(seed)
+            while not stop.is_set():
+                # 매번 다른 쿼리 문자열 → 응답 캐시를 거치지 않고 DB를 읽음
+                url = f"/data.html?q={rnd.choice(names)}&n={next(nonce)}"
+                t0 = time.perf_counter()
+                try:
+                    ok = client.get(url).status_code == 200
+                except Exception:
+                    ok = False
+                latencies.append((time.perf_counter() - t0) * 1000)
+                errors[0] += not ok
+
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+        for t in threads:
+            t.start()
+        return latencies, errors, threads
+
+    def report(label: str, latencies: list[float], errors: int, sec: float):
+        print(f"==> {label}: {len(latencies) / sec:6.0f} req/s, p50 {_percentile(latencies, 0.5):6.1f}ms, "
+              f"p99 {_percentile(latencies, 0.99):6.1f}ms, max {max(latencies):7.1f}ms, 오류 {errors}")
+
+    # 1) 쓰기 없이 읽기만
+    stop = threading.Event()
+    latencies, errors, threads = run_readers(stop)
+    time.sleep(idle_sec)
+    stop.set()
+    for t in threads:
+        t.join()
+    report("읽기만        ", latencies, errors[0], idle_sec)
+
+    # 2) 일괄 적재(배치마다 한 트랜잭션)와 동시에 읽기
+    stop = threading.Event()
+    latencies, errors, threads = run_readers(stop)
+    t0 = time.perf_counter()
+    for i, start in enumerate(range(0, ingest_rows, batch)):
+        db.save_reports(make_rows(min(batch, ingest_rows - start), seed=100 + i, start_idx=20_000_000 + start))
+    ingest_sec = time.perf_counter() - t0
+    stop.set()
+    for t in threads:
+        t.join()
+    report("적재 중 읽기  ", latencies, errors[0], ingest_sec)
+    print(f"==> 적재 {ingest_rows}건 ({batch}건씩) {ingest_sec:.2f}s, {ingest_rows / ingest_sec:.0f} rows/s")
+
+
+def _serve_app(port: int, query_delay: float):
+    # 자식 프로세스: 벤치마크 DB를 바라보는 uvicorn 워커 1개 (lifespan은 띄우지 않음)
+    import uvicorn
+    from fastapi.responses import HTMLResponse
+    import auth
+    import main as web
+    from query import find_stocks, report_page, user_by_email
+
+    if query_delay:
+        # 쿼리마다 I/O 대기 흉내 (GIL을 놓는 sleep → 실제 디스크/네트워크 대기와 같은 성격)
+        event.listen(read_engine, "before_cursor_execute", lambda *args: time.sleep(query_delay))
+
+    async def blocking_data(request: web.Request, q: str):
+        # 비교 기준: async def 안에서 동기 Session을 그대로 호출하던 예전 라우트
+        session = ReadSession()
+        try:
+            stock = find_stocks(session, q)[0]
+            reports, next_cursor = report_page(session, stock_id=stock.id)
+            return web.templates.TemplateResponse("data.html", {
+                "request": request, "reports": reports, "q": stock.stock_name,
+                "cursor": None, "next_cursor": next_cursor,
+            })
+        finally:
+            session.close()
+
+    def inline_login(req: web.LoginRequest):
+        # 비교 기준: 요청 처리 스레드에서 pbkdf2를 바로 계산하던 예전 로그인 (토큰 없음)
+        with ReadSession() as session:
+            user = user_by_email(session, req.email)
+        if not user or not auth.verify_password(req.password, user.password_hash):
+            raise web.HTTPException(status_code=400, detail="로그인 실패")
+        return {"message": "로그인 성공"}
+
+    web.app.add_api_route("/bench/blocking-data.html", blocking_data, response_class=HTMLResponse)
+    web.app.add_api_route("/bench/inline-login", inline_login, methods=["POST"])
+    auth.start_hash_pool()
+    try:
+        uvicorn.run(web.app, host="127.0.0.1", port=port, lifespan="off", log_level="warning")
+    finally:
+        auth.shutdown_hash_pool()
+
+
+def _start_app_server(query_delay: float):
+    """_serve_app을 자식 프로세스로 띄우고 응답할 때까지 기다림 → (프로세스, base_url)"""
+    import multiprocessing
+    import socket
+
+    import httpx
+
+    # 자식 프로세스가 부모의 SQLite 연결을 물려받지 않도록
+    engine.dispose()
+    read_engine.dispose()
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    os.chdir(BASE_DIR)  # static / templates 상대경로
+    # daemon이 아님: 서버가 해시 프로세스 풀(자식 프로세스)을 띄움. 끝나면 호출한 쪽에서 terminate
+    server = multiprocessing.get_context("fork").Process(target=_serve_app, args=(port, query_delay))
+    server.start()
+    base_url = f"http://127.0.0.1:{port}"
+    for _ in range(300):
+        try:
+            httpx.get(base_url + "/api/items/1")
+            break
+        except httpx.TransportError:
+            time.sleep(0.1)
+    return server, base_url
+
+
+def _stop_app_server(server):
+    # SIGTERM이면 uvicorn이 종료 후 신호를 다시 보내 finally 없이 끝나므로(해시 워커가 남음)
+    # SIGINT → KeyboardInterrupt로 _serve_app의 정리 코드까지 실행되게 함
+    os.kill(server.pid, signal.SIGINT)
+    server.join(10)
+    if server.is_alive():
+        server.terminate()
+        server.join()
+
+
+def bench_load(rows: int, clients_list: list[int], duration: float, query_delay: float):
+    """uvicorn 워커 1개에 동시 클라이언트 수를 늘려가며 /data.html 처리량 (예전 블로킹 라우트와 비교)"""
+    import asyncio
+
+    import httpx
+
+    init_db()
+    reset_db()
+    db.save_reports(make_rows(rows))
+    with read_engine.connect() as conn:
+        names = [row[0] for row in conn.execute(text("SELECT stock_name FROM stocks"))]
+    server, base_url = _start_app_server(query_delay)
+
+    async def run(path: str, clients: int) -> tuple[float, list[float], int]:
+        latencies: list[float] = []
+        errors = 0
+        nonce = iter(range(10 ** 9))
+        deadline = time.perf_counter() + duration
+
+        async def client_loop(seed: int):
+            # 클라이언트마다 keep-alive 연결 하나 (공유 풀을 쓰면 동시 요청이 많을 때 클라이언트 쪽 비용이 커짐)
+            nonlocal errors
+            rnd = random.Random(seed)
+            async with httpx.AsyncClient(base_url=base_url, timeout=60.0) as http:
+                while time.perf_counter() < deadline:
+                    # 매번 다른 쿼리 문자열 → 응답 캐시를 거치지 않음
+                    url = f"{path}?q={rnd.choice(names)}&n={next(nonce)}"
+                    t0 = time.perf_counter()
+                    response = await http.get(url)
+                    latencies.append((time.perf_counter() - t0) * 1000)
+                    errors += response.status_code != 200
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(client_loop(i) for i in range(clients)))
+        return time.perf_counter() - t0, latencies, errors
+
+    print(f"리포트 {rows}건, uvicorn 워커 1개, CPU {os.cpu_count()}개, 쿼리당 지연 {query_delay * 1000:.1f}ms")
+    print(f"{'clients':>7} | {'블로킹 라우트 req/s':>18} {'p99':>8} | {'DB 스레드 풀 req/s':>18} {'p99':>8}")
+    try:
+        for clients in clients_list:
+            cells = []
+            for path in ["/bench/blocking-data.html", "/data.html"]:
+                sec, latencies, errors = asyncio.run(run(path, clients))
+                assert errors == 0, f"{path}: 오류 {errors}건"
+                cells.append(f"{len(latencies) / sec:18.0f} {_percentile(latencies, 0.99):6.0f}ms")
+            print(f"{clients:>7} | " + " | ".join(cells))
+    finally:
+        _stop_app_server(server)
+
+
+BENCH_PASSWORD = "bench-password"
+
+
+def bench_login(rows: int, users: int, login_clients: int, read_clients: int, duration: float):
+    """
+    로그인 클라이언트와 일반 조회(/data.html) 클라이언트를 동시에 돌려 처리량 / 조회 p99 비교
+    (요청 스레드에서 pbkdf2 계산 vs 해시 전용 프로세스 풀). 토큰 확인(/api/me) 처리량도 함께 측정.
+    """
+    import asyncio
+
+    import httpx
+
+    from auth import hash_password, issue_token, verify_password, verify_token
+    from db import create_user
+
+    init_db()
+    reset_db()
+    db.save_reports(make_rows(rows))
+    with read_engine.connect() as conn:
+        names = [row[0] for row in conn.execute(text("SELECT stock_name FROM stocks"))]
+    password_hash = hash_password(BENCH_PASSWORD)  # 모든 사용자 같은 비밀번호 (솔트 포함 해시 1개 재사용)
+    emails = [f"user{i}@bench.example.com" for i in range(users)]
+    for email in emails:
+        create_user(email, password_hash)
+
+    n = 200
+    t0 = time.perf_counter()
+    for _ in range(n):
+        verify_password(BENCH_PASSWORD, password_hash)
+    hash_us = (time.perf_counter() - t0) / n * 1e6
+    token = issue_token(1, emails[0])
+    t0 = time.perf_counter()
+    for _ in range(n * 100):
+        verify_token(token)
+    token_us = (time.perf_counter() - t0) / (n * 100) * 1e6
+    print(f"비밀번호 검증(pbkdf2) {hash_us:,.0f}us / 토큰 검증(HMAC) {token_us:.1f}us")
+
+    server, base_url = _start_app_server(0.0)
+
+    async def run(login_path: str) -> dict:
+        results = {"login": [], "read": [], "me": [], "errors": 0}
+        deadline = time.perf_counter() + duration
+
+        async def loop(kind: str, seed: int):
+            rnd = random.Random(seed)
+            async with httpx.AsyncClient(base_url=base_url, timeout=60.0) as http:
+                while time.perf_counter() < deadline:
+                    t0 = time.perf_counter()
+                    if kind == "login":
+                        response = await http.post(login_path, json={"email": rnd.choice(emails), "password": BENCH_PASSWORD})
+                    elif kind == "me":
+                        response = await http.get("/api/me", headers={"Authorization": f"Bearer {token}"})
+                    else:
+                        response = await http.get(f"/data.html?q={rnd.choice(names)}&n={rnd.random()}")
+                    results[kind].append((time.perf_counter() - t0) * 1000)
+                    results["errors"] += response.status_code != 200
+
+        kinds = ["login"] * login_clients + ["read"] * read_clients + ["me"] * max(1, read_clients // 4)
+        t0 = time.perf_counter()
+        await asyncio.gather(*(loop(kind, i) for i, kind in enumerate(kinds)))
+        results["sec"] = time.perf_counter() - t0
+        return results
+
+    print(f"리포트 {rows}건, 사용자 {users}명, uvicorn 워커 1개, CPU {os.cpu_count()}개, "
+          f"로그인 클라이언트 {login_clients} + 조회 클라이언트 {read_clients} + /api/me {max(1, read_clients // 4)}")
+    print(f"{'':24} | {'login/s':>8} {'p99':>8} | {'조회 req/s':>10} {'p99':>8} | {'/api/me req/s':>13} {'p99':>8}")
+    try:
+        for label, path in [("요청 스레드에서 해시", "/bench/inline-login"), ("해시 프로세스 풀 + 토큰", "/api/login")]:
+            r = asyncio.run(run(path))
+            assert r["errors"] == 0, f"{path}: 오류 {r['errors']}건"
+            cells = [f"{len(r[k]) / r['sec']:{w}.0f} {_percentile(r[k], 0.99):6.0f}ms"
+                     for k, w in [("login", 8), ("read", 10), ("me", 13)]]
+            print(f"{label:24} | " + " | ".join(cells))
+    finally:
+        _stop_app_server(server)
+
+
+# ============================
+# 일봉 저장소 / 증분 수집
+# ============================
+
+def bench_prices(rows: int, stocks: int, latency: float, per_bar: float):
+    """일봉 수집 (처음 / 다시 / 다음 날, 예전 7일 창 방식과 비교) + 전체 기간 조회 (NumPy 일괄 vs 종목별 ORM)"""
+    import contextlib
+    import io
+
+    import numpy as np
+
+    from db import PriceBar
+    from price_history import history_stats, load_price_histories
+    from services import update_stock_prices
+
+    init_db()
+    reset_db()
+    db.save_reports(make_rows(rows, stocks=stocks))
+    today = date(2025, 6, 30)
+    source = FakeBarSource(today, latency, per_bar)
+
+    def refresh(label: str, bar_source, force: bool = False):
+        source.calls = source.bars = 0
+        t0 = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):  # 진행 로그 생략
+            stats = update_stock_prices(bar_source, ttl=None, force=force)
+        sec = time.perf_counter() - t0
+        print(f"==> {label:12} {sec:7.2f}s  요청 {source.calls}회, 받은 일봉 {source.bars:,}개, "
+              f"갱신 {stats['updated']}종목, 건너뜀 {stats['skipped']}종목, 저장 {stats['bars']:,}행")
+
+    print(f"리포트 {rows}건, 종목 {stocks}개, 요청당 {latency * 1000:.0f}ms + 일봉당 {per_bar * 1e6:.0f}us")
+    # 예전 방식: 매번 최근 7일을 받아 마지막 종가만 사용
+    refresh("예전 (7일 창)", lambda code, start: source(code, source.today - timedelta(days=7)), force=True)
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM price_history"))
+    refresh("처음 (전체 기간)", source, force=True)
+    refresh("다시 (같은 날)", source)
+    # 다음 날: 마지막 갱신을 장 마감 전으로 돌리고 시세 소스에 새 일봉 하나
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE stocks SET price_updated_at = '2000-01-01 00:00:00'"))
+    source.today += timedelta(days=1)
+    refresh("다음 날", source)
+
+    print(f"저장소: {history_stats()}")
+
+    t0 = time.perf_counter()
+    histories = load_price_histories()
+    bulk_sec = time.perf_counter() - t0
+    total = sum(len(h) for h in histories.values())
+
+    t0 = time.perf_counter()
+    with ReadSession() as session:
+        per_stock = {}
+        for code in histories:
+            bars = session.query(PriceBar).filter(PriceBar.stock_code == code).order_by(PriceBar.date).all()
+            per_stock[code] = np.array([b.close for b in bars], dtype=np.float64)
+    orm_sec = time.perf_counter() - t0
+    print(f"==> 전체 기간 조회 {len(histories)}종목 {total:,}봉: 일괄 NumPy {bulk_sec:.2f}s, 종목별 ORM {orm_sec:.2f}s "
+          f"({orm_sec / bulk_sec:.1f}x)")
+
+
+# ============================
+# 목표주가 적중 분석
+# ============================
+
+def bench_accuracy(rows: int, stocks: int, sample: int, repeat: int):
+    """100k 리포트 지표 계산 (NumPy 일괄 vs 리포트별 루프) / 증분 갱신 / 리더보드 API 지연시간"""
+    import accuracy
+    from price_history import load_price_histories, load_price_table, save_bars
+
+    init_db()
+    reset_db()
+    db.save_reports(make_rows(rows, stocks=stocks))
+    with engine.begin() as conn:
+        # 목표가를 가짜 주가 범위(약 7천~6만 3천) 안에 흩어 놓음 → 적중 / 미적중, 상승 / 하락 목표가가 섞이게
+        conn.execute(text("UPDATE reports SET fair_price = 8000 + (id * 7919) % 60000"))
+        codes = [row[0] for row in conn.execute(text("SELECT stock_code FROM stocks"))]
+        source = FakeBarSource(date(2025, 6, 30), 0.0, 0.0)
+        for code in codes:
+            save_bars(conn, [{"stock_code": code, **bar} for bar in source(code, date(2019, 12, 1))])
+    print(f"리포트 {rows:,}건, 종목 {len(codes)}개, 일봉 {source.bars:,}개, 평가 기간 {accuracy.HORIZON_DAYS}일")
+
+    t0 = time.perf_counter()
+    stats = accuracy.refresh_report_accuracy(full=True)
+    print(f"==> 전체 계산 (읽기 + NumPy + 저장) {time.perf_counter() - t0:.2f}s: {stats}")
+
+    # 계산만 따로: NumPy 일괄 vs 리포트별 루프 (sample건)
+    reports = db.read_array(accuracy._REPORTS_SQL, {}, accuracy._REPORT_DTYPE)
+    table = load_price_table()
+    t0 = time.perf_counter()
+    accuracy.evaluate(reports, *table)
+    numpy_sec = time.perf_counter() - t0
+
+    histories = load_price_histories()
+    history_dates = {code: series.dates.astype(object).tolist() for code, series in histories.items()}
+    picks = random.Random(0).sample(range(len(reports)), min(sample, len(reports)))
+    t0 = time.perf_counter()
+    for i in picks:
+        legacy_evaluate_report(histories[reports["stock_code"][i]], history_dates[reports["stock_code"][i]],
+                               reports["written_date"][i].item(),
+                               reports["fair_price"][i], reports["rating_code"][i], accuracy.HORIZON_DAYS,
+                               accuracy.MAX_ENTRY_GAP_DAYS)
+    loop_sec = (time.perf_counter() - t0) / len(picks) * len(reports)
+    print(f"==> 지표 계산 {len(reports):,}건: NumPy {numpy_sec:.2f}s, 리포트별 루프 {loop_sec:.1f}s (추정, {len(picks)}건 측정) "
+          f"({loop_sec / numpy_sec:.0f}x)")
+
+    # 증분: 다음 거래일 일봉이 하나씩 들어온 뒤 → 기간이 남은 리포트만 다시 계산
+    source.today = date(2025, 7, 1)
+    with engine.begin() as conn:
+        for code in codes:
+            save_bars(conn, [{"stock_code": code, **bar} for bar in source(code, source.today)])
+    t0 = time.perf_counter()
+    stats = accuracy.refresh_report_accuracy()
+    print(f"==> 증분 갱신 {time.perf_counter() - t0:.2f}s: {stats}")
+
+    client = app_client()
+    for path in ["/api/leaderboard/brokers", "/api/leaderboard/authors?sort=rating_return&min_reports=20"]:
+        t0 = time.perf_counter()
+        response = client.get(path)
+        cold_ms = (time.perf_counter() - t0) * 1000
+        assert response.status_code == 200 and response.json()["items"], response.text
+        warm_ms = _latency_ms(lambda: client.get(path), repeat)
+        print(f"==> {path}: 첫 요청(집계) {cold_ms:.0f}ms, 이후 p50 {warm_ms[0]:.1f}ms / 최대 {warm_ms[1]:.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HCI 성능 측정")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("save_reports", help="행 단위 적재 vs 일괄 적재 비교")
+    p.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+
+    p = sub.add_parser("match_titles", help="전체 종목 순회 vs StockMatcher 비교")
+    p.add_argument("--titles", type=int, default=10_000)
+
+    p = sub.add_parser("statistic", help="/statistic.html 지연시간 (뷰 vs 요약 테이블)")
+    p.add_argument("--rows", type=int, default=100_000)
+    p.add_argument("--repeat", type=int, default=20)
+
+    p = sub.add_parser("search", help="/api/search 지연시간 (FTS5 trigram vs LIKE)")
+    p.add_argument("--rows", type=int, default=100_000)
+    p.add_argument("--repeat", type=int, default=20)
+
+    p = sub.add_parser("suggest", help="종목 자동완성 (메모리 인덱스 vs LIKE)")
+    p.add_argument("--repeat", type=int, default=1000)
+
+    p = sub.add_parser("download", help="PDF 다운로드 처리량 (워커 수별) / 이어받기 / 조건부 요청")
+    p.add_argument("--files", type=int, default=40)
+    p.add_argument("--size", type=int, default=200_000)
+    p.add_argument("--latency", type=float, default=0.1)
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    p.add_argument("--rate", type=float, default=20.0)
+
+    p = sub.add_parser("review", help="리뷰 생성 단계 처리량 (stub 백엔드, 워커 수별)")
+    p.add_argument("--rows", type=int, default=200)
+    p.add_argument("--delay", type=float, default=0.05)
+    p.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+
+    p = sub.add_parser("extract", help="PDF 텍스트 추출 (프로세스 수별) / 캐시 재실행")
+    p.add_argument("--rows", type=int, default=300)
+    p.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+
+    p = sub.add_parser("concurrency", help="일괄 적재 중 /data.html 읽기 지연시간 (p99)")
+    p.add_argument("--rows", type=int, default=50_000)
+    p.add_argument("--ingest-rows", type=int, default=50_000)
+    p.add_argument("--batch", type=int, default=1000)
+    p.add_argument("--readers", type=int, default=8)
+    p.add_argument("--idle-sec", type=float, default=5.0)
+
+    p = sub.add_parser("load", help="동시 클라이언트 수별 /data.html 처리량 (uvicorn, 블로킹 라우트와 비교)")
+    p.add_argument("--rows", type=int, default=20_000)
+    p.add_argument("--clients", type=int, nargs="+", default=[1, 4, 16, 32])
+    p.add_argument("--duration", type=float, default=5.0)
+    p.add_argument("--query-delay", type=float, default=0.005, help="쿼리마다 더하는 I/O 대기 (초)")
+
+    p = sub.add_parser("login", help="로그인 + 조회 혼합 트래픽 처리량 (요청 스레드 해시 vs 해시 프로세스 풀)")
+    p.add_argument("--rows", type=int, default=20_000)
+    p.add_argument("--users", type=int, default=200)
+    p.add_argument("--login-clients", type=int, default=16)
+    p.add_argument("--read-clients", type=int, default=16)
+    p.add_argument("--duration", type=float, default=5.0)
+
+    p = sub.add_parser("prices", help="일봉 증분 수집 (처음/다시/다음 날, 7일 창과 비교) + NumPy 일괄 조회")
+    p.add_argument("--rows", type=int, default=5_000)
+    p.add_argument("--stocks", type=int, default=500)
+    p.add_argument("--latency", type=float, default=0.02, help="요청당 대기 (초)")
+    p.add_argument("--per-bar", type=float, default=0.00002, help="일봉당 대기 (초)")
+
+    p = sub.add_parser("accuracy", help="목표주가 적중 지표 (NumPy vs 리포트별 루프) / 증분 갱신 / 리더보드")
+    p.add_argument("--rows", type=int, default=100_000)
+    p.add_argument("--stocks", type=int, default=500)
+    p.add_argument("--sample", type=int, default=2000)
+    p.add_argument("--repeat", type=int, default=50)
+
+    p = sub.add_parser("parse", help="목록 페이지 파싱 (BeautifulSoup vs lxml XPath)")
+    p.add_argument("--pages", type=int, default=50)
+    p.add_argument("--repeat", type=int, default=5)
+
+    p = sub.add_parser("crawl", help="목록 수집→적재 파이프라인 처리량 / 최대 메모리 (페이지 수별)")
+    p.add_argument("--pages", type=int, nargs="+", default=[100, 500])
+    p.add_argument("--batch-size", type=int, default=None)
+
+    args = parser.parse_args()
+    print(f"벤치마크 DB: {db.DB_URL}")
+    if args.command == "save_reports":
+        bench_save_reports(args.rows)
+    elif args.command == "match_titles":
+        bench_match_titles(args.titles)
+    elif args.command == "statistic":
+        bench_statistic(args.rows, args.repeat)
+    elif args.command == "search":
+        bench_search(args.rows, args.repeat)
+    elif args.command == "suggest":
+        bench_suggest(args.repeat)
+    elif args.command == "download":
+        bench_download(args.files, args.size, args.latency, args.workers, args.rate)
+    elif args.command == "review":
+        bench_review(args.rows, args.delay, args.workers)
+    elif args.command == "extract":
+        bench_extract(args.rows, args.workers)
+    elif args.command == "concurrency":
+        bench_concurrency(args.rows, args.ingest_rows, args.batch, args.readers, args.idle_sec)
+    elif args.command == "load":
+        bench_load(args.rows, args.clients, args.duration, args.query_delay)
+    elif args.command == "login":
+        bench_login(args.rows, args.users, args.login_clients, args.read_clients, args.duration)
+    elif args.command == "prices":
+        bench_prices(args.rows, args.stocks, args.latency, args.per_bar)
+    elif args.command == "accuracy":
+        bench_accuracy(args.rows, args.stocks, args.sample, args.repeat)
+    elif args.command == "parse":
+        bench_parse(args.pages, args.repeat)
+    elif args.command == "crawl":
+        from scraper import INGEST_BATCH_SIZE
+        bench_crawl(args.pages, args.batch_size or INGEST_BATCH_SIZE)
+
+
+if __name__ == "__main__":
+    main()
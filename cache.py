@@ -0,0 +1,127 @@
+# cache.py
+# 자주 조회되는 페이지의 렌더링 결과를 프로세스 메모리에 보관하는 응답 캐시
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from db import get_data_version, run_db
+
+CACHE_MAX_ENTRIES = 256   # LRU 최대 항목 수
+CACHE_TTL = 300.0         # 항목 유효시간 (초). 데이터 버전이 바뀌면 그 전에라도 무효
+
+
+@dataclass
+class CacheEntry:
+    body: bytes
+    media_type: str | None
+    etag: str
+    version: int
+    expires_at: float
+
+
+class ResponseCache:
+    """
+    (경로, 쿼리 파라미터) → 렌더링된 응답 본문.
+    저장 당시의 데이터 버전과 현재 버전이 다르거나 TTL이 지나면 miss로 처리합니다.
+    """
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, ttl: float = CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: OrderedDict[tuple, CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.evictions = 0
+
+    def get(self, key: tuple, version: int) -> CacheEntry | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.version != version or entry.expires_at < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: tuple, version: int, body: bytes, media_type: str | None) -> CacheEntry:
+        entry = CacheEntry(
+            body=body,
+            media_type=media_type,
+            etag='"' + hashlib.sha1(body).hexdigest() + '"',
+            version=version,
+            expires_at=time.monotonic() + self.ttl,
+        )
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else None,
+            "not_modified": self.not_modified,
+            "evictions": self.evictions,
+        }
+
+
+response_cache = ResponseCache()
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    return header.strip() == "*" or etag in [tag.strip() for tag in header.split(",")]
+
+
+def cached_page(route):
+    """
+    GET 라우트용 데코레이터. 라우트는 request 인자를 받아야 합니다.
+    캐시된 본문이 있으면 라우트를 실행하지 않고 바로 돌려주며,
+    If-None-Match가 ETag와 같으면 본문 없이 304를 반환합니다.
+    """
+
+    @functools.wraps(route)
+    async def wrapper(*args, **kwargs):
+        request: Request = kwargs["request"]
+        key = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+        version = await run_db(get_data_version)  # 이벤트 루프를 막지 않도록 DB 스레드에서
+
+        entry = response_cache.get(key, version)
+        if entry is None:
+            response = await route(*args, **kwargs)
+            if response.status_code != 200:
+                return response
+            entry = response_cache.put(key, version, response.body, response.media_type)
+
+        headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+        if _etag_matches(request, entry.etag):
+            response_cache.not_modified += 1
+            return Response(status_code=304, headers=headers)
+        return Response(content=entry.body, media_type=entry.media_type, headers=headers)
+
+    return wrapper
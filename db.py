@@ -1,18 +1,130 @@
 from sqlalchemy import (
-    create_engine, Column, Integer, Float, String, Date, Text, ForeignKey
+    create_engine, event, make_url, Column, Integer, Float, String, Date, DateTime, Text, ForeignKey, Index
 )
 from sqlalchemy.orm import declarative_base, relationship, sessionmaker
-from sqlalchemy import text
+from sqlalchemy import text, select, bindparam, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+import asyncio
 import csv
+import functools
+import os
+import re
+from urllib.parse import quote
+
+import numpy as np
 
 # ============================
 # DB 설정
 # ============================
-DB_URL = "sqlite:///reports.db"  # 필요하면 파일명 변경
-engine = create_engine(DB_URL, echo=False, future=True)
+DB_URL = os.environ.get("REPORTS_DB_URL", "sqlite:///reports.db")  # 필요하면 파일명 변경
+
+# SQLite 연결 설정 (모든 연결에 적용)
+SQLITE_BUSY_TIMEOUT_MS = 30_000         # 다른 프로세스가 쓰는 중이면 database is locked 대신 이만큼 대기
+SQLITE_CACHE_SIZE_KB = 64 * 1024        # 연결당 페이지 캐시
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024    # 읽기는 메모리 맵으로 (read() 복사 없음)
+READ_POOL_SIZE = 8                      # 읽기 전용 연결 수 (넘치면 같은 수만큼 임시 연결)
+WRITE_POOL_TIMEOUT = 60                 # 쓰기 연결을 기다리는 최대 시간 (초)
+
+
+def _apply_sqlite_pragmas(dbapi_conn, writer: bool):
+    cursor = dbapi_conn.cursor()
+    if writer:
+        # WAL: 쓰는 동안에도 읽기가 막히지 않음 (DB 파일에 기록되는 설정이라 쓰기 연결에서만)
+        cursor.execute("PRAGMA journal_mode = WAL")
+    cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+    cursor.execute("PRAGMA synchronous = NORMAL")  # WAL에서는 커밋마다 fsync하지 않아도 손상되지 않음
+    cursor.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}")
+    cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+    cursor.execute("PRAGMA temp_store = MEMORY")
+    cursor.close()
+
+
+def create_engines(url: str = DB_URL):
+    """
+    (쓰기 엔진, 읽기 엔진)을 만듭니다.
+    - 쓰기: 연결 1개짜리 풀 → 프로세스 안의 쓰기는 순서대로 하나씩 실행.
+      트랜잭션은 BEGIN IMMEDIATE로 시작해 처음부터 쓰기 잠금을 잡음
+      (다른 프로세스와 겹치면 busy_timeout 동안 대기. 읽다가 쓰기로 올리다 실패하는 경우가 없음)
+    - 읽기: mode=ro로 연 읽기 전용 연결 풀. WAL이라 쓰기 트랜잭션 중에도 마지막 커밋 시점을 읽음
+    파일 DB가 아니면(:memory: 등) 엔진 하나를 둘 다로 씁니다.
+    """
+    parsed = make_url(url)
+    database = parsed.database
+    if parsed.get_backend_name() != "sqlite" or not database or database == ":memory:" \
+            or database.startswith("file:"):
+        shared = create_engine(url, echo=False, future=True)
+        return shared, shared
+
+    writer = create_engine(url, echo=False, future=True,
+                           pool_size=1, max_overflow=0, pool_timeout=WRITE_POOL_TIMEOUT)
+
+    @event.listens_for(writer, "connect")
+    def _on_writer_connect(dbapi_conn, _):
+        dbapi_conn.isolation_level = None  # pysqlite의 자동 BEGIN 대신 아래 begin 이벤트에서 직접 시작
+        _apply_sqlite_pragmas(dbapi_conn, writer=True)
+
+    @event.listens_for(writer, "begin")
+    def _on_writer_begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    ro_url = f"sqlite:///file:{quote(os.path.abspath(database))}?mode=ro&uri=true"
+    reader = create_engine(ro_url, echo=False, future=True,
+                           pool_size=READ_POOL_SIZE, max_overflow=READ_POOL_SIZE)
+
+    @event.listens_for(reader, "connect")
+    def _on_reader_connect(dbapi_conn, _):
+        _apply_sqlite_pragmas(dbapi_conn, writer=False)
+
+    return writer, reader
+
+
+engine, read_engine = create_engines()
 Base = declarative_base()
-SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
+SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)      # 쓰기용
+ReadSession = sessionmaker(bind=read_engine, autoflush=False, autocommit=False, future=True)  # 조회용
+
+
+# ============================
+# async 라우트용 DB 실행기
+# ============================
+# async def 라우트에서 동기 Session을 그대로 쓰면 쿼리 동안 이벤트 루프 전체가 멈춰
+# 워커 하나의 모든 요청이 한 줄로 처리된다. DB 작업은 전용 스레드 풀에서 실행하고 루프는 await만 한다.
+DB_EXECUTOR_THREADS = READ_POOL_SIZE  # 읽기 풀의 상시 연결 수와 같게 → 연결을 기다리거나 임시 연결을 만들지 않음
+_db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_THREADS, thread_name_prefix="db")
+
+
+async def run_db(fn, *args, **kwargs):
+    """동기 함수 fn을 DB 스레드 풀에서 실행하고 결과를 기다립니다 (동시 실행 수는 DB_EXECUTOR_THREADS로 제한)."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_db_executor, functools.partial(fn, *args, **kwargs))
+
+
+def read_array(sql: str, params: dict, dtype):
+    """
+    읽기 연결에서 sql을 실행해 결과 행을 NumPy 구조화 배열(dtype)로 바로 읽습니다.
+    행을 파이썬 객체 목록으로 모으지 않음 (수십만 행 일괄 분석용). 빈 값(None)은 실수 필드에서 NaN.
+    """
+    with read_engine.connect() as conn:
+        cursor = conn.connection.driver_connection.execute(sql, params)
+        return np.fromiter(cursor, dtype=dtype)
+
+
+class AsyncReadSession:
+    """
+    async 라우트용 조회 세션. await db.run(fn, ...)은 DB 스레드에서 ReadSession을 열어 fn(session, ...)을 실행하고
+    바로 닫습니다 → 연결은 쿼리하는 동안만 쓰고, await 중이나 템플릿 렌더링 중에는 풀에 돌려줌.
+    돌려받은 ORM 객체는 세션에서 분리되므로 템플릿이 쓰는 관계는 fn 안에서 함께 로드해야 합니다 (joinedload).
+    """
+
+    @staticmethod
+    def _call(fn, args, kwargs):
+        with ReadSession() as session:
+            return fn(session, *args, **kwargs)
+
+    async def run(self, fn, *args, **kwargs):
+        return await run_db(self._call, fn, args, kwargs)
 
 
 # ============================
@@ -29,6 +141,7 @@ class Stock(Base):
     company_info_url = Column(String(500))
     current_price = Column(Integer, nullable=True)
     daily_change_rate = Column(Float, nullable=True)
+    price_updated_at = Column(DateTime, nullable=True)  # 마지막 주가 갱신 시각 (TTL 판단용)
 
     reports = relationship("Report", back_populates="stock")
 
@@ -75,6 +188,11 @@ class Rating(Base):
 # 5) 리포트 (팩트 테이블)
 class Report(Base):
     __tablename__ = "reports"
+    __table_args__ = (
+        # 최신순 keyset 페이지네이션: (written_date, id) / 종목별 (stock_id, written_date, id)
+        Index("ix_reports_written_date_id", "written_date", "id"),
+        Index("ix_reports_stock_written_date_id", "stock_id", "written_date", "id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
 
@@ -83,13 +201,14 @@ class Report(Base):
     fair_price = Column(Integer)
     current_price = Column(Integer)
     expected_return = Column(Float)
-    attachment_url = Column(String(500))
+    attachment_url = Column(String(500), unique=True, index=True)  # 중복 판정 키 (ON CONFLICT 대상)
+    report_idx = Column(Integer, index=True)  # attachment_url의 report_idx 값 (PDF 파일명 = {report_idx}.pdf)
 
     summary = Column(Text, nullable=True)
     novice_content = Column(Text, nullable=True)
     expert_content = Column(Text, nullable=True)
 
-    stock_id = Column(Integer, ForeignKey("stocks.id"), nullable=False)
+    stock_id = Column(Integer, ForeignKey("stocks.id"), nullable=False, index=True)
     broker_id = Column(Integer, ForeignKey("brokers.id"), nullable=True)
     author_id = Column(Integer, ForeignKey("authors.id"), nullable=True)
     rating_code = Column(String(10), ForeignKey("ratings.code"), nullable=False)
@@ -100,6 +219,80 @@ class Report(Base):
     rating = relationship("Rating", back_populates="reports")
 
 
+# 6) 종목별 요약 (stock_summary) - 리포트 3건 이상인 종목만, 적재/주가 갱신 시 해당 종목만 다시 계산
+class StockSummary(Base):
+    __tablename__ = "stock_summary"
+
+    stock_id = Column(Integer, ForeignKey("stocks.id"), primary_key=True)
+    stock_code = Column(String(20), nullable=False)
+    stock_name = Column(String(100), nullable=False)
+    current_price = Column(Integer)            # 최신 리포트 기준 현재가
+    avg_fair_price = Column(Float)
+    avg_expected_return = Column(Float, index=True)
+    main_rating = Column(String(10))           # 최신 리포트의 평가의견
+    report_count = Column(Integer, nullable=False)
+
+
+# 7) 앱 상태 값 (데이터 버전 등 key → 정수)
+class AppState(Base):
+    __tablename__ = "app_state"
+
+    key = Column(String(50), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+
+# 8) 리포트 PDF (report_idx → 내용 sha256). 파일 자체는 pdf_store.PDFStore에 해시 이름으로 저장
+class ReportPDF(Base):
+    __tablename__ = "report_pdfs"
+
+    report_idx = Column(Integer, primary_key=True)
+    sha256 = Column(String(64), nullable=False, index=True)
+    size = Column(Integer, nullable=False)
+    stored_at = Column(DateTime, nullable=False)
+
+
+# 9) 수집 상태 (소스별 high-water mark: 지금까지 빠짐없이 수집한 가장 최신 리포트)
+class CrawlState(Base):
+    __tablename__ = "crawl_state"
+
+    source = Column(String(50), primary_key=True)
+    last_written_date = Column(Date)
+    last_report_idx = Column(Integer)
+    updated_at = Column(DateTime)
+
+
+# 10) 일봉 시세 (종목코드, 날짜) → OHLCV. 조회/적재는 price_history 모듈 (NumPy 배열로 일괄 조회)
+class PriceBar(Base):
+    __tablename__ = "price_history"
+    # (stock_code, date) 기본키 순서로 행이 저장되므로 종목별 기간 조회가 연속 구간 읽기 한 번
+    __table_args__ = {"sqlite_with_rowid": False}
+
+    stock_code = Column(String(20), primary_key=True)
+    date = Column(Date, primary_key=True)
+    open = Column(Integer)
+    high = Column(Integer)
+    low = Column(Integer)
+    close = Column(Integer, nullable=False)
+    volume = Column(Integer)
+
+
+# 11) 리포트별 목표주가 적중 지표 (accuracy 모듈이 계산). resolved=1이면 평가 기간이 끝나 더 바뀌지 않음
+class ReportAccuracy(Base):
+    __tablename__ = "report_accuracy"
+
+    report_id = Column(Integer, ForeignKey("reports.id"), primary_key=True)
+    entry_date = Column(Date, nullable=False)      # 기준 일봉 (작성일 또는 그 다음 거래일)
+    entry_price = Column(Float, nullable=False)    # 기준 종가
+    direction = Column(Integer, nullable=False)    # 목표가 방향: 1 (목표가 ≥ 기준가) / -1
+    hit = Column(Integer, nullable=False)          # 기간 안에 목표가 도달
+    days_to_target = Column(Integer)               # 작성일 → 첫 도달일 (일)
+    mfe = Column(Float)                            # 목표 방향 최대 유리 수익률
+    mae = Column(Float)                            # 목표 방향 최대 불리 수익률
+    horizon_return = Column(Float)                 # 기간 마지막(또는 최신) 종가 수익률
+    rating_return = Column(Float)                  # 투자의견 방향을 반영한 수익률 (Buy +, Sell -)
+    resolved = Column(Integer, nullable=False, index=True)
+
+
 # ============================
 # 유틸 함수들
 # ============================
@@ -132,6 +325,22 @@ def parse_float(value: str | None):
     except ValueError:
         return None
 
+REPORT_IDX_RE = re.compile(r"report_idx=(\d+)")
+
+def parse_report_idx(attachment_url: str | None) -> int | None:
+    # 예: https://consensus.hankyung.com/analysis/downpdf?report_idx=644830 -> 644830
+    if not attachment_url:
+        return None
+    match = REPORT_IDX_RE.search(attachment_url)
+    return int(match.group(1)) if match else None
+
+def to_report_idx(value) -> int | None:
+    # 644830 / "644830" / "644830.pdf" 모두 허용 (파이프라인은 PDF 파일명을 넘김)
+    if isinstance(value, int):
+        return value
+    stem = os.path.splitext(os.path.basename(str(value).strip()))[0]
+    return int(stem) if stem.isdigit() else None
+
 # 평가의견 정규화: Buy / Sell / Hold / None만 사용
 def normalize_rating(raw: str | None) -> str:
     if raw is None:
@@ -159,7 +368,17 @@ def normalize_rating(raw: str | None) -> str:
 # ============================
 
 def init_db():
+    # 예전 버전의 stock_summary는 VIEW였으므로 테이블을 만들기 전에 제거
+    # (이미 테이블이면 DROP VIEW IF EXISTS가 오류를 내므로 종류를 확인)
+    with engine.begin() as conn:
+        summary_type = conn.execute(text(
+            "SELECT type FROM sqlite_master WHERE name = 'stock_summary'"
+        )).scalar()
+        if summary_type == "view":
+            conn.execute(text("DROP VIEW stock_summary"))
     Base.metadata.create_all(engine)
+    # 요약 테이블을 이번에 새로 만들었으면(뷰에서 바뀐 경우 포함) 기존 리포트로 채움
+    migrate_db(fill_stock_summary=summary_type != "table")
 
     # ratings 테이블에 코드 채우기
     with SessionLocal() as session:
@@ -174,6 +393,193 @@ def init_db():
         session.commit()
 
 
+# ============================
+# 전문 검색 인덱스 (FTS5, trigram)
+# ============================
+# 한국어는 공백 단위 토큰화가 잘 맞지 않아 trigram 토크나이저를 사용한다 (SQLite 3.34+).
+# rowid = reports.id. 종목/증권사/애널리스트 이름까지 같이 넣어 조인 없이 검색한다.
+# 트리거로 동기화하므로 save_reports / update_report_review 등 어느 경로로 써도 인덱스가 따라간다.
+
+_FTS_VALUES = """
+    {r}.id, {r}.title, {r}.summary, {r}.expert_content,
+    (SELECT stock_name FROM stocks WHERE id = {r}.stock_id),
+    (SELECT name FROM brokers WHERE id = {r}.broker_id),
+    (SELECT name FROM authors WHERE id = {r}.author_id)
+"""
+_FTS_COLUMNS = "rowid, title, summary, expert_content, stock_name, broker_name, author_name"
+
+SEARCH_INDEX_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS reports_fts USING fts5(
+        title, summary, expert_content, stock_name, broker_name, author_name,
+        tokenize = 'trigram'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS reports_fts_ai AFTER INSERT ON reports BEGIN
+        INSERT INTO reports_fts ({_FTS_COLUMNS}) VALUES ({_FTS_VALUES.format(r="new")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS reports_fts_au
+    AFTER UPDATE OF title, summary, expert_content, stock_id, broker_id, author_id ON reports BEGIN
+        DELETE FROM reports_fts WHERE rowid = old.id;
+        INSERT INTO reports_fts ({_FTS_COLUMNS}) VALUES ({_FTS_VALUES.format(r="new")});
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS reports_fts_ad AFTER DELETE ON reports BEGIN
+        DELETE FROM reports_fts WHERE rowid = old.id;
+    END
+    """,
+]
+
+
+def rebuild_search_index(conn=None):
+    """reports_fts를 reports 전체에서 다시 채웁니다."""
+    if conn is None:
+        with engine.begin() as conn:
+            return rebuild_search_index(conn)
+    conn.execute(text("DELETE FROM reports_fts"))
+    conn.execute(text(
+        f"INSERT INTO reports_fts ({_FTS_COLUMNS}) SELECT {_FTS_VALUES.format(r='reports')} FROM reports"
+    ))
+
+
+# ============================
+# 데이터 버전 (응답 캐시 무효화용)
+# ============================
+# 리포트/리뷰/주가가 바뀌는 쓰기 트랜잭션마다 1씩 올린다.
+# 스크래퍼·파이프라인은 웹 서버와 다른 프로세스에서 돌기 때문에 DB에 저장한다.
+
+def bump_data_version(conn, key: str = "data_version"):
+    # key: 'data_version'(리포트/주가, 페이지 캐시) / 'accuracy_version'(목표주가 적중 지표, accuracy 리더보드)
+    conn.execute(text(
+        "INSERT INTO app_state (key, value) VALUES (:key, 1) "
+        "ON CONFLICT(key) DO UPDATE SET value = value + 1"
+    ), {"key": key})
+
+
+def get_data_version(key: str = "data_version") -> int:
+    with read_engine.connect() as conn:
+        value = conn.execute(text("SELECT value FROM app_state WHERE key = :key"), {"key": key}).scalar()
+    return value or 0
+
+
+# ============================
+# 수집 high-water mark (scraper.scrape_incremental)
+# ============================
+
+def get_high_water_mark(source: str):
+    """
+    (last_written_date, last_report_idx). 기록이 없으면 이미 적재된 reports의 최댓값으로 대신합니다.
+    둘 다 없으면 (None, None)
+    """
+    with read_engine.connect() as conn:
+        row = conn.execute(
+            select(CrawlState.last_written_date, CrawlState.last_report_idx).where(CrawlState.source == source)
+        ).first()
+        if row is None:
+            row = conn.execute(select(func.max(Report.written_date), func.max(Report.report_idx))).first()
+    return row[0], row[1]
+
+
+def advance_high_water_mark(source: str, written_date, report_idx: int):
+    """high-water mark를 올립니다 (기존 값보다 작은 값으로는 내려가지 않음)."""
+    if isinstance(written_date, str):
+        written_date = datetime.strptime(written_date.strip(), "%Y-%m-%d").date()
+    stmt = sqlite_insert(CrawlState.__table__).values(
+        source=source, last_written_date=written_date, last_report_idx=report_idx, updated_at=datetime.now(),
+    )
+    table = CrawlState.__table__.c
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["source"],
+        set_={
+            "last_written_date": func.max(func.coalesce(table.last_written_date, stmt.excluded.last_written_date),
+                                          stmt.excluded.last_written_date),
+            "last_report_idx": func.max(func.coalesce(table.last_report_idx, stmt.excluded.last_report_idx),
+                                        stmt.excluded.last_report_idx),
+            "updated_at": stmt.excluded.updated_at,
+        },
+    )
+    with engine.begin() as conn:
+        conn.execute(stmt)
+
+
+# ============================
+# 기존 DB 마이그레이션
+# ============================
+
+def _add_column_if_missing(conn, table: str, column: str, ddl: str):
+    columns = {row[1] for row in conn.execute(text(f"PRAGMA table_info({table})"))}
+    if column not in columns:
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def migrate_db(fill_stock_summary: bool = False):
+    """
+    create_all()은 이미 존재하는 테이블에 컬럼/인덱스를 추가하지 않으므로,
+    이전 스키마로 만들어진 reports.db에 필요한 컬럼과 인덱스를 직접 만들어 준다.
+    fill_stock_summary: stock_summary 테이블을 방금 만들었으면 True (같은 트랜잭션에서 전체 재구성).
+    """
+    with engine.begin() as conn:
+        _add_column_if_missing(conn, "stocks", "price_updated_at", "DATETIME")
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_reports_stock_id ON reports (stock_id)"))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_reports_written_date_id ON reports (written_date, id)"
+        ))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_reports_stock_written_date_id ON reports (stock_id, written_date, id)"
+        ))
+
+        # 유니크 인덱스가 아직 없을 때(예전 스키마) 한 번만: attachment_url 중복 행 정리 후 인덱스 생성.
+        # 남기는 행: 리뷰(expert_content / novice_content / summary)가 가장 많이 채워진 행, 같으면 먼저 들어온 행
+        has_unique_url = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'ix_reports_attachment_url'"
+        )).first()
+        if not has_unique_url:
+            conn.execute(text("""
+                DELETE FROM reports
+                WHERE id IN (
+                    SELECT id FROM (
+                        SELECT id, ROW_NUMBER() OVER (
+                            PARTITION BY attachment_url
+                            ORDER BY (COALESCE(expert_content, '') != '')
+                                   + (COALESCE(novice_content, '') != '')
+                                   + (COALESCE(summary, '') != '') DESC,
+                                     id
+                        ) AS rn
+                        FROM reports
+                        WHERE attachment_url IS NOT NULL
+                    )
+                    WHERE rn > 1
+                )
+            """))
+            conn.execute(text("CREATE UNIQUE INDEX ix_reports_attachment_url ON reports (attachment_url)"))
+
+        # report_idx 컬럼 추가 후 attachment_url에서 채움 (CAST는 앞쪽 숫자까지만 읽음)
+        _add_column_if_missing(conn, "reports", "report_idx", "INTEGER")
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_reports_report_idx ON reports (report_idx)"))
+        conn.execute(text("""
+            UPDATE reports
+            SET report_idx = CAST(substr(attachment_url, instr(attachment_url, 'report_idx=') + 11) AS INTEGER)
+            WHERE report_idx IS NULL AND instr(attachment_url, 'report_idx=') > 0
+        """))
+
+        # 전문 검색 인덱스: 처음 만들 때만 기존 리포트로 채움
+        has_fts = conn.execute(text(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'reports_fts'"
+        )).first()
+        for ddl in SEARCH_INDEX_DDL:
+            conn.execute(text(ddl))
+        if not has_fts:
+            rebuild_search_index(conn)
+
+        # 중복 정리가 끝난 뒤에 요약 계산
+        if fill_stock_summary:
+            refresh_stock_summary(conn)
+
+
 # ============================
 # CSV → DB 적재
 # ============================
@@ -182,114 +588,135 @@ def init_db():
 # 데이터 적재 (Direct List[Dict])
 # ============================
 
-def save_reports(reports_data: list[dict]):
-    session = SessionLocal()
-    
-    # 캐시 (중복 insert 방지)
-    stock_cache: dict[str, Stock] = {}
-    broker_cache: dict[str, Broker] = {}
-    author_cache: dict[str, Author] = {}
+# 한 번에 INSERT / IN (...) 조회하는 행 수 (SQLite 바인드 변수 한도 안쪽)
+BULK_CHUNK_SIZE = 500
+
+
+def _chunks(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _normalize_report_row(row: dict) -> dict:
+    # row는 scraper.py / load_csv_to_db에서 대부분 변환되어 들어오지만, 안전장치로 한번 더 정리
+    written_date = row.get("written_date")
+    if isinstance(written_date, str):
+        written_date = datetime.strptime(written_date.strip(), "%Y-%m-%d").date()
+
+    return {
+        "written_date": written_date,
+        "stock_name": normalize_str(row.get("stock_name")),
+        "stock_code": normalize_str(row.get("stock_code")),
+        "title": normalize_str(row.get("title")) or "",
+        "fair_price": row.get("fair_price"),
+        "current_price": row.get("current_price"),
+        "expected_return": row.get("expected_return"),
+        "rating_code": normalize_rating(row.get("rating_code")),
+        "author_name": normalize_str(row.get("author_name")),
+        "broker_name": normalize_str(row.get("broker_name")),
+        "company_info_url": normalize_str(row.get("company_info_url")),
+        "attachment_url": normalize_str(row.get("attachment_url")),
+        "summary": row.get("summary"),
+        "novice_content": row.get("novice_content"),
+        "expert_content": row.get("expert_content"),
+    }
+
+
+def _resolve_ids(conn, table, key_col: str, new_rows: dict[str, dict]) -> dict[str, int]:
+    """
+    key → id 매핑을 IN (...) 조회로 한 번에 가져오고,
+    없는 키만 배치 INSERT 한 뒤 다시 조회해서 채운다.
+    new_rows: {key: INSERT 시 사용할 컬럼 dict}
+    """
+    key_column = table.c[key_col]
+    keys = list(new_rows)
+    ids: dict[str, int] = {}
 
-    try:
-        for row in reports_data:
-            # 1) 공통 파싱
-            # row는 이미 적절한 타입(date, int, float 등)으로 변환되어 들어온다고 가정하거나, 여기서 변환
-            # scraper.py에서 변환해서 넘겨주는 것이 좋음.
-            # 여기서는 안전장치로 한번 더 체크하거나 그대로 사용
-            
-            written_date = row.get("written_date")
-            if isinstance(written_date, str):
-                written_date = datetime.strptime(written_date, "%Y-%m-%d").date()
-                
-            stock_name = normalize_str(row.get("stock_name"))
-            stock_code = normalize_str(row.get("stock_code"))
-            title = normalize_str(row.get("title"))
-
-            fair_price = row.get("fair_price")
-            current_price = row.get("current_price")
-            expected_return = row.get("expected_return")
-
-            rating_code = normalize_rating(row.get("rating_code"))
-            author_name = normalize_str(row.get("author_name"))
-            broker_name = normalize_str(row.get("broker_name"))
-
-            company_info_url = normalize_str(row.get("company_info_url"))
-            attachment_url = normalize_str(row.get("attachment_url"))
-
-            # 중복 체크: attachment_url이 같으면 이미 있는 것으로 간주
-            if attachment_url:
-                existing = session.query(Report).filter_by(attachment_url=attachment_url).first()
-                if existing:
-                    continue
-
-            # 2) 종목 (stocks) 처리
-            stock = None
-            if stock_code in stock_cache:
-                stock = stock_cache[stock_code]
-            else:
-                stock = session.query(Stock).filter_by(stock_code=stock_code).one_or_none()
-                if stock is None:
-                    stock = Stock(
-                        stock_code=stock_code,
-                        stock_name=stock_name or "",
-                        company_info_url=company_info_url,
-                    )
-                    session.add(stock)
-                    session.flush()  # id 확보
-                stock_cache[stock_code] = stock
-
-            # 3) 증권사 (brokers) 처리
-            broker = None
-            if broker_name:
-                if broker_name in broker_cache:
-                    broker = broker_cache[broker_name]
-                else:
-                    broker = session.query(Broker).filter_by(name=broker_name).one_or_none()
-                    if broker is None:
-                        broker = Broker(name=broker_name)
-                        session.add(broker)
-                        session.flush()
-                    broker_cache[broker_name] = broker
-
-            # 4) 애널리스트 (authors) 처리
-            author = None
-            if author_name:
-                if author_name in author_cache:
-                    author = author_cache[author_name]
-                else:
-                    author = session.query(Author).filter_by(name=author_name).one_or_none()
-                    if author is None:
-                        author = Author(name=author_name)
-                        session.add(author)
-                        session.flush()
-                    author_cache[author_name] = author
-
-            # 5) 리포트 (reports) 삽입
-            report = Report(
-                written_date=written_date,
-                title=title or "",
-                fair_price=fair_price,
-                current_price=current_price,
-                expected_return=expected_return,
-                attachment_url=attachment_url,
-                summary=row.get("summary"),
-                novice_content=row.get("novice_content"),
-                expert_content=row.get("expert_content"),
-
-                stock_id=stock.id,
-                broker_id=broker.id if broker else None,
-                author_id=author.id if author else None,
-                rating_code=rating_code,
-            )
-            session.add(report)
+    for chunk in _chunks(keys, BULK_CHUNK_SIZE):
+        for row_id, key in conn.execute(select(table.c.id, key_column).where(key_column.in_(chunk))):
+            ids[key] = row_id
 
-        session.commit()
-        print(f"'{DB_URL}'에 저장 완료")
-    except Exception as e:
-        session.rollback()
-        print("에러 발생:", e)
-    finally:
-        session.close()
+    missing = [new_rows[k] for k in keys if k not in ids]
+    if missing:
+        stmt = sqlite_insert(table).on_conflict_do_nothing()
+        for chunk in _chunks(missing, BULK_CHUNK_SIZE):
+            conn.execute(stmt, chunk)
+        for chunk in _chunks([m[key_col] for m in missing], BULK_CHUNK_SIZE):
+            for row_id, key in conn.execute(select(table.c.id, key_column).where(key_column.in_(chunk))):
+                ids[key] = row_id
+
+    return ids
+
+
+def save_reports(reports_data: list[dict], chunk_size: int = BULK_CHUNK_SIZE) -> dict[str, int]:
+    """
+    리포트 목록을 한 트랜잭션으로 일괄 적재한다.
+    - stocks / brokers / authors는 IN (...) 조회 후 없는 것만 배치 INSERT
+    - reports는 청크마다 INSERT ... ON CONFLICT(attachment_url) DO NOTHING 한 번
+    반환값: {"inserted": 새로 저장된 리포트 수, "skipped": 중복/무효로 건너뛴 수}
+    """
+    rows = [_normalize_report_row(r) for r in reports_data]
+
+    # 종목코드가 없는 행은 stocks FK를 채울 수 없으므로 건너뜀
+    valid_rows = [r for r in rows if r["stock_code"]]
+    skipped = len(rows) - len(valid_rows)
+    if not valid_rows:
+        return {"inserted": 0, "skipped": skipped}
+
+    # 1) 차원 테이블 키 수집 (먼저 나온 값 우선, 기존 row 캐시 방식과 동일)
+    stock_rows: dict[str, dict] = {}
+    broker_rows: dict[str, dict] = {}
+    author_rows: dict[str, dict] = {}
+    for r in valid_rows:
+        stock_rows.setdefault(r["stock_code"], {
+            "stock_code": r["stock_code"],
+            "stock_name": r["stock_name"] or "",
+            "company_info_url": r["company_info_url"],
+        })
+        if r["broker_name"]:
+            broker_rows.setdefault(r["broker_name"], {"name": r["broker_name"]})
+        if r["author_name"]:
+            author_rows.setdefault(r["author_name"], {"name": r["author_name"]})
+
+    inserted = 0
+    with engine.begin() as conn:
+        # 2) 차원 키 → id 일괄 해석
+        stock_ids = _resolve_ids(conn, Stock.__table__, "stock_code", stock_rows)
+        broker_ids = _resolve_ids(conn, Broker.__table__, "name", broker_rows)
+        author_ids = _resolve_ids(conn, Author.__table__, "name", author_rows)
+
+        # 3) 리포트 INSERT ... ON CONFLICT(attachment_url) DO NOTHING
+        report_rows = [
+            {
+                "written_date": r["written_date"],
+                "title": r["title"],
+                "fair_price": r["fair_price"],
+                "current_price": r["current_price"],
+                "expected_return": r["expected_return"],
+                "attachment_url": r["attachment_url"],
+                "report_idx": parse_report_idx(r["attachment_url"]),
+                "summary": r["summary"],
+                "novice_content": r["novice_content"],
+                "expert_content": r["expert_content"],
+                "stock_id": stock_ids[r["stock_code"]],
+                "broker_id": broker_ids.get(r["broker_name"]),
+                "author_id": author_ids.get(r["author_name"]),
+                "rating_code": r["rating_code"],
+            }
+            for r in valid_rows
+        ]
+        # 문장은 한 번만 컴파일하고 청크마다 executemany로 실행
+        stmt = sqlite_insert(Report.__table__).on_conflict_do_nothing(index_elements=["attachment_url"])
+        for chunk in _chunks(report_rows, chunk_size):
+            inserted += conn.execute(stmt, chunk).rowcount
+
+        # 4) 이번 배치에 포함된 종목만 요약 테이블 갱신
+        if inserted:
+            refresh_stock_summary(conn, set(stock_ids.values()))
+            bump_data_version(conn)
+
+    skipped += len(valid_rows) - inserted
+    return {"inserted": inserted, "skipped": skipped}
 
 def load_csv_to_db(csv_path: str, reviews_csv_path: str = None):
     # Legacy support or initial seeding
@@ -335,56 +762,91 @@ def load_csv_to_db(csv_path: str, reviews_csv_path: str = None):
                 
                 # Merge review data if available
                 attachment_url = data["attachment_url"]
-                if attachment_url:
-                    import re
-                    match = re.search(r"report_idx=(\d+)", attachment_url)
-                    if match:
-                        r_id = match.group(1)
-                        if r_id in reviews_map:
-                            review = reviews_map[r_id]
-                            data.update(review)
+                r_idx = parse_report_idx(attachment_url)
+                if r_idx is not None and str(r_idx) in reviews_map:
+                    data.update(reviews_map[str(r_idx)])
                 
                 reports_data.append(data)
         
-        save_reports(reports_data)
-        
+        result = save_reports(reports_data)
+        print(f"'{DB_URL}'에 저장 완료 (신규 {result['inserted']}건, 중복 {result['skipped']}건)")
+
     except Exception as e:
         print(f"CSV 로드 실패: {e}")
 
 # ============================
-# 뷰 생성
+# 종목 요약 테이블 (stock_summary)
 # ============================
-def create_stock_summary_view():
-    with engine.connect() as conn:
-        # 기존 뷰 있으면 지우고 다시 생성
-        conn.execute(text("DROP VIEW IF EXISTS stock_summary"))
-        conn.execute(text("""
-            CREATE VIEW stock_summary AS
-            SELECT
-                s.stock_code              AS stock_code,
-                s.stock_name              AS stock_name,
-                (
-                    SELECT r2.current_price
-                    FROM reports r2
-                    WHERE r2.stock_id = s.id
-                    ORDER BY r2.written_date DESC, r2.id DESC
-                    LIMIT 1
-                ) AS current_price,
-                AVG(r.fair_price)         AS avg_fair_price,
-                AVG(r.expected_return)    AS avg_expected_return,
-                (
-                    SELECT r3.rating_code
-                    FROM reports r3
-                    WHERE r3.stock_id = s.id
-                    ORDER BY r3.written_date DESC, r3.id DESC
-                    LIMIT 1
-                ) AS main_rating
-            FROM stocks s
-            JOIN reports r ON r.stock_id = s.id
-            GROUP BY s.id, s.stock_code, s.stock_name
-            HAVING COUNT(r.id) >= 3;
-        """))
-    print("stock_summary 뷰 생성 완료")
+MIN_REPORTS_FOR_SUMMARY = 3  # 요약에 포함되는 최소 리포트 수
+
+_SUMMARY_SELECT = """
+    SELECT
+        s.id              AS stock_id,
+        s.stock_code      AS stock_code,
+        s.stock_name      AS stock_name,
+        latest.current_price AS current_price,
+        agg.avg_fair_price AS avg_fair_price,
+        agg.avg_expected_return AS avg_expected_return,
+        latest.rating_code AS main_rating,
+        agg.report_count  AS report_count
+    FROM stocks s
+    JOIN (
+        SELECT stock_id,
+               AVG(fair_price)      AS avg_fair_price,
+               AVG(expected_return) AS avg_expected_return,
+               COUNT(id)            AS report_count
+        FROM reports
+        {where}
+        GROUP BY stock_id
+        HAVING COUNT(id) >= :min_reports
+    ) agg ON agg.stock_id = s.id
+    JOIN (
+        SELECT stock_id, current_price, rating_code,
+               ROW_NUMBER() OVER (PARTITION BY stock_id ORDER BY written_date DESC, id DESC) AS rn
+        FROM reports
+        {where}
+    ) latest ON latest.stock_id = s.id AND latest.rn = 1
+"""
+
+_SUMMARY_COLUMNS = (
+    "stock_id, stock_code, stock_name, current_price, avg_fair_price, avg_expected_return, main_rating, report_count"
+)
+
+
+def refresh_stock_summary(conn, stock_ids=None):
+    """
+    stock_summary를 다시 계산합니다.
+    stock_ids가 주어지면 해당 종목만 지우고 다시 넣고(증분), None이면 전체를 재구성합니다.
+    호출한 쪽의 트랜잭션(conn) 안에서 실행됩니다.
+    """
+    if stock_ids is None:
+        conn.execute(text("DELETE FROM stock_summary"))
+        conn.execute(
+            text(f"INSERT INTO stock_summary ({_SUMMARY_COLUMNS}) " + _SUMMARY_SELECT.format(where="")),
+            {"min_reports": MIN_REPORTS_FOR_SUMMARY},
+        )
+        return
+
+    where = "WHERE stock_id IN :stock_ids"
+    delete_stmt = text("DELETE FROM stock_summary WHERE stock_id IN :stock_ids").bindparams(
+        bindparam("stock_ids", expanding=True)
+    )
+    insert_stmt = text(
+        f"INSERT INTO stock_summary ({_SUMMARY_COLUMNS}) " + _SUMMARY_SELECT.format(where=where)
+    ).bindparams(bindparam("stock_ids", expanding=True))
+
+    for chunk in _chunks(sorted(stock_ids), BULK_CHUNK_SIZE):
+        conn.execute(delete_stmt, {"stock_ids": chunk})
+        conn.execute(insert_stmt, {"stock_ids": chunk, "min_reports": MIN_REPORTS_FOR_SUMMARY})
+
+
+def rebuild_stock_summary():
+    """stock_summary 전체 재구성 (python db.py / python init_data.py)"""
+    with engine.begin() as conn:
+        refresh_stock_summary(conn)
+        bump_data_version(conn)
+        count = conn.execute(text("SELECT COUNT(*) FROM stock_summary")).scalar_one()
+    print(f"stock_summary 재구성 완료 ({count}개 종목)")
 
 
 # ============================
@@ -394,7 +856,7 @@ if __name__ == "__main__":
     init_db()
     # 네 CSV 파일 경로로 수정
     # load_csv_to_db("리포트_데이터_최종.csv", "pdf_summary_300files.csv")
-    create_stock_summary_view()
+    rebuild_stock_summary()
 
 # ============================
 # DB 조회 및 업데이트 (Pipeline용)
@@ -402,7 +864,7 @@ if __name__ == "__main__":
 
 def get_all_report_urls() -> list[str]:
     """DB에 저장된 모든 리포트의 첨부파일 URL을 반환합니다."""
-    session = SessionLocal()
+    session = ReadSession()
     try:
         # attachment_url이 있는 것만 조회
         urls = session.query(Report.attachment_url).filter(Report.attachment_url.isnot(None)).all()
@@ -411,47 +873,82 @@ def get_all_report_urls() -> list[str]:
     finally:
         session.close()
 
+def create_user(email: str, password_hash: str) -> bool:
+    """사용자를 추가합니다. 같은 이메일이 이미 있으면 (동시에 가입한 경우 포함) 추가하지 않고 False."""
+    stmt = sqlite_insert(User.__table__).values(email=email, password_hash=password_hash)
+    stmt = stmt.on_conflict_do_nothing(index_elements=["email"])
+    with engine.begin() as conn:
+        return conn.execute(stmt).rowcount == 1
+
+def check_reviews_exist(ids) -> set[int]:
+    """
+    report_idx(또는 "644830.pdf" 같은 파일명) 목록 중 리뷰(summary)가 이미 있는 report_idx 집합을 반환합니다.
+    청크마다 IN (...) 조회 한 번 (파일마다 쿼리하지 않음).
+    """
+    report_idxs = {idx for idx in map(to_report_idx, ids) if idx is not None}
+    stmt = text(
+        "SELECT DISTINCT report_idx FROM reports "
+        "WHERE report_idx IN :ids AND summary IS NOT NULL AND summary != ''"
+    ).bindparams(bindparam("ids", expanding=True))
+
+    found = set()
+    with read_engine.connect() as conn:
+        for chunk in _chunks(sorted(report_idxs), BULK_CHUNK_SIZE):
+            found.update(row[0] for row in conn.execute(stmt, {"ids": chunk}))
+    return found
+
+def update_reviews(batch: list[dict]) -> int:
+    """
+    리뷰를 한 트랜잭션으로 일괄 반영합니다.
+    batch: [{"report_idx": 644830 또는 "644830.pdf", "summary", "novice_content", "expert_content"}, ...]
+    반환값: 업데이트된 리포트 수
+    """
+    params = []
+    for item in batch:
+        report_idx = to_report_idx(item["report_idx"])
+        if report_idx is None:
+            continue
+        params.append({
+            "report_idx": report_idx,
+            "summary": item.get("summary"),
+            "novice_content": item.get("novice_content"),
+            "expert_content": item.get("expert_content"),
+        })
+    if not params:
+        return 0
+
+    stmt = text(
+        "UPDATE reports SET summary = :summary, novice_content = :novice_content, "
+        "expert_content = :expert_content WHERE report_idx = :report_idx"
+    )
+    updated = 0
+    with engine.begin() as conn:
+        for chunk in _chunks(params, BULK_CHUNK_SIZE):
+            updated += conn.execute(stmt, chunk).rowcount
+        if updated:
+            bump_data_version(conn)
+    return updated
+
 def update_report_review(filename: str, summary: str, novice: str, expert: str):
     """
-    파일명(예: 12345.pdf)에서 ID를 추출하여 해당 리포트의 리뷰 내용을 업데이트합니다.
+    파일명(예: 12345.pdf)의 report_idx로 해당 리포트의 리뷰 내용을 업데이트합니다.
     """
-    session = SessionLocal()
     try:
-        # filename: "644830.pdf" -> report_id: "644830"
-        report_id = filename.replace(".pdf", "")
-        
-        # attachment_url에 해당 ID가 포함된 리포트 찾기
-        # 예: https://.../report_idx=644830
-        report = session.query(Report).filter(Report.attachment_url.like(f"%{report_id}%")).first()
-        
-        if report:
-            report.summary = summary
-            report.novice_content = novice
-            report.expert_content = expert
-            session.commit()
+        updated = update_reviews([{
+            "report_idx": filename,
+            "summary": summary,
+            "novice_content": novice,
+            "expert_content": expert,
+        }])
+        if updated:
             print(f"Updated review for {filename}")
         else:
             print(f"Report not found for {filename}")
-            
     except Exception as e:
-        session.rollback()
         print(f"Error updating review for {filename}: {e}")
-    finally:
-        session.close()
 
 def check_review_exists(filename: str) -> bool:
     """
     해당 파일명(ID)에 대한 리뷰(summary)가 이미 존재하는지 확인합니다.
     """
-    session = SessionLocal()
-    try:
-        report_id = filename.replace(".pdf", "")
-        # attachment_url에 해당 ID가 포함되고, summary가 비어있지 않은지 확인
-        exists = session.query(Report).filter(
-            Report.attachment_url.like(f"%{report_id}%"),
-            Report.summary.isnot(None),
-            Report.summary != ""
-        ).first()
-        return exists is not None
-    finally:
-        session.close()
+    return to_report_idx(filename) in check_reviews_exist([filename])
@@ -1,57 +1,391 @@
-import requests
+import hashlib
+import json
 import os
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from urllib.parse import urlsplit
 
-def download_pdfs(report_urls):
-    # Use absolute path for the pdf directory
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    pdf_dir = os.path.join(base_dir, "pdf")
+import httpx
 
-    if not os.path.exists(pdf_dir):
-        os.makedirs(pdf_dir)
-        print(f"Created directory: {pdf_dir}")
+from db import parse_report_idx
+from pdf_store import PDFStore, digests_for, file_sha256, link_reports
 
-    # 1. 헤더 설정 (브라우저인 척 속임수)
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+# ============================
+# 다운로드 설정
+# ============================
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PDF_DIR = os.path.join(BASE_DIR, "pdf")
+MANIFEST_NAME = "manifest.jsonl"
+LEGACY_MANIFEST_NAME = "manifest.json"  # 예전 형식 (전체를 한 JSON으로 다시 쓰던 파일) → 처음 열 때 옮김
+STORE_SUBDIR = "store"     # 완료된 PDF: pdf/store/ab/cd/{sha256}.pdf (pdf_store.PDFStore)
+PARTIAL_SUBDIR = "tmp"     # 받는 중인 파일: pdf/tmp/{report_idx}.part (이어받기용)
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+    "Accept-Encoding": "identity",  # Range / Content-Length를 실제 파일 바이트 기준으로 맞추기 위해 압축 전송 안 받음
+}
+DEFAULT_WORKERS = 4        # 동시 다운로드 스레드 수
+DEFAULT_RATE = 1.0         # 호스트당 초당 요청 수 (서버 부하 방지 및 차단 예방)
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 2.0
+MIN_PDF_SIZE = 1000        # 이보다 작으면 유효하지 않은 파일로 간주 (가끔 빈 파일이 옴)
+CHUNK_SIZE = 64 * 1024
+LINK_BATCH_SIZE = 20       # 완료 N건마다 report_pdfs에 일괄 반영
+MANIFEST_COMPACT_RATIO = 2  # 로그 줄 수가 항목 수의 이 배수를 넘으면 열 때 한 번 압축
+
+# manifest 상태값 (받은 파일이 있는지 / 어떤 내용인지는 report_pdfs + 저장소가 기준)
+DONE = "done"
+FAILED = "failed"      # 네트워크/서버 오류 (다음 실행에서 재시도)
+INVALID = "invalid"    # PDF가 아닌 응답 (다음 실행에서 재시도)
+MANIFEST_FIELDS = ("report_idx", "status", "etag", "last_modified", "resumed_from", "error", "updated_at")
+
+
+class InvalidPDF(Exception):
+    pass
+
+
+class HostRateLimiter:
+    """호스트별 요청 간 최소 간격 보장 (스레드 공유)"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url: str):
+        host = urlsplit(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            next_at = self._next_at.get(host, 0.0)
+            delay = next_at - now
+            self._next_at[host] = max(now, next_at) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+# ============================
+# manifest (URL → HTTP 검증자 / 마지막 시도 결과, 덧붙이기 로그)
+# ============================
+
+class Manifest:
+    """
+    pdf/manifest.jsonl - 한 줄에 항목 하나({"url", ...})를 덧붙이는 로그. 같은 URL은 마지막 줄이 유효.
+    완료될 때마다 한 줄만 쓰므로 쓰기량은 완료 건수에 비례하고, 중간에 죽어도 그때까지 완료된 항목은 남음
+    (쓰다 잘린 마지막 줄은 열 때 버림).
+    이어받기 / 조건부 요청에 쓰는 HTTP 상태(MANIFEST_FIELDS)만 기록합니다. 어떤 report_idx의 PDF가 있는지와
+    그 sha256은 report_pdfs + 저장소만 기준으로 삼고 여기에는 두지 않음 (두 곳이 어긋나지 않도록).
+    예전 항목의 sha256 / size는 열 때 recorded_files로 꺼내 두고 지움 (download_pdfs가 report_pdfs에 없는 것만 반영).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: dict[str, dict] = {}
+        self.recorded_files: list[dict] = []  # 예전 항목의 {"report_idx", "sha256", "size"} (status done)
+        self._lock = threading.Lock()
+        lines, damaged = 0, False
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        damaged = True
+                        continue
+                    damaged = damaged or not line.endswith("\n")
+                    self.entries[entry.pop("url")] = entry
+        else:
+            legacy_path = os.path.join(os.path.dirname(path), LEGACY_MANIFEST_NAME)
+            if os.path.exists(legacy_path):
+                with open(legacy_path, encoding="utf-8") as f:
+                    self.entries = json.load(f)
+                damaged = True  # 아래에서 새 형식으로 한 번 써 둠
+        for entry in self.entries.values():
+            if entry.get("sha256") or entry.get("size") is not None:
+                damaged = True  # 예전 항목 → 검증자만 남겨 다시 씀
+                if entry.get("status") == DONE and entry.get("sha256") and entry.get("report_idx") is not None:
+                    self.recorded_files.append({k: entry[k] for k in ("report_idx", "sha256", "size")})
+        self.entries = {url: self._fields(entry) for url, entry in self.entries.items()}
+        if damaged or lines > MANIFEST_COMPACT_RATIO * len(self.entries):
+            self._compact()
+        self._file = open(path, "a", encoding="utf-8")
+
+    @staticmethod
+    def _fields(entry: dict) -> dict:
+        return {k: entry[k] for k in MANIFEST_FIELDS if entry.get(k) is not None}
+
+    def _compact(self):
+        # URL마다 마지막 항목만 남겨 새로 씀 (tmp에 쓴 뒤 교체 → 도중에 죽어도 이전 로그가 남음)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for url, entry in self.entries.items():
+                f.write(json.dumps({"url": url, **entry}, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def get(self, url: str) -> dict | None:
+        with self._lock:
+            return self.entries.get(url)
+
+    def set(self, url: str, entry: dict):
+        entry = self._fields({**entry, "updated_at": datetime.now().isoformat(timespec="seconds")})
+        line = json.dumps({"url": url, **entry}, ensure_ascii=False) + "\n"
+        with self._lock:
+            self.entries[url] = entry
+            self._file.write(line)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def pdf_filename(url: str) -> str:
+    # https://.../downpdf?report_idx=644830 -> 644830.pdf (예전 레이아웃 파일명 / .part 이름)
+    report_idx = parse_report_idx(url)
+    if report_idx is None:
+        return f"{url.split('=')[-1]}.pdf"
+    return f"{report_idx}.pdf"
+
+
+def _validate_pdf(path: str, expected_size: int | None = None):
+    size = os.path.getsize(path)
+    if size < MIN_PDF_SIZE:
+        raise InvalidPDF(f"파일이 너무 작음 ({size} bytes)")
+    if expected_size is not None and size != expected_size:
+        raise InvalidPDF(f"크기 불일치 ({size} != {expected_size})")
+    with open(path, "rb") as f:
+        if f.read(4) != b"%PDF":
+            raise InvalidPDF("%PDF 헤더 없음")
+
+
+# ============================
+# 파일 하나 다운로드
+# ============================
+
+def _expected_size(response: httpx.Response) -> int | None:
+    if response.status_code == 206:
+        # Content-Range: bytes 1000-4999/5000
+        total = response.headers.get("content-range", "").rsplit("/", 1)[-1]
+        return int(total) if total.isdigit() else None
+    length = response.headers.get("content-length")
+    return int(length) if length and length.isdigit() else None
+
+
+def download_one(client: httpx.Client, limiter: HostRateLimiter, store: PDFStore, url: str, part_path: str,
+                 previous: dict | None = None, digest: str | None = None, seen: dict | None = None) -> dict:
+    """
+    url을 받아 저장소(store)에 넣고 manifest 항목 + {"sha256", "size"}를 반환합니다.
+    - part_path에 스트리밍 저장 후 검증이 끝나면 store.put으로 이동 (중간에 죽어도 잘린 파일이 저장소에 남지 않음)
+    - part_path가 남아 있으면 Range 요청으로 이어받기 (If-Range로 서버 파일이 바뀌었으면 처음부터).
+      previous에 .part를 받을 때의 etag / last_modified가 없으면 어느 버전인지 모르므로 버리고 처음부터
+    - digest(report_pdfs에 기록된 현재 파일)가 저장소에 있으면 If-None-Match / If-Modified-Since로 변경 여부만 확인
+    - seen: 응답 헤더를 받는 즉시 그 응답의 {"etag", "last_modified"}를 기록 (본문 도중 실패해도 호출한 쪽이
+      .part와 맞는 검증자로 재시도할 수 있도록)
+    예외가 나면 part_path는 남겨 두고 호출한 쪽에서 재시도합니다.
+    """
+    previous = previous or {}
+    validators = {}
+    if previous.get("etag"):
+        validators["etag"] = previous["etag"]
+    if previous.get("last_modified"):
+        validators["last_modified"] = previous["last_modified"]
+
+    headers = {}
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    if offset and not validators:
+        os.remove(part_path)
+        offset = 0
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        if validators:
+            headers["If-Range"] = validators.get("etag") or validators["last_modified"]
+    elif store.exists(digest):
+        if "etag" in validators:
+            headers["If-None-Match"] = validators["etag"]
+        if "last_modified" in validators:
+            headers["If-Modified-Since"] = validators["last_modified"]
+
+    limiter.wait(url)
+    with client.stream("GET", url, headers=headers) as response:
+        if response.status_code == 304:
+            return {**previous, "status": DONE, "sha256": digest, "not_modified": True}
+        if response.status_code == 416:
+            # 이어받을 범위가 없음 (.part가 이미 전부이거나 서버 파일이 바뀜) → 처음부터 다시
+            os.remove(part_path)
+            raise httpx.HTTPStatusError("416 Range Not Satisfiable", request=response.request, response=response)
+        response.raise_for_status()
+
+        # 206은 If-Range가 맞았다는 뜻 → 기존 검증자 유지. 200이면 새 내용이므로 응답의 검증자만 씀
+        resumed = response.status_code == 206
+        if not resumed:
+            offset = 0
+            validators = {}
+        etag = response.headers.get("etag") or validators.get("etag")
+        last_modified = response.headers.get("last-modified") or validators.get("last_modified")
+        if seen is not None:
+            seen.update(etag=etag, last_modified=last_modified)
+        expected = _expected_size(response)
+
+        sha = hashlib.sha256()
+        if resumed:
+            with open(part_path, "rb") as f:
+                for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+                    sha.update(block)
+        with open(part_path, "ab" if resumed else "wb") as f:
+            for block in response.iter_bytes(CHUNK_SIZE):
+                f.write(block)
+                sha.update(block)
+
+    try:
+        _validate_pdf(part_path, expected)
+    except InvalidPDF:
+        os.remove(part_path)
+        raise
+    size = os.path.getsize(part_path)
+    digest = store.put(part_path, sha.hexdigest())
+    return {
+        "report_idx": parse_report_idx(url),
+        "size": size,
+        "sha256": digest,
+        "status": DONE,
+        "etag": etag,
+        "last_modified": last_modified,
+        "resumed_from": offset or None,
     }
 
-    i = 0
-    # 3. 연속 다운로드 실행
-    for url in report_urls:
-        if not url: # None or empty string check
+
+def _download_with_retry(client, limiter, store, url, part_path, previous, digest, retries, backoff) -> dict:
+    # 시도마다 .part를 받은 응답의 검증자를 이어받음 (예전 항목의 검증자로 다른 버전의 .part에 이어붙이지 않도록)
+    previous = dict(previous or {})
+    failed = {"report_idx": parse_report_idx(url)}
+
+    def give_up(status: str, error: Exception) -> dict:
+        if not os.path.exists(part_path):
+            return {**failed, "status": status, "error": str(error)}
+        # 남은 .part를 다음 실행에서 If-Range로 이어받기 위해 검증자 유지
+        validators = {k: previous[k] for k in ("etag", "last_modified") if previous.get(k)}
+        return {**failed, **validators, "status": status, "error": str(error)}
+
+    for attempt in range(retries + 1):
+        seen: dict = {}
+        try:
+            return download_one(client, limiter, store, url, part_path, previous, digest, seen)
+        except InvalidPDF as e:
+            return {**failed, "status": INVALID, "error": str(e)}
+        except httpx.HTTPStatusError as e:
+            status = e.response.status_code
+            # 4xx(429/416 제외)는 재시도해도 같은 결과
+            if (400 <= status < 500 and status not in (408, 416, 429)) or attempt == retries:
+                return give_up(FAILED, e)
+        except (httpx.HTTPError, OSError) as e:
+            if seen:
+                previous.update(seen)
+            if attempt == retries:
+                return give_up(FAILED, e)
+        time.sleep(backoff * (2 ** attempt))
+
+
+# ============================
+# 다운로드 매니저
+# ============================
+
+def download_pdfs(report_urls, pdf_dir: str = PDF_DIR, *,
+                  workers: int = DEFAULT_WORKERS,
+                  rate: float = DEFAULT_RATE,
+                  retries: int = DEFAULT_RETRIES,
+                  backoff: float = DEFAULT_BACKOFF,
+                  revalidate: bool = False) -> dict[str, int]:
+    """
+    리포트 PDF를 병렬 다운로드해 내용 주소 저장소(pdf_dir/store)에 넣고 report_pdfs 매핑을 기록합니다.
+    - workers개 스레드가 하나의 httpx.Client(keep-alive 커넥션 풀)를 공유
+    - 호스트별 초당 rate회로 요청 제한 (워커 수를 늘려도 이 한도를 넘지 않음)
+    - report_pdfs에 매핑이 있고 저장소에 파일이 있는 report_idx는 요청하지 않음 (revalidate=True면 조건부 요청으로 확인).
+      받은 파일의 기준은 report_pdfs 하나 - manifest에는 이어받기 / 조건부 요청용 HTTP 검증자만 기록
+    - 예전 레이아웃의 pdf_dir/{report_idx}.pdf는 검증을 통과하면 저장소로 옮기고 report_pdfs에 등록
+    반환값: {"downloaded", "not_modified", "skipped", "failed", "invalid", "bytes"}
+    """
+    store = PDFStore(os.path.join(pdf_dir, STORE_SUBDIR))
+    partial_dir = os.path.join(pdf_dir, PARTIAL_SUBDIR)
+    os.makedirs(partial_dir, exist_ok=True)
+    manifest = Manifest(os.path.join(pdf_dir, MANIFEST_NAME))
+    stats = {"downloaded": 0, "not_modified": 0, "skipped": 0, "failed": 0, "invalid": 0, "bytes": 0}
+    links: list[dict] = []  # LINK_BATCH_SIZE건마다 report_pdfs로 일괄 반영
+
+    def link(report_idx: int, digest: str, size: int):
+        links.append({"report_idx": report_idx, "sha256": digest, "size": size})
+        stored[report_idx] = digest
+
+    urls = {}
+    for url in dict.fromkeys(u for u in report_urls if u):  # None / 빈 문자열 / 중복 제거
+        report_idx = parse_report_idx(url)
+        if report_idx is None:
+            print(f"report_idx가 없는 URL은 받지 않음: {url}")
             continue
-            
-        tmp = url.split("=")[-1]
-        file_path = os.path.join(pdf_dir, f"{tmp}.pdf")
+        urls[url] = report_idx
+    stored = digests_for(urls.values())
+
+    # 예전 manifest에만 기록돼 있던 파일 → report_pdfs에 없고 저장소에 있으면 등록 (한 번만)
+    for row in manifest.recorded_files:
+        if row["report_idx"] not in stored and store.exists(row["sha256"]):
+            link(row["report_idx"], row["sha256"], row["size"])
 
-        if os.path.exists(file_path):
-            print(f"다운로드 건너뜀 (이미 존재): {i} ({file_path})")
-            i += 1
+    targets = []
+    for url, report_idx in urls.items():
+        filename = pdf_filename(url)
+        legacy_path = os.path.join(pdf_dir, filename)
+        if not store.exists(stored.get(report_idx)) and os.path.exists(legacy_path):
+            try:
+                _validate_pdf(legacy_path)
+                size, digest = os.path.getsize(legacy_path), file_sha256(legacy_path)
+                store.put(legacy_path, digest)
+                link(report_idx, digest, size)
+            except InvalidPDF:
+                os.remove(legacy_path)  # 예전 방식으로 저장된 잘린 파일
+        if store.exists(stored.get(report_idx)) and not revalidate:
+            stats["skipped"] += 1
             continue
+        part_path = os.path.join(partial_dir, os.path.splitext(filename)[0] + ".part")
+        targets.append((url, report_idx, part_path, manifest.get(url)))
 
-        try:
-            print(f"다운로드 시작: {i} ({url})...", end=" ")
-            
-            # 요청 보내기
-            response = requests.get(url, headers=headers)
-            
-            # 응답 코드가 200(성공)일 때만 저장
-            if response.status_code == 200:
-                # 내용(content)이 비어있지 않은지 확인 (가끔 빈 파일이 올 수 있음)
-                if len(response.content) > 1000: 
-                    with open(file_path, "wb") as f:
-                        f.write(response.content)
-                    print("성공!")
+    print(f"PDF 다운로드 대상 {len(targets)}건 (건너뜀 {stats['skipped']}건, 워커 {workers}, 호스트당 {rate}/s)")
+    limiter = HostRateLimiter(rate)
+    t0 = time.perf_counter()
+    try:
+        with httpx.Client(headers=HEADERS, timeout=60.0, follow_redirects=True,
+                          limits=httpx.Limits(max_connections=workers)) as client, \
+                ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(_download_with_retry, client, limiter, store, url, part_path, entry,
+                            stored.get(report_idx), retries, backoff): (url, report_idx)
+                for url, report_idx, part_path, entry in targets
+            }
+            for i, future in enumerate(as_completed(futures)):
+                url, report_idx = futures[future]
+                entry = future.result()
+                if entry.pop("not_modified", False):
+                    stats["not_modified"] += 1
+                elif entry["status"] == DONE:
+                    stats["downloaded"] += 1
+                    stats["bytes"] += entry["size"]
+                    link(report_idx, entry["sha256"], entry["size"])
                 else:
-                    print("실패 (유효하지 않은 파일)")
-            else:
-                print(f"실패 (Status Code: {response.status_code})")
-
-        except Exception as e:
-            print(f"에러 발생: {e}")
-        i += 1
+                    stats[entry["status"]] += 1
+                    print(f"다운로드 실패 ({entry['status']}): {url} - {entry.get('error')}")
+                manifest.set(url, entry)
 
-        # **중요** 서버 부하 방지 및 차단 예방을 위해 2초 대기
-        time.sleep(2)
+                if (i + 1) % LINK_BATCH_SIZE == 0:
+                    link_reports(links)
+                    links.clear()
+                    print(f"PDF 다운로드 진행 중: {i + 1}/{len(targets)}")
+    finally:
+        # 중단(Ctrl+C 등)돼도 그때까지 완료된 매핑은 반영
+        link_reports(links)
+        manifest.close()
 
+    elapsed = time.perf_counter() - t0
+    print(f"PDF 다운로드 완료 {elapsed:.1f}s (받음 {stats['downloaded']}, 변경없음 {stats['not_modified']}, "
+          f"건너뜀 {stats['skipped']}, 실패 {stats['failed']}, 무효 {stats['invalid']}, "
+          f"{stats['bytes'] / 1e6:.1f}MB)")
+    return stats
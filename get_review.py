@@ -0,0 +1,279 @@
+# get_review.py
+# 리포트 PDF → (요약 / 초보자용 / 전문가용) 리뷰 생성 단계 (pipeline.py 3단계)
+#
+#   python get_review.py                      # 리뷰 없는 리포트 전부 (기본 백엔드: gemini)
+#   python get_review.py --backend stub       # 네트워크 없이 결정적인 가짜 리뷰 (테스트용)
+#   python get_review.py --limit 50 --rpm 10  # 최대 50건, 분당 10회 요청
+import argparse
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+
+from sqlalchemy import text
+
+from db import read_engine, init_db, check_reviews_exist, update_reviews
+from pdf_store import PDFStore, digests_for
+from pdf_text import load_text, extract_texts, cache_dir_for, EXTRACT_WORKERS
+
+# ============================
+# 리뷰 생성 설정
+# ============================
+REVIEW_WORKERS = 4              # 동시에 LLM을 호출하는 스레드 수
+REQUESTS_PER_MINUTE = 15        # 분당 요청 수 한도
+TOKENS_PER_MINUTE = 250_000     # 분당 입력 토큰 한도 (추정치 기준)
+MAX_INPUT_CHARS = 30_000        # LLM에 넘기는 본문 최대 길이 (리포트 앞부분에 핵심이 몰려 있음)
+REVIEW_BATCH_SIZE = 20          # 결과를 DB에 한 번에 반영하는 건수
+DEFAULT_BACKEND = os.environ.get("REVIEW_BACKEND", "gemini")
+GEMINI_MODEL = os.environ.get("GEMINI_MODEL", "gemini-1.5-flash")
+
+
+@dataclass
+class Review:
+    summary: str
+    novice_content: str
+    expert_content: str
+
+
+def estimate_tokens(s: str) -> int:
+    # 한국어는 대략 1~2글자당 1토큰. 예산 계산용이므로 넉넉하게 잡음
+    return len(s) // 2 + 1
+
+
+# ============================
+# LLM 백엔드 (교체 가능)
+# ============================
+# 백엔드는 name 속성과 review(본문) -> Review 메서드를 가진 객체입니다.
+
+REVIEW_PROMPT = """다음은 증권사 리포트 본문입니다. 아래 세 항목을 한국어로 작성해 JSON으로만 답하세요.
+- summary: 리포트 핵심 요약 (3~5문장)
+- novice_content: 주식 초보자도 이해할 수 있게 쉬운 말로 풀어쓴 설명
+- expert_content: 투자 포인트, 밸류에이션, 리스크 중심의 전문가용 분석
+형식: {"summary": "...", "novice_content": "...", "expert_content": "..."}
+
+[리포트 본문]
+"""
+
+
+class GeminiReviewBackend:
+    name = "gemini"
+
+    def __init__(self, model: str = GEMINI_MODEL, api_key: str | None = None):
+        import google.generativeai as genai
+
+        api_key = api_key or os.environ.get("GEMINI_API_KEY") or os.environ.get("GOOGLE_API_KEY")
+        if not api_key:
+            raise RuntimeError("GEMINI_API_KEY(또는 GOOGLE_API_KEY) 환경변수가 필요합니다.")
+        genai.configure(api_key=api_key)
+        self.model = genai.GenerativeModel(
+            model, generation_config={"response_mime_type": "application/json"}
+        )
+
+    def review(self, body: str) -> Review:
+        response = self.model.generate_content(REVIEW_PROMPT + body)
+        data = json.loads(response.text)
+        return Review(
+            summary=str(data["summary"]).strip(),
+            novice_content=str(data["novice_content"]).strip(),
+            expert_content=str(data["expert_content"]).strip(),
+        )
+
+
+class StubReviewBackend:
+    """네트워크 없이 본문만으로 만드는 결정적인 리뷰 (같은 본문이면 항상 같은 결과)."""
+
+    name = "stub"
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay  # LLM 응답 지연 흉내 (벤치마크용)
+
+    def review(self, body: str) -> Review:
+        if self.delay:
+            time.sleep(self.delay)
+        sentences = [s.strip() for s in re.split(r"(?<=[.!?다])\s+", body) if s.strip()]
+        digest = hashlib.sha256(body.encode()).hexdigest()[:12]
+        return Review(
+            summary=" ".join(sentences[:3]),
+            novice_content=f"[stub:{digest}] " + " ".join(sentences[3:5]),
+            expert_content=f"[stub:{digest}] 본문 {len(body)}자, 문장 {len(sentences)}개",
+        )
+
+
+BACKENDS = {"gemini": GeminiReviewBackend, "stub": StubReviewBackend}
+
+
+def get_backend(name: str = DEFAULT_BACKEND):
+    return BACKENDS[name]()
+
+
+# ============================
+# 요청 / 토큰 예산
+# ============================
+
+class RequestBudget:
+    """
+    최근 60초 동안의 요청 수와 토큰 합이 한도를 넘지 않도록 acquire에서 대기합니다 (스레드 공유).
+    한 요청이 tpm보다 크면 창이 빌 때까지 기다린 뒤 단독으로 보냅니다.
+    """
+
+    WINDOW = 60.0
+
+    def __init__(self, rpm: int = REQUESTS_PER_MINUTE, tpm: int = TOKENS_PER_MINUTE):
+        self.rpm = rpm
+        self.tpm = tpm
+        self._sent: deque[tuple[float, int]] = deque()  # (보낸 시각, 토큰 수)
+        self._tokens = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._sent and now - self._sent[0][0] >= self.WINDOW:
+                    self._tokens -= self._sent.popleft()[1]
+                fits_tokens = self._tokens + tokens <= self.tpm or not self._sent
+                if len(self._sent) < self.rpm and fits_tokens:
+                    self._sent.append((now, tokens))
+                    self._tokens += tokens
+                    return
+                delay = self._sent[0][0] + self.WINDOW - now
+            time.sleep(max(delay, 0.01))
+
+
+# ============================
+# 대상 선정
+# ============================
+
+def pending_report_idxs() -> list[int]:
+    """PDF가 저장소에 있고 아직 리뷰(summary)가 없는 report_idx (쿼리 한 번)"""
+    with read_engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT DISTINCT p.report_idx
+            FROM report_pdfs p
+            JOIN reports r ON r.report_idx = p.report_idx
+            WHERE r.summary IS NULL OR r.summary = ''
+            ORDER BY p.report_idx DESC
+        """)).all()
+    return [row[0] for row in rows]
+
+
+# ============================
+# 리뷰 생성 단계
+# ============================
+
+def _review_one(backend, budget: RequestBudget, digest: str, text_cache_dir: str) -> tuple[Review, int, float]:
+    extracted = load_text(digest, text_cache_dir)  # pdf_text 캐시 (extract_texts에서 PDF당 한 번만 추출)
+    body = extracted.text[:MAX_INPUT_CHARS] if extracted else ""
+    if not body:
+        raise ValueError("PDF에서 텍스트를 추출하지 못함")
+    tokens = estimate_tokens(REVIEW_PROMPT) + estimate_tokens(body)
+    budget.acquire(tokens)
+    t0 = time.perf_counter()
+    review = backend.review(body)
+    return review, tokens, time.perf_counter() - t0
+
+
+def generate_reviews(report_idxs=None, *, backend=None,
+                     workers: int = REVIEW_WORKERS,
+                     rpm: int = REQUESTS_PER_MINUTE,
+                     tpm: int = TOKENS_PER_MINUTE,
+                     limit: int | None = None,
+                     extract_workers: int = EXTRACT_WORKERS,
+                     store: PDFStore | None = None) -> dict[str, int]:
+    """
+    리뷰가 없는 리포트의 PDF를 읽어 리뷰를 만들고 db.update_reviews로 일괄 반영합니다.
+    - report_idxs가 None이면 PDF가 있고 리뷰가 없는 리포트 전부, 주어지면 그중 리뷰 없는 것만
+      (이미 리뷰된 것은 check_reviews_exist 한 번으로 거름 — 파일마다 조회하지 않음)
+    - 같은 내용(sha256)의 PDF는 한 번만 LLM에 보내고 결과를 모든 report_idx에 적용
+    - 본문은 pdf_text 캐시에서 읽음 (캐시 없는 PDF는 먼저 extract_workers개 프로세스로 추출)
+    - workers개 스레드로 동시에 호출하되 RequestBudget(rpm/tpm) 안에서만 요청
+    반환값: {"reviewed", "skipped", "missing_pdf", "failed", "tokens"}
+    """
+    backend = backend or get_backend()
+    store = store or PDFStore()
+    stats = {"reviewed": 0, "skipped": 0, "missing_pdf": 0, "failed": 0, "tokens": 0}
+
+    if report_idxs is None:
+        targets = pending_report_idxs()
+    else:
+        requested = list(dict.fromkeys(report_idxs))
+        reviewed = check_reviews_exist(requested)
+        targets = [idx for idx in requested if idx not in reviewed]
+        stats["skipped"] = len(requested) - len(targets)
+
+    # report_idx → sha256 (쿼리 한 번) → 같은 PDF끼리 묶기
+    digests = digests_for(targets)
+    by_digest: dict[str, list[int]] = {}
+    for idx in targets:
+        digest = digests.get(idx)
+        if digest is None or not store.exists(digest):
+            stats["missing_pdf"] += 1
+            continue
+        by_digest.setdefault(digest, []).append(idx)
+    jobs = list(by_digest.items())[:limit] if limit is not None else list(by_digest.items())
+
+    print(f"리뷰 생성 대상 PDF {len(jobs)}개 (리포트 {sum(len(ids) for _, ids in jobs)}건, "
+          f"이미 리뷰됨 {stats['skipped']}, PDF 없음 {stats['missing_pdf']}, 백엔드 {backend.name})")
+    text_cache_dir = cache_dir_for(store)
+    extract_texts([digest for digest, _ in jobs], store=store, cache_dir=text_cache_dir, workers=extract_workers)
+    budget = RequestBudget(rpm, tpm)
+    pending: list[dict] = []
+
+    def flush():
+        if pending:
+            update_reviews(pending)
+            pending.clear()
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_review_one, backend, budget, digest, text_cache_dir): ids for digest, ids in jobs}
+        for i, future in enumerate(as_completed(futures)):
+            ids = futures[future]
+            try:
+                review, tokens, elapsed = future.result()
+            except Exception as e:
+                stats["failed"] += len(ids)
+                print(f"리뷰 생성 실패 {ids}: {e}")
+                continue
+
+            stats["tokens"] += tokens
+            stats["reviewed"] += len(ids)
+            for idx in ids:
+                pending.append({
+                    "report_idx": idx,
+                    "summary": review.summary,
+                    "novice_content": review.novice_content,
+                    "expert_content": review.expert_content,
+                })
+            if len(pending) >= REVIEW_BATCH_SIZE:
+                flush()
+            if (i + 1) % 10 == 0:
+                print(f"리뷰 생성 진행 중: {i + 1}/{len(jobs)} (최근 응답 {elapsed:.1f}s)")
+    flush()
+
+    print(f"리뷰 생성 완료 {time.perf_counter() - t0:.1f}s (생성 {stats['reviewed']}, 실패 {stats['failed']}, "
+          f"건너뜀 {stats['skipped']}, PDF 없음 {stats['missing_pdf']}, 추정 토큰 {stats['tokens']})")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="리포트 리뷰 생성")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default=DEFAULT_BACKEND)
+    parser.add_argument("--workers", type=int, default=REVIEW_WORKERS)
+    parser.add_argument("--rpm", type=int, default=REQUESTS_PER_MINUTE, help="분당 요청 수 한도")
+    parser.add_argument("--tpm", type=int, default=TOKENS_PER_MINUTE, help="분당 토큰 한도")
+    parser.add_argument("--limit", type=int, default=None, help="이번 실행에서 처리할 최대 PDF 수")
+    args = parser.parse_args()
+
+    init_db()
+    generate_reviews(backend=get_backend(args.backend), workers=args.workers,
+                     rpm=args.rpm, tpm=args.tpm, limit=args.limit)
+
+
+if __name__ == "__main__":
+    main()
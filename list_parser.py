@@ -0,0 +1,164 @@
+# list_parser.py
+# 한경 컨센서스 목록 페이지(div.table_style01 표) 파서
+#
+# BeautifulSoup 대신 lxml(C)로 파싱하고, class 속성으로 목록 표를 찾는 XPath로 행/셀을 꺼내
+# 타입이 정해진 레코드로 돌려줍니다. 목록 표가 없는 페이지(차단/오류 페이지 등)는 ListPageError.
+import re
+from dataclasses import dataclass
+from datetime import date
+
+import lxml.etree
+import lxml.html
+
+from db import parse_report_idx
+from stock_matcher import get_matcher
+
+BASE_URL = "https://consensus.hankyung.com"
+
+# 목록 표의 열 순서: 작성일 / 제목 / 적정가격 / 투자의견 / 작성자 / 제공출처 / 기업정보 / 차트 / 첨부파일
+_TABLE_CLASS = "table_style01"
+_TABLE_XPATH = lxml.etree.XPath(
+    f"(//div[contains(concat(' ', normalize-space(@class), ' '), ' {_TABLE_CLASS} ')]//table)[1]"
+)
+_ROWS_XPATH = lxml.etree.XPath(".//tr[position() > 1]")
+_HREF_XPATH = lxml.etree.XPath("(.//a/@href)[1]")
+_MIN_CELLS = 9
+_COMPANY_URL_RE = re.compile(r"'(https?://[^']+)'")  # javascript:popup('http...') 안의 주소
+_NOISE_RE = re.compile(r"[^A-Za-z0-9가-힣]")
+_SPACES_RE = re.compile(r" {2,}")
+_RATING_NOISE = str.maketrans("", "", " \r\n")  # 투자의견 셀의 공백/줄바꿈
+_META_CHARSET_RE = re.compile(rb"<meta[^>]+charset", re.IGNORECASE)
+
+
+class ListPageError(ValueError):
+    """목록 표(div.table_style01 안의 table)가 없는 페이지 - 빈 목록(목록 끝)과 구분하기 위해 예외로 알림"""
+
+
+def remove_noise_and_split_title(title):
+    in_code = ''
+    in_name = ''
+
+    # 종목 목록은 첫 호출 때 디스크 캐시(krx_listing.csv)에서 한 번만 로드
+    matched = get_matcher().match(title)
+    if matched:
+        in_name, in_code = matched
+
+    # 한글, 영어, 숫자 외 노이즈 제거
+    clean_title = _NOISE_RE.sub(' ', title)
+
+    # 기업명 코드 수정
+    clean_title = clean_title.replace(in_code, ' ')
+    clean_title = clean_title.replace(in_name, ' ')
+    clean_title = _SPACES_RE.sub(' ', clean_title)
+
+    if in_name == '': # 기업명이 없는 제목이라면, 데이터에 추가하지 않음
+        return [None]
+    else:
+        return [in_name, in_code, clean_title]
+
+
+@dataclass(slots=True)
+class ListRecord:
+    """목록 표의 리포트 한 건"""
+    written_date: date
+    stock_name: str
+    stock_code: str
+    title: str
+    fair_price: int | None     # 0 / 빈 값이면 None
+    rating: str
+    author: str
+    broker: str
+    company_info_url: str
+    attachment_url: str
+    report_idx: int | None
+
+    def to_report(self) -> dict:
+        """save_reports 입력 형식 (현재가격 / 기대수익률은 services.update_stock_prices에서 채움)"""
+        return {
+            "written_date": self.written_date,
+            "stock_name": self.stock_name,
+            "stock_code": self.stock_code,
+            "title": self.title,
+            "fair_price": self.fair_price,
+            "current_price": None,
+            "expected_return": None,
+            "rating_code": self.rating,
+            "author_name": self.author,
+            "broker_name": self.broker,
+            "company_info_url": self.company_info_url,
+            "attachment_url": self.attachment_url,
+        }
+
+
+def _parse_price(s: str) -> int | None:
+    try:
+        price = int(s.replace(",", "").strip())
+    except ValueError:
+        return None
+    return price or None
+
+
+def _href(td) -> str | None:
+    hrefs = _HREF_XPATH(td)
+    return hrefs[0] if hrefs else None
+
+
+def _document(html: str | bytes):
+    """
+    응답 본문(bytes)은 디코딩하지 않고 lxml에 넘겨 <meta charset>(EUC-KR 등)을 따르게 합니다.
+    문자셋 선언이 없는 본문은 UTF-8로 읽습니다 (lxml 기본값인 Latin-1로 읽으면 한글이 깨짐).
+    """
+    if isinstance(html, bytes) and not _META_CHARSET_RE.search(html):
+        html = html.decode("utf-8", errors="replace")
+    return lxml.html.document_fromstring(html)
+
+
+def iter_records(html: str | bytes, base_url: str = BASE_URL):
+    """
+    목록 페이지 HTML(응답 본문 bytes 또는 str) → ListRecord (제너레이터).
+    종목을 찾지 못한 제목, 링크가 없는 행, 날짜가 잘못된 행은 건너뜁니다.
+    목록 표를 찾지 못하면 ListPageError (표는 있는데 행이 없으면 레코드 없이 끝 = 목록 끝).
+    """
+    if not html or not html.strip():
+        raise ListPageError("빈 응답")
+    tables = _TABLE_XPATH(_document(html))
+    if not tables:
+        raise ListPageError(f"목록 표(div.{_TABLE_CLASS} table)를 찾지 못함")
+    for tr in _ROWS_XPATH(tables[0]):
+        tds = tr.findall("td")
+        if len(tds) < _MIN_CELLS:
+            continue
+
+        title = remove_noise_and_split_title(tds[1].text_content())
+        if title[0] is None:
+            continue
+        company_href = _href(tds[6])
+        match = _COMPANY_URL_RE.search(company_href) if company_href else None
+        pdf_href = _href(tds[8])
+        if match is None or pdf_href is None:
+            continue
+        try:
+            written_date = date.fromisoformat(tds[0].text_content().strip())
+        except ValueError:
+            continue
+
+        attachment_url = base_url + pdf_href
+        stock_name, stock_code, clean_title = title
+        yield ListRecord(
+            written_date=written_date,
+            stock_name=stock_name,
+            stock_code=stock_code,
+            title=clean_title,
+            fair_price=_parse_price(tds[2].text_content()),
+            rating=tds[3].text_content().translate(_RATING_NOISE),
+            author=tds[4].text_content(),
+            broker=tds[5].text_content(),
+            company_info_url=match.group(1),
+            attachment_url=attachment_url,
+            report_idx=parse_report_idx(attachment_url),
+        )
+
+
+def parse_list_page(html: str | bytes, base_url: str = BASE_URL) -> list[ListRecord]:
+    """목록 페이지 HTML에서 리포트 레코드 목록을 추출합니다. 표에 행이 없으면 빈 목록, 표가 없으면 ListPageError."""
+    return list(iter_records(html, base_url))
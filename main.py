@@ -1,26 +1,43 @@
+import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, Request, Depends, HTTPException, status
+from fastapi import FastAPI, Request, Response, Depends, HTTPException, status
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse, JSONResponse
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, text
 from pydantic import BaseModel, EmailStr, constr
-from passlib.context import CryptContext
-from db import SessionLocal, Report, Stock, Broker, Author, User, init_db
-from services import update_stock_prices
+from auth import (
+    hash_password_async, verify_password_async, issue_token, verify_token,
+    start_hash_pool, shutdown_hash_pool, SESSION_COOKIE, SESSION_TTL,
+)
+from db import ReadSession, AsyncReadSession, init_db, create_user, run_db
+from services import price_scheduler
+from accuracy import leaderboards, BOARD_SORTS, MIN_DECIDED, LEADERBOARD_LIMIT
+from stock_suggest import stock_suggester, SUGGEST_LIMIT, SUGGEST_MAX_LIMIT
+from cache import cached_page, response_cache
+from query import (
+    recent_reports, report_page, report_to_dict, review_of, search_reports,
+    find_stocks, top_movers, top_stock_summary, user_by_email,
+    REPORT_PAGE_SIZE, SEARCH_PAGE_SIZE,
+)
 
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     init_db()
-    try:
-        # 주가 업데이트 실행
-        update_stock_prices()
-    except Exception as e:
-        print(f"Startup Error: {e}")
+    # 자동완성 인덱스: DB 종목으로 먼저 만들고, KRX 전체 목록(다운로드 가능)은 백그라운드에서 합침
+    stock_suggester.build(include_listing=False)
+    suggest_task = asyncio.create_task(asyncio.to_thread(stock_suggester.build))
+    # 주가 업데이트는 백그라운드에서 주기적으로 실행 (서버 기동을 막지 않음)
+    price_scheduler.start()
+    # 비밀번호 해시용 프로세스 풀도 미리 띄워 둠 (첫 로그인이 프로세스 기동을 기다리지 않도록)
+    hash_pool_task = asyncio.create_task(asyncio.to_thread(start_hash_pool))
     yield
+    suggest_task.cancel()
+    hash_pool_task.cancel()
+    await price_scheduler.stop()
+    shutdown_hash_pool()
 
 app = FastAPI(lifespan=lifespan)
 
@@ -30,14 +47,26 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 # 2. Jinja2 Templates configuration
 templates = Jinja2Templates(directory="templates")
 
-# Dependency to get DB session
+# Dependency to get DB session (조회는 읽기 전용 연결 풀)
 def get_db():
-    db = SessionLocal()
+    db = ReadSession()
     try:
         yield db
     finally:
         db.close()
 
+# async def 라우트용: 쿼리를 DB 스레드 풀에서 실행 (await db.run(query_fn, ...))
+async def get_async_db():
+    return AsyncReadSession()
+
+@app.get("/api/status/price-refresh")
+def read_price_refresh_status():
+    return price_scheduler.status()
+
+@app.get("/api/status/cache")
+def read_cache_status():
+    return response_cache.stats()
+
 @app.get("/api/items/{item_id}")
 def read_item(item_id: int, q: str | None = None):
     return {"item_id": item_id, "query": q}
@@ -45,23 +74,25 @@ def read_item(item_id: int, q: str | None = None):
 # 3. Routes serving Jinja2 templates
 
 @app.get("/", response_class=HTMLResponse)
-async def read_index(request: Request, db: Session = Depends(get_db)):
-    # 최신 리포트 20개 조회
-    recent_reports = db.query(Report).order_by(Report.written_date.desc()).limit(20).all()
-    return templates.TemplateResponse("index.html", {"request": request, "reports": recent_reports})
+@cached_page
+async def read_index(request: Request, db: AsyncReadSession = Depends(get_async_db)):
+    # 최신 리포트 20개 조회 (종목/애널리스트/증권사 함께 로드)
+    reports = await db.run(recent_reports, limit=20)
+    return templates.TemplateResponse("index.html", {"request": request, "reports": reports})
 
 @app.get("/index.html", response_class=HTMLResponse)
-async def read_index_alias(request: Request, db: Session = Depends(get_db)):
-    # 최신 리포트 20개 조회
-    recent_reports = db.query(Report).order_by(Report.written_date.desc()).limit(20).all()
-    return templates.TemplateResponse("index.html", {"request": request, "reports": recent_reports})
+@cached_page
+async def read_index_alias(request: Request, db: AsyncReadSession = Depends(get_async_db)):
+    # 최신 리포트 20개 조회 (종목/애널리스트/증권사 함께 로드)
+    reports = await db.run(recent_reports, limit=20)
+    return templates.TemplateResponse("index.html", {"request": request, "reports": reports})
 
 @app.get("/card.html", response_class=HTMLResponse)
-async def read_card(request: Request, db: Session = Depends(get_db)):
+@cached_page
+async def read_card(request: Request, db: AsyncReadSession = Depends(get_async_db)):
     # 등락률 기준 상위 3개, 하위 3개 조회
-    top_3 = db.query(Stock).order_by(Stock.daily_change_rate.desc()).limit(3).all()
-    bottom_3 = db.query(Stock).order_by(Stock.daily_change_rate.asc()).limit(3).all()
-    
+    top_3, bottom_3 = await db.run(top_movers, limit=3)
+
     return templates.TemplateResponse("card.html", {
         "request": request,
         "top_3": top_3,
@@ -69,47 +100,104 @@ async def read_card(request: Request, db: Session = Depends(get_db)):
     })
 
 @app.get("/data.html", response_class=HTMLResponse)
-async def read_data(request: Request, q: str | None = None, db: Session = Depends(get_db)):
+async def read_data(request: Request, q: str | None = None, cursor: str | None = None,
+                    db: AsyncReadSession = Depends(get_async_db)):
     if q is None:
         q = "삼성전자"
 
-    # 1. 정확히 일치하는 종목이 있는지 확인
-    exact_stock = db.query(Stock).filter(Stock.stock_name == q).first()
-    
-    if exact_stock:
-        # 정확히 일치하는 종목이 있으면 해당 종목의 리포트 조회
-        query = db.query(Report).filter(Report.stock_id == exact_stock.id)
-    else:
-        # 정확히 일치하는 종목이 없으면 검색어 포함 종목 검색
-        search_term = f"%{q}%"
-        matched_stocks = db.query(Stock).filter(Stock.stock_name.like(search_term)).all()
-        
-        # 검색 결과가 여러 개이거나 없으면 리스트 뷰(search_result.html)로 이동
-        if len(matched_stocks) != 1:
-             # 리포트 개수도 같이 표시하기 위해 join 사용 (선택사항)
-             return templates.TemplateResponse("search_result.html", {
-                 "request": request, 
-                 "stocks": matched_stocks, 
-                 "q": q
-             })
-        else:
-            # 검색 결과가 딱 하나면 그 종목으로 이동
-            query = db.query(Report).filter(Report.stock_id == matched_stocks[0].id)
-            q = matched_stocks[0].stock_name # 검색어를 해당 종목명으로 보정
-
-    # 리포트 조회 (기존 로직 + 정렬)
-    reports = query.order_by(Report.written_date.desc()).all()
-    
-    return templates.TemplateResponse("data.html", {"request": request, "reports": reports, "q": q})
+    # 1. 정확히 일치하는 종목이 있으면 그 종목, 없으면 검색어 포함 종목 검색
+    matched_stocks = await db.run(find_stocks, q)
+
+    # 검색 결과가 여러 개이거나 없으면 리스트 뷰(search_result.html)로 이동
+    if len(matched_stocks) != 1:
+        return templates.TemplateResponse("search_result.html", {
+            "request": request,
+            "stocks": matched_stocks,
+            "q": q
+        })
+    # 검색 결과가 딱 하나면 그 종목으로 이동
+    stock_id = matched_stocks[0].id
+    q = matched_stocks[0].stock_name # 검색어를 해당 종목명으로 보정
+
+    # 리포트 조회 (종목/애널리스트/증권사 함께 로드, 최신순 한 페이지씩)
+    try:
+        reports, next_cursor = await db.run(report_page, stock_id=stock_id, cursor=cursor)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="잘못된 페이지 커서입니다.")
+
+    return templates.TemplateResponse("data.html", {
+        "request": request,
+        "reports": reports,
+        "q": q,
+        "cursor": cursor,
+        "next_cursor": next_cursor,
+    })
+
+@app.get("/api/reports")
+def read_reports_api(
+    stock: str | None = None,
+    broker: str | None = None,
+    author: str | None = None,
+    rating: str | None = None,
+    cursor: str | None = None,
+    limit: int = REPORT_PAGE_SIZE,
+    db: Session = Depends(get_db),
+):
+    # stock: 종목코드, broker/author: 이름, rating: Buy/Sell/Hold/None
+    try:
+        reports, next_cursor = report_page(
+            db, stock_code=stock, broker=broker, author=author, rating=rating, cursor=cursor, limit=limit,
+        )
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="잘못된 페이지 커서입니다.")
+    return {"items": [report_to_dict(r) for r in reports], "next_cursor": next_cursor}
+
+@app.get("/api/search")
+def read_search_api(q: str, limit: int = SEARCH_PAGE_SIZE, offset: int = 0, db: Session = Depends(get_db)):
+    # truncated: 3글자 미만 검색어만 있어 최신 리포트 일부만 찾아본 결과
+    items, next_offset, truncated = search_reports(db, q, limit=limit, offset=offset)
+    return {"query": q, "items": items, "next_offset": next_offset, "truncated": truncated}
+
+@app.get("/api/stocks/suggest")
+def read_stock_suggest(q: str, limit: int = SUGGEST_LIMIT):
+    # 메모리 인덱스만 조회 (DB 접근 없음). q: 종목명/종목코드/초성 접두어
+    limit = max(1, min(limit, SUGGEST_MAX_LIMIT))
+    return [
+        {"code": e.code, "name": e.name, "has_reports": e.has_reports}
+        for e in stock_suggester.suggest(q, limit)
+    ]
+
+# 목표주가 적중 리더보드 (accuracy.report_accuracy 집계, 지표가 바뀌기 전까지 메모리 표에서 정렬만)
+async def _leaderboard(kind: str, sort: str, min_reports: int, limit: int) -> dict:
+    if sort not in BOARD_SORTS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"sort는 {', '.join(BOARD_SORTS)} 중 하나입니다.")
+    limit = max(1, min(limit, 100))
+    items = await run_db(leaderboards.top, kind, sort, min_decided=max(1, min_reports), limit=limit)
+    return {"kind": kind, "sort": sort, "items": items}
+
+@app.get("/api/leaderboard/brokers")
+async def read_broker_leaderboard(sort: str = "hit_rate", min_reports: int = MIN_DECIDED,
+                                  limit: int = LEADERBOARD_LIMIT):
+    return await _leaderboard("broker", sort, min_reports, limit)
+
+@app.get("/api/leaderboard/authors")
+async def read_author_leaderboard(sort: str = "hit_rate", min_reports: int = MIN_DECIDED,
+                                  limit: int = LEADERBOARD_LIMIT):
+    return await _leaderboard("author", sort, min_reports, limit)
+
+@app.get("/api/reports/{report_id}/review")
+def read_report_review(report_id: int, db: Session = Depends(get_db)):
+    review = review_of(db, report_id)
+    if review is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="리포트를 찾을 수 없습니다.")
+    return review
 
 @app.get("/statistic.html", response_class=HTMLResponse)
-async def read_statistic(request: Request, db: Session = Depends(get_db)):
+@cached_page
+async def read_statistic(request: Request, db: AsyncReadSession = Depends(get_async_db)):
     try:
-        # DB View 조회
-        # stock_summary 뷰: stock_code, stock_name, current_price, avg_fair_price, avg_expected_return, main_rating
-        # 뷰 정의에서 이미 COUNT >= 3 조건이 들어있음
-        result = db.execute(text("SELECT * FROM stock_summary ORDER BY avg_expected_return DESC LIMIT 30"))
-        top_30 = result.mappings().all()
+        # 종목 요약 테이블 조회 (avg_expected_return 인덱스 순서로 상위 30개)
+        top_30 = await db.run(top_stock_summary, limit=30)
     except Exception as e:
         print(f"Error reading statistic from DB: {e}")
         top_30 = []
@@ -132,17 +220,6 @@ async def read_forgotpw(request: Request):
 async def read_tmp(request: Request):
     return templates.TemplateResponse("tmp.html", {"request": request})
 
-# =========================
-# 비밀번호 해시 설정 (pbkdf2_sha256)
-# =========================
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
-
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
-
-def verify_password(password: str, password_hash: str) -> bool:
-    return pwd_context.verify(password, password_hash)
-
 # =========================
 # Pydantic 요청/응답 모델
 # =========================
@@ -157,44 +234,85 @@ class LoginRequest(BaseModel):
 class SimpleResponse(BaseModel):
     message: str
 
+class LoginResponse(BaseModel):
+    message: str
+    token: str
+
+class MeResponse(BaseModel):
+    id: int
+    email: str
+
+# =========================
+# 세션 토큰 확인 (DB 조회 없음)
+# =========================
+# 토큰은 로그인 응답의 token (Authorization: Bearer ...) 또는 HttpOnly 쿠키로 받는다.
+async def get_current_user(request: Request) -> dict:
+    token = request.cookies.get(SESSION_COOKIE)
+    scheme, _, credentials = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() == "bearer" and credentials:
+        token = credentials
+    claims = verify_token(token) if token else None
+    if claims is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="로그인이 필요합니다.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return claims
+
 # =========================
 # 회원가입 API
 # =========================
 @app.post("/api/signup", response_model=SimpleResponse)
-def signup(req: SignupRequest, db: Session = Depends(get_db)):
-    existing = db.query(User).filter(User.email == req.email).first()
-    if existing:
+async def signup(req: SignupRequest, db: AsyncReadSession = Depends(get_async_db)):
+    if await db.run(user_by_email, req.email):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="이미 가입된 이메일입니다.",
         )
 
-    pwd_hash = hash_password(req.password)
-    user = User(email=req.email, password_hash=pwd_hash)
-    db.add(user)
-    db.commit()
+    # 해시 계산(느림)은 해시 전용 프로세스 풀에서 → 그동안 다른 요청은 그대로 처리됨
+    pwd_hash = await hash_password_async(req.password)
+    if not await run_db(create_user, req.email, pwd_hash):
+        # 해시하는 사이에 같은 이메일로 먼저 가입된 경우
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="이미 가입된 이메일입니다.",
+        )
 
     return SimpleResponse(message="회원가입 성공")
 
 # =========================
 # 로그인 API
 # =========================
-@app.post("/api/login", response_model=SimpleResponse)
-def login(req: LoginRequest, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == req.email).first()
+@app.post("/api/login", response_model=LoginResponse)
+async def login(req: LoginRequest, response: Response, db: AsyncReadSession = Depends(get_async_db)):
+    user = await db.run(user_by_email, req.email)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="가입되지 않은 이메일입니다.",
         )
 
-    if not verify_password(req.password, user.password_hash):
+    if not await verify_password_async(req.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="비밀번호가 일치하지 않습니다.",
         )
 
-    return SimpleResponse(message="로그인 성공")
+    # 이후 요청은 비밀번호 대신 서명된 세션 토큰으로 확인 (해시 재계산 / DB 조회 없음)
+    token = issue_token(user.id, user.email)
+    response.set_cookie(SESSION_COOKIE, token, max_age=SESSION_TTL, httponly=True, samesite="lax")
+    return LoginResponse(message="로그인 성공", token=token)
+
+@app.get("/api/me", response_model=MeResponse)
+async def read_me(user: dict = Depends(get_current_user)):
+    return MeResponse(id=user["uid"], email=user["email"])
+
+@app.post("/api/logout", response_model=SimpleResponse)
+async def logout(response: Response):
+    response.delete_cookie(SESSION_COOKIE)
+    return SimpleResponse(message="로그아웃")
 
 @app.get("/login_fragment", response_class=HTMLResponse)
 async def get_login_fragment(request: Request):
@@ -0,0 +1,201 @@
+# pdf_store.py
+# 내용 주소(sha256) 기반 PDF 저장소
+#
+#   pdf/store/ab/cd/abcd....pdf   (해시 앞 2+2글자로 2단 샤딩 → 디렉터리 하나에 파일이 몰리지 않음)
+#   reports.db report_pdfs        (report_idx → sha256) - 어떤 리포트의 PDF가 있는지의 유일한 기준
+#                                 (get_pdf의 manifest에는 이어받기용 HTTP 검증자만 있음)
+#
+#   python pdf_store.py stats            # 블롭 수 / 용량 / 매핑 수
+#   python pdf_store.py import           # 예전 pdf/{report_idx}.pdf 파일을 저장소로 이동
+#   python pdf_store.py gc [--dry-run]   # 어떤 report_idx도 가리키지 않는 블롭 삭제
+import argparse
+import hashlib
+import os
+import time
+from datetime import datetime
+
+from sqlalchemy import text, bindparam
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from db import engine, read_engine, init_db, ReportPDF, BULK_CHUNK_SIZE
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_DIR = os.path.join(BASE_DIR, "pdf", "store")
+GC_MIN_AGE = 60 * 60  # 이보다 새 블롭은 GC하지 않음 (다운로드 직후 매핑 저장 전인 파일 보호)
+HASH_CHUNK_SIZE = 64 * 1024
+
+
+def file_sha256(path: str) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+class PDFStore:
+    """sha256 → 파일. 같은 내용의 PDF는 report_idx가 달라도 한 번만 저장됩니다."""
+
+    def __init__(self, root: str = STORE_DIR):
+        self.root = root
+
+    def path_for(self, digest: str) -> str:
+        return os.path.join(self.root, digest[:2], digest[2:4], f"{digest}.pdf")
+
+    def exists(self, digest: str | None) -> bool:
+        return bool(digest) and os.path.exists(self.path_for(digest))
+
+    def put(self, src_path: str, digest: str | None = None) -> str:
+        """
+        src_path 파일을 저장소로 옮기고 sha256을 반환합니다 (src_path는 사라짐).
+        같은 해시가 이미 있으면 새 파일은 버립니다. 같은 파일시스템 안의 os.replace라 원자적입니다.
+        """
+        digest = digest or file_sha256(src_path)
+        dst_path = self.path_for(digest)
+        if os.path.exists(dst_path):
+            os.remove(src_path)
+        else:
+            os.makedirs(os.path.dirname(dst_path), exist_ok=True)
+            os.replace(src_path, dst_path)
+        return digest
+
+    def iter_blobs(self):
+        """(sha256, 경로, stat) 순회. 샤드 디렉터리 단위로 scandir 하므로 한 번에 읽는 목록 크기가 작습니다."""
+        if not os.path.isdir(self.root):
+            return
+        for level1 in os.scandir(self.root):
+            if not level1.is_dir():
+                continue
+            for level2 in os.scandir(level1.path):
+                if not level2.is_dir():
+                    continue
+                for blob in os.scandir(level2.path):
+                    if blob.name.endswith(".pdf"):
+                        yield blob.name[:-4], blob.path, blob.stat()
+
+
+# ============================
+# report_idx → sha256 매핑 (reports.db)
+# ============================
+
+def link_reports(rows: list[dict]):
+    """rows: [{"report_idx", "sha256", "size"}, ...] 를 report_pdfs에 일괄 upsert."""
+    if not rows:
+        return
+    now = datetime.now()
+    params = [{**row, "stored_at": now} for row in rows]
+    stmt = sqlite_insert(ReportPDF.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["report_idx"],
+        set_={"sha256": stmt.excluded.sha256, "size": stmt.excluded.size, "stored_at": stmt.excluded.stored_at},
+    )
+    with engine.begin() as conn:
+        for i in range(0, len(params), BULK_CHUNK_SIZE):
+            conn.execute(stmt, params[i:i + BULK_CHUNK_SIZE])
+
+
+def digests_for(report_idxs) -> dict[int, str]:
+    """report_idx 목록 → {report_idx: sha256} (PDF가 없는 report_idx는 빠짐)"""
+    ids = sorted(set(report_idxs))
+    stmt = text("SELECT report_idx, sha256 FROM report_pdfs WHERE report_idx IN :ids").bindparams(
+        bindparam("ids", expanding=True)
+    )
+    found = {}
+    with read_engine.connect() as conn:
+        for i in range(0, len(ids), BULK_CHUNK_SIZE):
+            found.update(conn.execute(stmt, {"ids": ids[i:i + BULK_CHUNK_SIZE]}).all())
+    return found
+
+
+def pdf_paths(report_idxs, store: PDFStore | None = None) -> dict[int, str]:
+    """report_idx 목록 → {report_idx: 파일 경로} (저장소에 실제로 있는 것만)"""
+    store = store or PDFStore()
+    paths = {}
+    for report_idx, digest in digests_for(report_idxs).items():
+        path = store.path_for(digest)
+        if os.path.exists(path):
+            paths[report_idx] = path
+    return paths
+
+
+def pdf_path(report_idx: int, store: PDFStore | None = None) -> str | None:
+    return pdf_paths([report_idx], store).get(report_idx)
+
+
+def has_pdfs(report_idxs, store: PDFStore | None = None) -> set[int]:
+    """PDF가 저장소에 있는 report_idx 집합"""
+    return set(pdf_paths(report_idxs, store))
+
+
+# ============================
+# 관리 작업
+# ============================
+
+def import_flat_dir(pdf_dir: str, store: PDFStore | None = None) -> dict[str, int]:
+    """예전 레이아웃(pdf_dir/{report_idx}.pdf)의 파일을 저장소로 옮기고 매핑을 기록합니다."""
+    store = store or PDFStore(os.path.join(pdf_dir, "store"))
+    stats = {"imported": 0, "deduplicated": 0}
+    rows = []
+    for entry in os.scandir(pdf_dir):
+        stem, ext = os.path.splitext(entry.name)
+        if not (entry.is_file() and ext == ".pdf" and stem.isdigit()):
+            continue
+        size = entry.stat().st_size
+        digest = file_sha256(entry.path)
+        stats["deduplicated" if store.exists(digest) else "imported"] += 1
+        store.put(entry.path, digest)
+        rows.append({"report_idx": int(stem), "sha256": digest, "size": size})
+    link_reports(rows)
+    print(f"PDF 저장소로 이동 완료 (신규 {stats['imported']}, 중복 {stats['deduplicated']})")
+    return stats
+
+
+def gc(store: PDFStore | None = None, *, min_age: float = GC_MIN_AGE, dry_run: bool = False) -> dict[str, int]:
+    """report_pdfs에서 참조하지 않는 블롭을 삭제합니다."""
+    store = store or PDFStore()
+    with read_engine.connect() as conn:
+        referenced = {row[0] for row in conn.execute(text("SELECT DISTINCT sha256 FROM report_pdfs"))}
+
+    stats = {"blobs": 0, "removed": 0, "freed_bytes": 0}
+    cutoff = time.time() - min_age
+    for digest, path, st in store.iter_blobs():
+        stats["blobs"] += 1
+        if digest in referenced or st.st_mtime > cutoff:
+            continue
+        stats["removed"] += 1
+        stats["freed_bytes"] += st.st_size
+        if not dry_run:
+            os.remove(path)
+    print(f"PDF GC {'(dry-run) ' if dry_run else ''}완료: 블롭 {stats['blobs']}개 중 {stats['removed']}개 삭제, "
+          f"{stats['freed_bytes'] / 1e6:.1f}MB")
+    return stats
+
+
+def store_stats(store: PDFStore | None = None) -> dict[str, int]:
+    store = store or PDFStore()
+    blobs = total = 0
+    for _, _, st in store.iter_blobs():
+        blobs += 1
+        total += st.st_size
+    with read_engine.connect() as conn:
+        links = conn.execute(text("SELECT COUNT(*) FROM report_pdfs")).scalar_one()
+    return {"blobs": blobs, "bytes": total, "links": links}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF 저장소 관리")
+    parser.add_argument("command", choices=["stats", "import", "gc"])
+    parser.add_argument("--dry-run", action="store_true", help="gc: 삭제하지 않고 대상만 집계")
+    args = parser.parse_args()
+
+    init_db()
+    if args.command == "stats":
+        print(store_stats())
+    elif args.command == "import":
+        import_flat_dir(os.path.dirname(STORE_DIR))
+    elif args.command == "gc":
+        gc(dry_run=args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
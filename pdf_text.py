@@ -0,0 +1,263 @@
+# pdf_text.py
+# PDF → 정규화된 텍스트 + 페이지/섹션 청크 추출 (내용 sha256 기준 디스크 캐시)
+#
+#   pdf/text/ab/cd/{sha256}.v{버전}.json.gz  {"pages": [...], "chunks": [{"page", "section", "text"}]}
+#   pdf/text/ab/cd/{sha256}.v{버전}.failed   추출 실패 표시 (오류 메시지). 같은 버전에서는 다시 시도하지 않음
+#
+#   python pdf_text.py                 # 저장소에 있는 PDF 중 캐시 없는 것만 추출
+#   python pdf_text.py --workers 2
+import argparse
+import gzip
+import json
+import os
+import re
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+
+from sqlalchemy import text
+
+from db import read_engine, init_db
+from pdf_store import PDFStore
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEXT_CACHE_DIR = os.path.join(BASE_DIR, "pdf", "text")
+TEXT_CACHE_VERSION = 1     # 정규화/청크 규칙을 바꾸면 올림 (기존 캐시는 다시 추출, 실패한 PDF도 다시 시도)
+CHUNK_CHARS = 1500         # 청크 최대 길이 (문단 경계에서 자름)
+EXTRACT_WORKERS = os.cpu_count() or 1
+SLOW_FILES_SHOWN = 5       # 완료 후 출력하는 느린 파일 수
+
+# 섹션 제목으로 보는 줄: ■ / ▶ / ● / ◆ 로 시작하거나, "1." "2)" 같은 번호 + 짧은 제목
+_SECTION_RE = re.compile(r"^(?:[■▶●◆▣□◎]\s*.{1,40}|\d{1,2}[.)]\s+\S.{0,38})$")
+_PAGE_NUMBER_RE = re.compile(r"^(?:-\s*)?\d{1,3}(?:\s*-)?$|^\d{1,3}\s*/\s*\d{1,3}$")
+
+
+@dataclass
+class Chunk:
+    page: int          # 1부터 시작
+    section: str | None
+    text: str
+
+
+@dataclass
+class ExtractedText:
+    digest: str
+    pages: list[str]
+    chunks: list[Chunk]
+
+    @property
+    def text(self) -> str:
+        return "\n\n".join(self.pages)
+
+
+# ============================
+# 정규화 / 청크 분할
+# ============================
+
+def normalize_page(raw: str) -> str:
+    """전각 문자/합자 정리(NFKC), 공백 정리, 페이지 번호 줄과 빈 줄 제거, 줄 끝 하이픈 이어붙이기"""
+    s = unicodedata.normalize("NFKC", raw)
+    s = re.sub(r"-\n(?=[a-z])", "", s)
+    lines = []
+    for line in s.splitlines():
+        line = re.sub(r"[ \t]+", " ", line).strip()
+        if line and not _PAGE_NUMBER_RE.match(line):
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def split_chunks(pages: list[str], max_chars: int = CHUNK_CHARS) -> list[Chunk]:
+    """페이지 → 섹션 제목 줄 기준으로 나누고, 긴 섹션은 max_chars 이하로 줄 단위로 자릅니다."""
+    chunks: list[Chunk] = []
+    section = None
+    for page_no, page in enumerate(pages, start=1):
+        buf: list[str] = []
+        size = 0
+
+        def flush():
+            nonlocal buf, size
+            if buf:
+                chunks.append(Chunk(page_no, section, "\n".join(buf)))
+            buf, size = [], 0
+
+        for line in page.splitlines():
+            if _SECTION_RE.match(line):
+                flush()
+                section = line.lstrip("■▶●◆▣□◎ ").strip()
+            if buf and size + len(line) > max_chars:
+                flush()
+            # 한 줄이 max_chars보다 길면 그대로 잘라서 넣음
+            while len(line) > max_chars:
+                chunks.append(Chunk(page_no, section, line[:max_chars]))
+                line = line[max_chars:]
+            buf.append(line)
+            size += len(line) + 1
+        flush()
+    return chunks
+
+
+# ============================
+# 캐시
+# ============================
+
+def cache_path(digest: str, cache_dir: str = TEXT_CACHE_DIR) -> str:
+    # 파일명에 버전을 넣어 두면 캐시 여부를 파일을 열지 않고 exists 한 번으로 판단할 수 있음
+    return os.path.join(cache_dir, digest[:2], digest[2:4], f"{digest}.v{TEXT_CACHE_VERSION}.json.gz")
+
+
+def failure_path(digest: str, cache_dir: str = TEXT_CACHE_DIR) -> str:
+    return cache_path(digest, cache_dir).removesuffix(".json.gz") + ".failed"
+
+
+def cache_dir_for(store: PDFStore) -> str:
+    # pdf/store 옆의 pdf/text
+    return os.path.join(os.path.dirname(store.root), "text")
+
+
+def _read_cache(path: str) -> dict | None:
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_cached(digest: str, cache_dir: str = TEXT_CACHE_DIR) -> bool:
+    """이 버전으로 이미 처리한 PDF인지 (추출 결과 또는 실패 표시가 있음)"""
+    return os.path.exists(cache_path(digest, cache_dir)) or has_failed(digest, cache_dir)
+
+
+def has_failed(digest: str, cache_dir: str = TEXT_CACHE_DIR) -> bool:
+    return os.path.exists(failure_path(digest, cache_dir))
+
+
+def _mark_failed(digest: str, cache_dir: str, error: Exception):
+    # 같은 내용(sha256)의 PDF는 같은 버전에서 다시 실패하므로 표시를 남겨 매번 다시 파싱하지 않음
+    path = failure_path(digest, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"{type(error).__name__}: {error}\n")
+
+
+def load_text(digest: str, cache_dir: str = TEXT_CACHE_DIR) -> ExtractedText | None:
+    """캐시된 추출 결과. 아직 추출하지 않았으면 None"""
+    data = _read_cache(cache_path(digest, cache_dir))
+    if data is None:
+        return None
+    return ExtractedText(
+        digest=digest,
+        pages=data["pages"],
+        chunks=[Chunk(c["page"], c["section"], c["text"]) for c in data["chunks"]],
+    )
+
+
+# ============================
+# 추출 (프로세스 풀)
+# ============================
+
+def extract_file(pdf_path: str, digest: str, cache_dir: str = TEXT_CACHE_DIR) -> tuple[int, int]:
+    """PDF 하나를 추출해 캐시에 씁니다. 반환값: (페이지 수, 글자 수)"""
+    from pypdf import PdfReader
+
+    reader = PdfReader(pdf_path)
+    pages = [normalize_page(page.extract_text() or "") for page in reader.pages]
+    chunks = split_chunks(pages)
+    data = {
+        "pages": pages,
+        "chunks": [{"page": c.page, "section": c.section, "text": c.text} for c in chunks],
+    }
+
+    path = cache_path(digest, cache_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+        json.dump(data, f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp_path, path)
+    return len(pages), sum(len(p) for p in pages)
+
+
+def _extract_worker(pdf_path: str, digest: str, cache_dir: str):
+    # 프로세스 풀에서 실행: 본문은 캐시 파일로만 넘기고 부모에는 통계만 돌려줌
+    t0 = time.perf_counter()
+    pages, chars = extract_file(pdf_path, digest, cache_dir)
+    return pages, chars, time.perf_counter() - t0
+
+
+def extract_texts(digests, *, store: PDFStore | None = None,
+                  cache_dir: str | None = None,
+                  workers: int = EXTRACT_WORKERS) -> dict[str, int]:
+    """
+    digests 중 캐시가 없는 PDF만 workers개 프로세스로 추출합니다 (PDF 파싱은 CPU 작업).
+    추출에 실패한 PDF는 실패 표시를 남기고, 이후 실행에서는 건너뜁니다 (previously_failed).
+    파일별 소요시간을 모아 느린 파일을 출력합니다.
+    반환값: {"extracted", "cached", "previously_failed", "missing", "failed", "pages", "chars"}
+    """
+    store = store or PDFStore()
+    cache_dir = cache_dir or cache_dir_for(store)
+    stats = {"extracted": 0, "cached": 0, "previously_failed": 0, "missing": 0, "failed": 0, "pages": 0, "chars": 0}
+    jobs = []
+    for digest in dict.fromkeys(digests):
+        if os.path.exists(cache_path(digest, cache_dir)):
+            stats["cached"] += 1
+        elif has_failed(digest, cache_dir):
+            stats["previously_failed"] += 1
+        elif not store.exists(digest):
+            stats["missing"] += 1
+        else:
+            jobs.append(digest)
+
+    print(f"PDF 텍스트 추출 대상 {len(jobs)}개 (캐시 {stats['cached']}, 이전 실패 {stats['previously_failed']}, "
+          f"PDF 없음 {stats['missing']}, 프로세스 {workers})")
+    if not jobs:
+        return stats  # 전부 캐시에 있으면 프로세스 풀을 띄우지 않음
+    timings: list[tuple[float, str]] = []
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {pool.submit(_extract_worker, store.path_for(d), d, cache_dir): d for d in jobs}
+        for i, future in enumerate(as_completed(futures)):
+            digest = futures[future]
+            try:
+                pages, chars, elapsed = future.result()
+            except Exception as e:
+                stats["failed"] += 1
+                print(f"텍스트 추출 실패 {digest[:12]}: {e}")
+                if not isinstance(e, BrokenProcessPool):  # 워커가 죽은 경우는 PDF 탓이 아닐 수 있으므로 표시하지 않음
+                    _mark_failed(digest, cache_dir, e)
+                continue
+            stats["extracted"] += 1
+            stats["pages"] += pages
+            stats["chars"] += chars
+            timings.append((elapsed, digest))
+            if (i + 1) % 50 == 0:
+                print(f"텍스트 추출 진행 중: {i + 1}/{len(jobs)}")
+
+    wall = time.perf_counter() - t0
+    if timings:
+        timings.sort(reverse=True)
+        total = sum(t for t, _ in timings)
+        print(f"PDF 텍스트 추출 완료 {wall:.1f}s (파일당 평균 {total / len(timings) * 1000:.0f}ms, "
+              f"{stats['pages']}페이지, 실패 {stats['failed']})")
+        for elapsed, digest in timings[:SLOW_FILES_SHOWN]:
+            print(f"  {elapsed * 1000:8.0f}ms  {digest[:12]}")
+    return stats
+
+
+def stored_digests() -> list[str]:
+    """report_pdfs에 연결된 모든 PDF의 sha256"""
+    with read_engine.connect() as conn:
+        return [row[0] for row in conn.execute(text("SELECT DISTINCT sha256 FROM report_pdfs"))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="PDF 텍스트 추출 (캐시)")
+    parser.add_argument("--workers", type=int, default=EXTRACT_WORKERS)
+    args = parser.parse_args()
+
+    init_db()
+    extract_texts(stored_digests(), workers=args.workers)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,12 @@
-import pandas as pd
-import os
 from get_pdf import download_pdfs
 from get_review import generate_reviews
+from pdf_text import extract_texts, stored_digests
 
 def main():
     # 1. Load Report URLs from DB
-    from db import get_all_report_urls
-    
+    from db import get_all_report_urls, init_db
+
+    init_db()  # report_pdfs 등 새 테이블 생성
     print("Fetching report URLs from DB...")
     pdf_urls = get_all_report_urls()
     
@@ -19,7 +19,12 @@ def main():
     download_pdfs(pdf_urls)
     print("PDF download complete.")
 
-    # 3. Generate Reviews
+    # 3. Extract PDF text (캐시에 없는 PDF만)
+    print("Starting PDF text extraction...")
+    extract_texts(stored_digests())
+    print("PDF text extraction complete.")
+
+    # 4. Generate Reviews
     print("Starting review generation...")
     generate_reviews()
     print("Review generation complete.")
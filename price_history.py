@@ -0,0 +1,234 @@
+# price_history.py
+# 일봉 시세(OHLCV) 저장소 - reports.db price_history, 키 (stock_code, date)
+#
+# 주가 갱신(services.update_stock_prices)이 받은 일봉을 버리지 않고 쌓아 두고,
+# 다음 갱신에서는 마지막으로 저장된 날짜부터만 받습니다 (저장된 기간보다 오래된 리포트가 들어오면 그 작성일부터 다시).
+# 기간 조회는 종목별 NumPy 배열로 돌려줍니다.
+#
+#   python price_history.py stats                       # 종목 수 / 봉 수 / 기간
+#   python price_history.py show 005930 --start 2025-01-01
+import argparse
+from dataclasses import dataclass
+from datetime import date, timedelta
+
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from db import read_engine, read_array, init_db, PriceBar, BULK_CHUNK_SIZE
+
+HISTORY_DAYS = 365  # 리포트도 저장된 일봉도 없는 종목은 오늘 - HISTORY_DAYS부터 받음
+BAR_FIELDS = ("open", "high", "low", "close", "volume")
+
+
+@dataclass(slots=True)
+class PriceSeries:
+    """
+    한 종목의 일봉 (날짜 오름차순). 모든 필드는 길이가 같은 NumPy 배열.
+    dates는 datetime64[D], 나머지는 float64 (빈 값은 NaN).
+    """
+    dates: np.ndarray
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+
+# ============================
+# 적재
+# ============================
+
+def save_bars(conn, bars: list[dict]) -> int:
+    """
+    일봉을 한 트랜잭션(conn) 안에서 일괄 저장합니다. bars: [{"stock_code", "date", "open", ..., "volume"}, ...]
+    같은 (종목, 날짜)가 이미 있으면 덮어씀 (장중에 받은 그날 봉이 장 마감 후 값으로 바뀜).
+    """
+    if not bars:
+        return 0
+    stmt = sqlite_insert(PriceBar.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["stock_code", "date"],
+        set_={field: stmt.excluded[field] for field in BAR_FIELDS},
+    )
+    for i in range(0, len(bars), BULK_CHUNK_SIZE):
+        conn.execute(stmt, bars[i:i + BULK_CHUNK_SIZE])
+    return len(bars)
+
+
+# ============================
+# 증분 수집 기준
+# ============================
+
+def bar_date_ranges() -> dict[str, tuple[date, date]]:
+    """종목코드 → (처음, 마지막으로 저장된 일봉 날짜) (일봉이 없는 종목은 빠짐). 종목마다 기본키 양 끝 한 번씩 찾기."""
+    with read_engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT s.stock_code,
+                   (SELECT MIN(p.date) FROM price_history p WHERE p.stock_code = s.stock_code),
+                   (SELECT MAX(p.date) FROM price_history p WHERE p.stock_code = s.stock_code)
+            FROM stocks s
+        """)).all()
+    return {code: (date.fromisoformat(first), date.fromisoformat(last)) for code, first, last in rows if last}
+
+
+def needs_backfill(stored: tuple[date, date] | None, first_needed: date | None, max_gap_days: int = 0) -> bool:
+    """first_needed(가장 오래된 미평가 리포트 작성일)가 저장된 첫 일봉보다 max_gap_days일 넘게 앞서면 True"""
+    return stored is not None and first_needed is not None and (stored[0] - first_needed).days > max_gap_days
+
+
+def fetch_start(stored: tuple[date, date] | None, first_needed: date | None, today: date | None = None,
+                max_gap_days: int = 0) -> date:
+    """
+    시세 소스에 요청할 시작일. stored: 저장된 (첫, 마지막) 일봉 날짜.
+    저장된 일봉이 있으면 마지막 날짜부터 (그 봉은 장중 값일 수 있어 한 번 더 받아 덮어씀),
+    단 first_needed가 저장된 기간보다 앞서면(needs_backfill) first_needed부터 다시 받음 (겹치는 봉은 덮어씀).
+    저장된 일봉이 없으면 first_needed부터, 그것도 없으면 오늘 - HISTORY_DAYS부터.
+    """
+    if stored is not None and not needs_backfill(stored, first_needed, max_gap_days):
+        return stored[1]
+    if first_needed is not None:
+        return first_needed
+    return (today or date.today()) - timedelta(days=HISTORY_DAYS)
+
+
+def latest_closes(conn, stock_codes) -> dict[str, tuple[int, int | None]]:
+    """
+    종목코드 → (마지막 종가, 그 전 종가). BULK_CHUNK_SIZE개 종목마다 쿼리 한 번.
+    종목마다 두 번째로 최근 날짜 이후만 읽도록 범위를 좁혀 (기본키 탐색) 전체 기간을 창 함수에 넣지 않음.
+    """
+    codes = list(dict.fromkeys(stock_codes))
+    result = {}
+    for i in range(0, len(codes), BULK_CHUNK_SIZE):
+        chunk = codes[i:i + BULK_CHUNK_SIZE]
+        values = ", ".join(f"(:c{j})" for j in range(len(chunk)))
+        rows = conn.execute(text(f"""
+            WITH codes(code) AS (VALUES {values})
+            SELECT stock_code, close FROM (
+                SELECT p.stock_code, p.close,
+                       ROW_NUMBER() OVER (PARTITION BY p.stock_code ORDER BY p.date DESC) AS rn
+                FROM codes
+                JOIN price_history p ON p.stock_code = codes.code
+                 AND p.date >= COALESCE((SELECT q.date FROM price_history q WHERE q.stock_code = codes.code
+                                         ORDER BY q.date DESC LIMIT 1 OFFSET 1), '')
+            )
+            WHERE rn <= 2
+            ORDER BY stock_code, rn
+        """), {f"c{j}": code for j, code in enumerate(chunk)})
+        for code, close in rows:
+            if code in result:
+                result[code] = (result[code][0], close)
+            else:
+                result[code] = (close, None)
+    return result
+
+
+# ============================
+# 기간 조회 (NumPy)
+# ============================
+
+def _range_filter(start: date | None, end: date | None) -> tuple[str, dict]:
+    sql, params = "", {}
+    if start is not None:
+        sql += " AND date >= :start"
+        params["start"] = start.isoformat()
+    if end is not None:
+        sql += " AND date <= :end"
+        params["end"] = end.isoformat()
+    return sql, params
+
+
+# DB 커서에서 바로 구조화 배열로 (db.read_array, None → NaN)
+_BAR_DTYPE = np.dtype([("date", "datetime64[D]")] + [(field, np.float64) for field in BAR_FIELDS])
+_CODE_BAR_DTYPE = np.dtype([("stock_code", "U20")] + _BAR_DTYPE.descr)
+
+
+def _to_series(bars: np.ndarray) -> PriceSeries:
+    # 구조화 배열의 필드는 간격이 있는 view → 열마다 연속 배열로 복사 (이후 계산이 빠름)
+    return PriceSeries(*(np.ascontiguousarray(bars[field]) for field in ("date",) + BAR_FIELDS))
+
+
+def load_price_history(stock_code: str, start: date | None = None, end: date | None = None) -> PriceSeries:
+    """한 종목의 [start, end] 일봉"""
+    where, params = _range_filter(start, end)
+    bars = read_array(
+        f"SELECT date, open, high, low, close, volume FROM price_history WHERE stock_code = :code{where} ORDER BY date",
+        {"code": stock_code, **params}, _BAR_DTYPE,
+    )
+    return _to_series(bars)
+
+
+def load_price_table(stock_codes=None, start: date | None = None,
+                     end: date | None = None) -> tuple[np.ndarray, np.ndarray, PriceSeries]:
+    """
+    여러 종목의 [start, end] 일봉을 종목코드 → 날짜 순으로 이어 붙인 열 배열 하나로 읽습니다 (stock_codes가 None이면 전체).
+    반환값: (codes, offsets, bars) - codes[i] 종목의 일봉은 bars의 [offsets[i], offsets[i + 1]) 구간.
+    여러 종목을 한꺼번에 계산할 때 (accuracy 등) 종목별로 나누지 않고 그대로 씀.
+    """
+    where, params = _range_filter(start, end)
+    sql = f"SELECT stock_code, date, open, high, low, close, volume FROM price_history WHERE 1 = 1{where}"
+    if stock_codes is None:
+        rows = read_array(sql + " ORDER BY stock_code, date", params, _CODE_BAR_DTYPE)
+    else:
+        codes = sorted(set(stock_codes))
+        chunks = [np.empty(0, dtype=_CODE_BAR_DTYPE)]
+        for i in range(0, len(codes), BULK_CHUNK_SIZE):
+            chunk = codes[i:i + BULK_CHUNK_SIZE]
+            placeholders = ", ".join(f":c{j}" for j in range(len(chunk)))
+            chunks.append(read_array(
+                sql + f" AND stock_code IN ({placeholders}) ORDER BY stock_code, date",
+                {**params, **{f"c{j}": code for j, code in enumerate(chunk)}}, _CODE_BAR_DTYPE,
+            ))
+        rows = np.concatenate(chunks)
+
+    row_codes = rows["stock_code"]
+    bounds = np.flatnonzero(row_codes[1:] != row_codes[:-1]) + 1
+    offsets = np.concatenate(([0], bounds, [len(rows)])) if len(rows) else np.zeros(1, dtype=np.int64)
+    return row_codes[offsets[:-1]], offsets, _to_series(rows)
+
+
+def load_price_histories(stock_codes=None, start: date | None = None,
+                         end: date | None = None) -> dict[str, PriceSeries]:
+    """
+    여러 종목의 [start, end] 일봉을 한꺼번에 → {종목코드: PriceSeries} (일봉이 없는 종목은 빠짐).
+    stock_codes가 None이면 전체. 한 번에 읽은 열 배열을 종목 경계에서 잘라 나눔 (view, 복사 없음).
+    """
+    codes, offsets, bars = load_price_table(stock_codes, start, end)
+    return {
+        str(code): PriceSeries(*(getattr(bars, f)[s:e] for f in PriceSeries.__slots__))
+        for code, s, e in zip(codes, offsets[:-1], offsets[1:])
+    }
+
+
+def history_stats() -> dict:
+    with read_engine.connect() as conn:
+        row = conn.execute(text(
+            "SELECT COUNT(DISTINCT stock_code), COUNT(*), MIN(date), MAX(date) FROM price_history"
+        )).one()
+    return {"stocks": row[0], "bars": row[1], "first_date": row[2], "last_date": row[3]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="일봉 시세 저장소")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="종목 수 / 봉 수 / 기간")
+    p = sub.add_parser("show", help="한 종목의 일봉 출력")
+    p.add_argument("stock_code")
+    p.add_argument("--start", type=date.fromisoformat)
+    p.add_argument("--end", type=date.fromisoformat)
+    args = parser.parse_args()
+
+    init_db()
+    if args.command == "stats":
+        print(history_stats())
+    elif args.command == "show":
+        series = load_price_history(args.stock_code, args.start, args.end)
+        for i in range(len(series)):
+            print(series.dates[i], *(getattr(series, f)[i] for f in BAR_FIELDS))
+
+
+if __name__ == "__main__":
+    main()
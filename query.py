@@ -1,9 +1,317 @@
 # query_3nf.py
-from sqlalchemy import select
+import base64
+import html
+from datetime import date
+
+from sqlalchemy import bindparam, select, text, tuple_
+from sqlalchemy.orm import Session, defer, joinedload
 from db import (
-    SessionLocal, Stock, Broker, Author, Report
+    ReadSession, Stock, Broker, Author, Report, User
 )
 
+REPORT_PAGE_SIZE = 20     # 목록 한 페이지 크기
+MAX_REPORT_PAGE_SIZE = 100
+
+
+# ============================
+# 리포트 목록 조회 (웹 페이지 공용)
+# ============================
+# 템플릿이 report.stock / report.author / report.broker를 건드리므로
+# 목록 조회는 항상 세 관계를 JOIN으로 같이 가져와서 행 수와 상관없이 쿼리 1번으로 끝낸다.
+# 리뷰 본문(summary / novice / expert)은 목록에 표시하지 않으므로 로드하지 않는다 (review_of()로 따로 조회).
+
+REVIEW_COLUMNS = (Report.summary, Report.novice_content, Report.expert_content)
+
+
+def report_listing(db: Session, with_review: bool = False):
+    query = db.query(Report).options(
+        joinedload(Report.stock),
+        joinedload(Report.author),
+        joinedload(Report.broker),
+    )
+    if not with_review:
+        query = query.options(*(defer(col) for col in REVIEW_COLUMNS))
+    return query
+
+
+def review_of(db: Session, report_id: int) -> dict | None:
+    """리포트 한 건의 리뷰 본문만 조회합니다. 리포트가 없으면 None."""
+    row = db.execute(
+        select(Report.id, *REVIEW_COLUMNS).where(Report.id == report_id)
+    ).mappings().first()
+    return dict(row) if row else None
+
+
+def recent_reports(db: Session, limit: int = 20) -> list[Report]:
+    return (
+        report_listing(db)
+        .order_by(Report.written_date.desc(), Report.id.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def find_stocks(db: Session, q: str) -> list[Stock]:
+    """종목명이 q와 정확히 같은 종목이 있으면 그 종목 하나, 없으면 q를 포함하는 종목 전부"""
+    exact = db.query(Stock).filter(Stock.stock_name == q).first()
+    if exact:
+        return [exact]
+    return db.query(Stock).filter(Stock.stock_name.like(f"%{q}%")).all()
+
+
+def top_movers(db: Session, limit: int = 3) -> tuple[list[Stock], list[Stock]]:
+    """등락률 상위 limit개, 하위 limit개 종목"""
+    top = db.query(Stock).order_by(Stock.daily_change_rate.desc()).limit(limit).all()
+    bottom = db.query(Stock).order_by(Stock.daily_change_rate.asc()).limit(limit).all()
+    return top, bottom
+
+
+def user_by_email(db: Session, email: str) -> User | None:
+    return db.query(User).filter(User.email == email).first()
+
+
+def top_stock_summary(db: Session, limit: int = 30) -> list:
+    """
+    stock_summary를 평균 기대수익률 순으로 limit개 (리포트 3건 이상인 종목만 들어있음, db.refresh_stock_summary)
+    컬럼: stock_code, stock_name, current_price, avg_fair_price, avg_expected_return, main_rating
+    """
+    result = db.execute(text("SELECT * FROM stock_summary ORDER BY avg_expected_return DESC LIMIT :limit"),
+                        {"limit": limit})
+    return result.mappings().all()
+
+
+# ============================
+# keyset 페이지네이션 (written_date, id 내림차순)
+# ============================
+# 커서는 마지막으로 본 리포트의 (written_date, id)를 URL-safe base64로 감싼 문자열.
+# OFFSET과 달리 페이지가 뒤로 가도 인덱스 범위 탐색 한 번으로 끝난다.
+
+def encode_cursor(report: Report) -> str:
+    raw = f"{report.written_date.isoformat()}:{report.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[date, int]:
+    """잘못된 커서면 ValueError"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        written_date, report_id = base64.urlsafe_b64decode(padded.encode()).decode().split(":")
+        return date.fromisoformat(written_date), int(report_id)
+    except Exception as e:
+        raise ValueError(f"invalid cursor: {cursor}") from e
+
+
+def report_page(
+    db: Session,
+    *,
+    stock_id: int | None = None,
+    stock_code: str | None = None,
+    broker: str | None = None,
+    author: str | None = None,
+    rating: str | None = None,
+    cursor: str | None = None,
+    limit: int = REPORT_PAGE_SIZE,
+) -> tuple[list[Report], str | None]:
+    """
+    최신순 리포트 한 페이지와 다음 페이지 커서(마지막 페이지면 None)를 반환합니다.
+    필터는 모두 정확히 일치(종목코드 / 증권사명 / 애널리스트명 / 평가의견 코드).
+    """
+    limit = max(1, min(limit, MAX_REPORT_PAGE_SIZE))
+    query = report_listing(db)
+
+    if stock_id is not None:
+        query = query.filter(Report.stock_id == stock_id)
+    if stock_code:
+        query = query.filter(Report.stock_id == select(Stock.id).where(Stock.stock_code == stock_code).scalar_subquery())
+    if broker:
+        query = query.filter(Report.broker_id == select(Broker.id).where(Broker.name == broker).scalar_subquery())
+    if author:
+        query = query.filter(Report.author_id == select(Author.id).where(Author.name == author).scalar_subquery())
+    if rating:
+        query = query.filter(Report.rating_code == rating)
+    if cursor:
+        last_date, last_id = decode_cursor(cursor)
+        query = query.filter(tuple_(Report.written_date, Report.id) < tuple_(last_date, last_id))
+
+    # 한 건 더 읽어서 다음 페이지 존재 여부 판단
+    rows = query.order_by(Report.written_date.desc(), Report.id.desc()).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+    return rows, None
+
+
+# ============================
+# 전문 검색 (reports_fts)
+# ============================
+SEARCH_PAGE_SIZE = 20
+TRIGRAM_MIN_LEN = 3  # trigram 인덱스는 3글자 이상 검색어만 MATCH로 찾을 수 있음
+SEARCH_LIKE_SCAN_LIMIT = 20_000  # 3글자 미만 검색어만 있을 때 LIKE로 훑는 최신 리포트 수 (전체 스캔 방지)
+
+# bm25 컬럼 가중치: title, summary, expert_content, stock_name, broker_name, author_name
+_BM25_WEIGHTS = "10.0, 2.0, 1.0, 8.0, 3.0, 3.0"
+SNIPPET_RADIUS = 40  # 스니펫에서 일치 구간 앞뒤로 보여줄 글자 수
+
+
+def _fts_phrase(term: str) -> str:
+    return '"' + term.replace('"', '""') + '"'
+
+
+def make_snippet(texts: list[str | None], terms: list[str], radius: int = SNIPPET_RADIUS) -> str | None:
+    """
+    texts 중 검색어가 처음 나오는 필드에서 앞뒤 radius 글자를 잘라
+    HTML 이스케이프 후 일치 구간을 <mark>로 감싼 스니펫을 만듭니다.
+    (FTS5 snippet()은 순위 계산 전 모든 후보 행에 대해 실행돼 느리므로 페이지 행에만 파이썬으로 적용)
+    """
+    lowered_terms = [t.lower() for t in terms]
+    for text_value in texts:
+        if not text_value:
+            continue
+        lowered = text_value.lower()
+        hits = [(pos, len(t)) for t in lowered_terms if (pos := lowered.find(t)) >= 0]
+        if not hits:
+            continue
+        first, _ = min(hits)
+        start, end = max(0, first - radius), min(len(text_value), first + radius)
+        window = text_value[start:end]
+
+        # 창 안의 모든 일치 구간 표시
+        spans = []
+        lowered_window = window.lower()
+        for t in lowered_terms:
+            pos = lowered_window.find(t)
+            while pos >= 0:
+                spans.append((pos, pos + len(t)))
+                pos = lowered_window.find(t, pos + len(t))
+        parts, cursor = [], 0
+        for s_pos, e_pos in sorted(spans):
+            if s_pos < cursor:
+                continue
+            parts.append(html.escape(window[cursor:s_pos]))
+            parts.append("<mark>" + html.escape(window[s_pos:e_pos]) + "</mark>")
+            cursor = e_pos
+        parts.append(html.escape(window[cursor:]))
+        return ("…" if start > 0 else "") + "".join(parts) + ("…" if end < len(text_value) else "")
+    return None
+
+
+def search_reports(db: Session, q: str, *, limit: int = SEARCH_PAGE_SIZE,
+                   offset: int = 0) -> tuple[list[dict], int | None, bool]:
+    """
+    제목 / 요약 / 전문가 리뷰 / 종목·증권사·애널리스트 이름에서 검색어를 찾아
+    관련도(bm25) 순으로 한 페이지, 다음 offset(마지막이면 None), truncated를 반환합니다.
+    공백으로 나뉜 검색어는 모두 포함해야 하며(AND), 3글자 미만 검색어는 LIKE로 거릅니다.
+    3글자 이상 검색어가 있으면 모든 매칭을 SQL에서 bm25로 순위 매김 (누락 없음).
+    3글자 미만 검색어만 있으면 최신 SEARCH_LIKE_SCAN_LIMIT건만 훑고, 그보다 오래된 리포트가 있으면 truncated=True.
+    """
+    terms = q.split()
+    if not terms:
+        return [], None, False
+    limit = max(1, min(limit, MAX_REPORT_PAGE_SIZE))
+    offset = max(0, offset)
+
+    long_terms = [t for t in terms if len(t) >= TRIGRAM_MIN_LEN]
+    short_terms = [t for t in terms if len(t) < TRIGRAM_MIN_LEN]
+
+    where, params = [], {"limit": limit + 1, "offset": offset}
+    truncated = False
+    if long_terms:
+        where.append("reports_fts MATCH :match")
+        params["match"] = " ".join(_fts_phrase(t) for t in long_terms)
+    else:
+        # MATCH로 좁힐 수 없으면 LIKE가 전체를 훑으므로 rowid(=리포트 id) 역순 최신 N건으로 범위 제한
+        cutoff = db.execute(
+            text("SELECT rowid FROM reports_fts ORDER BY rowid DESC LIMIT 1 OFFSET :n"),
+            {"n": SEARCH_LIKE_SCAN_LIMIT - 1},
+        ).scalar()
+        if cutoff is not None:
+            where.append("reports_fts.rowid >= :cutoff")
+            params["cutoff"] = cutoff
+            truncated = db.execute(
+                text("SELECT 1 FROM reports_fts WHERE rowid < :cutoff LIMIT 1"), {"cutoff": cutoff}
+            ).first() is not None
+    for i, term in enumerate(short_terms):
+        # reports_fts 전체를 하나의 문자열처럼 LIKE 검색
+        where.append(
+            f"(reports_fts.title LIKE :like{i} OR reports_fts.stock_name LIKE :like{i} "
+            f"OR reports_fts.broker_name LIKE :like{i} OR reports_fts.author_name LIKE :like{i} "
+            f"OR reports_fts.summary LIKE :like{i} OR reports_fts.expert_content LIKE :like{i})"
+        )
+        params[f"like{i}"] = f"%{term}%"
+
+    score = f"bm25(reports_fts, {_BM25_WEIGHTS})" if long_terms else "0.0"
+
+    # 1) 순위만 계산 (id, score)
+    ranked = db.execute(text(f"""
+        SELECT reports_fts.rowid AS id, {score} AS score
+        FROM reports_fts
+        WHERE {" AND ".join(where)}
+        ORDER BY score, reports_fts.rowid DESC
+        LIMIT :limit OFFSET :offset
+    """), params).all()
+
+    next_offset = offset + limit if len(ranked) > limit else None
+    ranked = ranked[:limit]
+    if not ranked:
+        return [], next_offset, truncated
+
+    # 2) 이번 페이지 행만 PK로 상세 조회
+    detail_stmt = text("""
+        SELECT r.id, r.written_date, r.title, r.rating_code, r.fair_price, r.expected_return,
+               r.summary, r.expert_content,
+               s.stock_code, s.stock_name, b.name AS broker_name, a.name AS author_name
+        FROM reports r
+        JOIN stocks s ON s.id = r.stock_id
+        LEFT JOIN brokers b ON b.id = r.broker_id
+        LEFT JOIN authors a ON a.id = r.author_id
+        WHERE r.id IN :ids
+    """).bindparams(bindparam("ids", expanding=True))
+    details = {row["id"]: row for row in db.execute(detail_stmt, {"ids": [row.id for row in ranked]}).mappings()}
+
+    items = []
+    for report_id, row_score in ranked:
+        row = details.get(report_id)
+        if row is None:
+            continue
+        items.append({
+            "id": row["id"],
+            "written_date": str(row["written_date"]),
+            "title": row["title"],
+            "stock_code": row["stock_code"],
+            "stock_name": row["stock_name"],
+            "broker": row["broker_name"],
+            "author": row["author_name"],
+            "rating": row["rating_code"],
+            "fair_price": row["fair_price"],
+            "expected_return": row["expected_return"],
+            "score": round(0.0 - row_score, 4),  # bm25는 작을수록 관련도가 높으므로 부호 반전
+            "snippet": make_snippet(
+                [row["title"], row["summary"], row["expert_content"],
+                 row["stock_name"], row["broker_name"], row["author_name"]],
+                terms,
+            ),
+        })
+    return items, next_offset, truncated
+
+
+def report_to_dict(r: Report) -> dict:
+    """JSON API용 리포트 요약 (리뷰 본문 제외)"""
+    return {
+        "id": r.id,
+        "written_date": r.written_date.isoformat(),
+        "title": r.title,
+        "stock_code": r.stock.stock_code,
+        "stock_name": r.stock.stock_name,
+        "broker": r.broker.name if r.broker else None,
+        "author": r.author.name if r.author else None,
+        "rating": r.rating_code,
+        "fair_price": r.fair_price,
+        "current_price": r.current_price,  # 리포트 행의 주가 (expected_return을 계산한 값)
+        "stock_current_price": r.stock.current_price,  # 종목 표의 현재가
+        "expected_return": r.expected_return,
+        "attachment_url": r.attachment_url,
+    }
+
 
 # 공통 출력 포맷
 def print_report(r: Report):
@@ -24,9 +332,10 @@ def print_report(r: Report):
 
 # 1) 최신순 전체 리포트 출력
 def show_all_reports():
-    with SessionLocal() as session:
+    with ReadSession() as session:
         results = (
-            session.query(Report)
+            report_listing(session)
+            .options(joinedload(Report.rating))
             .order_by(Report.written_date.desc(), Report.id.desc())
             .all()
         )
@@ -36,13 +345,18 @@ def show_all_reports():
             print_report(r)
 
 
+# 2)~4) 이름 부분 일치 검색: LIKE는 작은 종목/증권사/애널리스트 표에서만 돌리고 리포트는 그 id로 찾음
+# (.join(Report.stock)을 더하면 joinedload가 붙인 JOIN과 별개로 같은 표를 한 번 더 붙임).
+# search_reports(FTS)는 제목/본문까지 찾고 3글자 미만 검색어는 최신 일부만 훑으므로,
+# 이름으로 전부 찾는 여기서는 LIKE를 씀
+
 # 2) 종목명 검색 (전부)
 def search_by_stock_name(name: str):
-    with SessionLocal() as session:
+    with ReadSession() as session:
         results = (
-            session.query(Report)
-            .join(Report.stock)
-            .filter(Stock.stock_name.like(f"%{name}%"))
+            report_listing(session)
+            .options(joinedload(Report.rating))
+            .filter(Report.stock_id.in_(select(Stock.id).where(Stock.stock_name.like(f"%{name}%"))))
             .order_by(Report.written_date.desc())
             .all()
         )
@@ -54,11 +368,11 @@ def search_by_stock_name(name: str):
 
 # 3) 증권사 검색 (전부)
 def search_by_broker(name: str):
-    with SessionLocal() as session:
+    with ReadSession() as session:
         results = (
-            session.query(Report)
-            .join(Report.broker)
-            .filter(Broker.name.like(f"%{name}%"))
+            report_listing(session)
+            .options(joinedload(Report.rating))
+            .filter(Report.broker_id.in_(select(Broker.id).where(Broker.name.like(f"%{name}%"))))
             .order_by(Report.written_date.desc())
             .all()
         )
@@ -70,11 +384,11 @@ def search_by_broker(name: str):
 
 # 4) 애널리스트 검색 (전부)
 def search_by_author(name: str):
-    with SessionLocal() as session:
+    with ReadSession() as session:
         results = (
-            session.query(Report)
-            .join(Report.author)
-            .filter(Author.name.like(f"%{name}%"))
+            report_listing(session)
+            .options(joinedload(Report.rating))
+            .filter(Report.author_id.in_(select(Author.id).where(Author.name.like(f"%{name}%"))))
             .order_by(Report.written_date.desc())
             .all()
         )
@@ -86,9 +400,10 @@ def search_by_author(name: str):
 
 # 5) 평가의견 검색 (전부)
 def search_by_rating(code: str):
-    with SessionLocal() as session:
+    with ReadSession() as session:
         results = (
-            session.query(Report)
+            report_listing(session)
+            .options(joinedload(Report.rating))
             .filter(Report.rating_code == code)
             .order_by(Report.written_date.desc())
             .all()
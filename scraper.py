@@ -1,169 +1,289 @@
-import requests
-from bs4 import BeautifulSoup
-import time
-import pandas as pd
-import FinanceDataReader as fdr
-import re
-import numpy as np
-from get_pdf import download_pdfs
-
-stocks = fdr.StockListing('KRX') # 코스피, 코스닥, 코넥스 전체
-
-stocks['Symbol'] = stocks['Code'].astype(str)
-def remove_noise_and_split_title(title):
-    in_code = ''
-    in_name = ''
-
-    for code, name in stocks[['Symbol', 'Name']].values:
-        if code in title and name in title:
-            in_code = code
-            in_name = name
-
-    # 한글, 영어, 숫자 외 노이즈 제거
-    clean_title = re.sub('[^A-Za-z0-9가-힣]', ' ', title)
-
-    # 기업명 코드 수정
-    clean_title = clean_title.replace(in_code, ' ')
-    clean_title = clean_title.replace(in_name, ' ')
-    while ' ' * 2 in clean_title:
-        clean_title = clean_title.replace(' ' * 2, ' ')
-
-    if in_name == '': # 기업명이 없는 제목이라면, 데이터에 추가하지 않음
-        return [None]
-    else:
-        return [in_name, in_code, clean_title]
+import argparse
+import asyncio
+import itertools
+from datetime import datetime, timedelta
 
-# 수정
-# from datetime import datetime, timedelta
+import httpx
+from db import init_db, save_reports, parse_report_idx, get_high_water_mark, advance_high_water_mark
+from list_parser import BASE_URL, parse_list_page, remove_noise_and_split_title  # noqa: F401
 
-# # 오늘 날짜와 3개월 전 날짜 계산
-# today = datetime.now()
-# three_months_ago = today - timedelta(days=60)
+# ============================================================
+# 크롤링 설정
+# ============================================================
+LIST_URL = BASE_URL + "/analysis/list"
+HEADERS = {'User-Agent': 'Gils'}
+PAGE_SIZE = 20            # 한 페이지에 보이는 리포트 수 (pagenum)
 
-# sdate = three_months_ago.strftime("%Y-%m-%d")
-# edate = today.strftime("%Y-%m-%d")
+DEFAULT_CONCURRENCY = 4   # 동시에 요청 중인 페이지 수 (= keep-alive 커넥션 수)
+DEFAULT_RATE = 3.0        # 전체 요청 속도 제한 (초당 요청 수)
+DEFAULT_RETRIES = 3       # 페이지당 재시도 횟수
+DEFAULT_BACKOFF = 1.0     # 재시도 대기 시간 (초, 시도마다 2배)
+INGEST_BATCH_SIZE = PAGE_SIZE * 5  # 한 트랜잭션으로 커밋하는 행 수
 
-# print(f"검색 기간: {sdate} ~ {edate}")
+SOURCE = "hankyung_consensus"  # crawl_state의 high-water mark 키
+INCREMENTAL_MAX_PAGES = 200    # 증분 수집 안전 상한 (보통은 이미 수집한 리포트에서 멈춤)
+INITIAL_LOOKBACK_DAYS = 30     # high-water mark가 없을 때 처음 수집할 기간
+BACKFILL_PAGES = 12            # 백필 기본 최대 페이지 수
+
+
+def list_params(sdate: str, edate: str, page_no: int) -> dict:
+    return {
+        "sdate": sdate,
+        "edate": edate,
+        "now_page": page_no,
+        "search_value": "",
+        "report_type": "CO",
+        "pagenum": PAGE_SIZE,
+        "search_text": "",
+        "business_code": "",
+    }
 
-base_url = "https://consensus.hankyung.com/analysis/list?sdate=2025-11-07&edate=2025-12-07&now_page=1&search_value=&report_type=CO&pagenum=20&search_text=&business_code="
-data = []
-max_page = 12
-for page_no in range(1, max_page):
-    while True:
-        try:
-            url = base_url.format(page_no)
-            html = requests.get(url, headers={'User-Agent':'Gils'}).content
-            soup = BeautifulSoup(html, 'lxml')
-            print("{}/{}".format(page_no, max_page))
-            break
-        except Exception as e:
-            print(f"Error fetching page {page_no}: {e}")
-            time.sleep(10) # 15분 대기는 너무 기니까 10초로 줄임
-
-    table = soup.find("div", {"class":"table_style01"}).find('table')
-    for tr in table.find_all("tr")[1:]: # 1번째 행부터 순회
-        record = []
-        all_tds = tr.find_all("td") # 한 행의 모든 셀을 저장
-        indices = [0, 1, 2, 3, 4, 5, 6, 8] # 기업정보 열과 차트 열을 제외한 나머지 셀의 인덱스
-
-        for i, td in enumerate(all_tds): # 한 행 순회
-            if i in indices: # 해당하는 열인 경우
-                if i == 1:
-                    record += remove_noise_and_split_title(td.text) # remove_noise_title의 출력과 이어 붙임
-                elif i == 3: # 노이즈가 껴있는 세번째 셀만 따로 처리
-                    record.append(td.text.replace(" ", "").replace("\r","").replace("\n",""))
-                elif i == 6: # 기업정보 링크가 있는 열
-                    a_tag = td.find('a')
-
-                    if a_tag and a_tag.has_attr('href'):
-                        raw_href = a_tag['href']
-
-                        # 정규표현식을 사용하여 'http...' 로 시작하는 주소만 추출
-                        # 패턴 설명: '(http 로 시작하고, ' 가 나오기 전까지의 문자열)' 을 찾음
-                        match = re.search(r"'(https?://[^']+)'", raw_href)
-
-                        if match:
-                            # 찾은 URL을 record에 추가 (이미지상 절대경로이므로 앞에 주소 붙일 필요 없음)
-                            extracted_url = match.group(1)
-                            record.append(extracted_url)
-                        else:
-                            # URL 패턴을 못 찾았을 경우 (혹은 상대경로일 경우 로직 추가 필요)
-                            record.append(None)
-
-                elif i == 8: # 9번째 셀
-                    # 9번째 셀 안의 <a> 태그를 찾습니다.
-                    a_tag = td.find('a')
-                    # <a> 태그가 존재하고 href 속성이 있는지 확인합니다.
-                    if a_tag and a_tag.has_attr('href'):
-                        # href 속성 값을 record에 추가합니다.
-                        record.append("https://consensus.hankyung.com" + a_tag['href'])
-                    else:
-                        # 링크가 없는 경우를 대비해 None을 추가합니다.
-                        record.append(None)
-                else: # 1번째 셀이 아니면:
-                    record.append(td.text) # 셀의 텍스트 값 그대로 입력
-
-        if None not in record: # 레코드에 None이 없으면
-            data.append(record)
-
-    time.sleep(0.3) # 연결 끊김 방지를 위해
-    time.sleep(0.3) # 연결 끊김 방지를 위해
 
 # ============================================================
-# 데이터 DB 저장 (CSV 생성 제거)
+# 비동기 크롤러
 # ============================================================
-from db import save_reports
-
-reports_data = []
-
-# data는 현재 list of lists 형태임.
-# columns = ["작성일", "종목명", "종목코드", "제목", "적정가격", "평가의견", "작성자", "작성기관", "기업정보", "첨부파일"]
-
-for record in data:
-    # record: [date, stock_name, stock_code, title, fair_price, rating, author, broker, company_url, pdf_url]
-    
-    # 적정가격 전처리
-    fair_price_str = str(record[4]).replace(',', '')
-    try:
-        fair_price = int(fair_price_str)
-        if fair_price == 0: fair_price = None
-    except:
-        fair_price = None
-
-    # 현재가격 조회 (여기서 바로 조회하거나, 나중에 update_stock_prices로 채우거나)
-    # 기존 로직 유지: 여기서 조회해서 넣음
-    current_price = None
-    stock_code = record[2]
-    
-    # 간단히 하기 위해 여기서는 현재가격 조회를 생략하고 update_stock_prices에 맡기거나,
-    # 기존처럼 fdr로 조회할 수도 있음. 
-    # 기존 로직이 복잡하므로, 일단 DB에 넣고 나중에 업데이트하는 방식이 깔끔함.
-    # 하지만 "기대수익률" 계산을 위해 필요하다면 여기서 조회해야 함.
-    
-    # 기대수익률 계산은 DB 뷰나 별도 로직으로 빼는게 좋지만, 일단 기존 로직 최대한 유지하려면:
-    # (여기서는 생략하고 DB insert만 집중)
-    
-    report_dict = {
-        "written_date": record[0],
-        "stock_name": record[1],
-        "stock_code": record[2],
-        "title": record[3],
-        "fair_price": fair_price,
-        "current_price": None, # 나중에 업데이트
-        "expected_return": None, # 나중에 업데이트
-        "rating_code": record[5],
-        "author_name": record[6],
-        "broker_name": record[7],
-        "company_info_url": record[8],
-        "attachment_url": record[9],
-    }
-    reports_data.append(report_dict)
+class RateLimiter:
+    """모든 워커가 공유하는 전역 요청 속도 제한 (초당 rate회, 요청 간 최소 간격 보장)"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = asyncio.get_running_loop().time()
+            delay = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def fetch_page(client: httpx.AsyncClient, limiter: RateLimiter, url: str, params: dict,
+                     retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF) -> bytes:
+    """
+    한 페이지를 가져옵니다. 실패 시 retries번까지 지수 백오프로 재시도하고, 그래도 실패하면 예외를 올립니다.
+    본문은 bytes 그대로 돌려줌: 문자셋은 파서(list_parser)가 페이지의 <meta charset>을 보고 정함.
+    """
+    for attempt in range(retries + 1):
+        await limiter.wait()
+        try:
+            response = await client.get(url, params=params)
+            response.raise_for_status()
+            return response.content
+        except httpx.HTTPError as e:
+            if attempt == retries:
+                raise
+            print(f"Error fetching page {params.get('now_page')} (재시도 {attempt + 1}/{retries}): {e}")
+            await asyncio.sleep(backoff * (2 ** attempt))
+
+
+def is_known(record, known_report_idx: int | None) -> bool:
+    """known_report_idx 이하(이미 수집한) 리포트인지. report_idx를 모르는 레코드는 알 수 없으므로 False."""
+    return known_report_idx is not None and record.report_idx is not None and record.report_idx <= known_report_idx
+
+
+def normalize_reports(records, known_report_idx: int | None = None):
+    """
+    파싱된 레코드(list_parser.ListRecord) → save_reports 입력 dict (제너레이터).
+    known_report_idx 이하(이미 수집한) 리포트는 건너뜁니다 (report_idx가 없는 레코드는 그대로 적재, 중복은 save_reports가 거름).
+    """
+    for record in records:
+        if is_known(record, known_report_idx):
+            continue
+        yield record.to_report()
+
+
+async def crawl(sdate: str, edate: str, max_page: int, *,
+                concurrency: int = DEFAULT_CONCURRENCY,
+                rate: float = DEFAULT_RATE,
+                retries: int = DEFAULT_RETRIES,
+                backoff: float = DEFAULT_BACKOFF,
+                list_url: str = LIST_URL,
+                on_reports=save_reports,
+                known_report_idx: int | None = None,
+                batch_size: int = INGEST_BATCH_SIZE,
+                transport: httpx.AsyncBaseTransport | None = None) -> dict:
+    """
+    sdate~edate 기간의 목록 페이지(1~max_page)를 수집해 바로 적재합니다.
+
+        fetch (concurrency개) → [html 큐] → parse → normalize → [행 큐] → ingest (batch_size행씩 커밋)
+
+    - 단계 사이의 큐는 크기가 정해져 있어 뒤 단계가 밀리면 앞 단계가 기다림 (메모리는 수집 길이와 무관)
+    - 하나의 AsyncClient(keep-alive 커넥션 풀)를 모든 요청이 재사용
+    - 전역 RateLimiter로 초당 요청 수 제한, 페이지당 재시도 횟수 제한
+    - 파싱(list_parser)과 적재(on_reports, 기본: db.save_reports)는 스레드에서 실행해 요청을 막지 않음
+    - 빈 페이지가 나오면 그 뒤 페이지는 요청하지 않음
+    - known_report_idx가 주어지면 그 이하(이미 수집한) 리포트는 버리고,
+      그런 리포트가 나온 페이지에서 멈춤 (목록은 최신순이므로 뒤 페이지는 전부 수집된 것)
+    - 중간에 예외/중단이 나도 그때까지 파싱된 행은 모두 커밋하고 끝냄
+    - transport: httpx 전송 계층 교체용 (검사에서 httpx.MockTransport로 네트워크 없이 실행)
+    """
+    limiter = RateLimiter(rate)
+    page_numbers = itertools.count(1)  # 다음에 요청할 페이지 번호 (미리 큐에 쌓아 두지 않음)
+    html_queue: asyncio.Queue[tuple[int, bytes] | None] = asyncio.Queue(maxsize=concurrency)
+    row_queue: asyncio.Queue[list[dict] | None] = asyncio.Queue(maxsize=concurrency * 2)
+
+    stats = {"pages": 0, "failed_pages": 0, "reports": 0, "inserted": 0, "skipped": 0, "batches": 0,
+             "no_report_idx": 0, "reached_known": False, "reached_end": False,
+             "max_report_idx": None, "max_written_date": None}
+    last_page = max_page
+
+    async def fetch_worker(client: httpx.AsyncClient):
+        while (page_no := next(page_numbers)) <= last_page:
+            try:
+                html = await fetch_page(client, limiter, list_url, list_params(sdate, edate, page_no),
+                                        retries=retries, backoff=backoff)
+            except httpx.HTTPError as e:
+                print(f"페이지 {page_no} 수집 실패: {e}")
+                stats["failed_pages"] += 1
+                continue
+            await html_queue.put((page_no, html))
+
+    ingest_errors: list[Exception] = []
+
+    async def parse_worker():
+        nonlocal last_page
+        while (item := await html_queue.get()) is not None:
+            page_no, html = item
+            try:
+                records = await asyncio.to_thread(parse_list_page, html)
+            except Exception as e:
+                print(f"페이지 {page_no} 파싱 실패: {e}")
+                stats["failed_pages"] += 1
+                continue
+            stats["pages"] += 1
+            print("{}/{}".format(page_no, max_page))
+            if not records:
+                # 목록 끝: 이후 페이지는 요청하지 않음
+                stats["reached_end"] = True
+                last_page = min(last_page, page_no)
+                continue
+            stats["no_report_idx"] += sum(record.report_idx is None for record in records)
+            reports = list(normalize_reports(records, known_report_idx))
+            if len(reports) < len(records):
+                # report_idx로 확인된 이미 수집한 리포트가 있을 때만 (report_idx가 없는 행은 멈출 근거가 아님)
+                stats["reached_known"] = True
+                last_page = min(last_page, page_no)
+            if reports:
+                await row_queue.put(reports)
+
+    async def flush(batch: list[dict]):
+        # save_reports는 동기 DB 작업이므로 이벤트 루프 밖에서 실행 (배치마다 한 트랜잭션)
+        result = await asyncio.to_thread(on_reports, batch)
+        stats["reports"] += len(batch)
+        stats["batches"] += 1
+        if result:
+            stats["inserted"] += result["inserted"]
+            stats["skipped"] += result["skipped"]
+        for r in batch:
+            report_idx = parse_report_idx(r["attachment_url"])
+            if report_idx is not None and (stats["max_report_idx"] is None or report_idx > stats["max_report_idx"]):
+                stats["max_report_idx"] = report_idx
+                stats["max_written_date"] = r["written_date"]
+
+    async def ingest_worker():
+        nonlocal last_page
+        batch: list[dict] = []
+        while (reports := await row_queue.get()) is not None:
+            if ingest_errors:
+                continue  # 적재 실패 후에는 앞 단계가 막히지 않도록 큐만 비움
+            batch.extend(reports)
+            if len(batch) >= batch_size:
+                try:
+                    await flush(batch)
+                except Exception as e:
+                    ingest_errors.append(e)
+                    last_page = 0  # 더 이상 페이지를 요청하지 않음
+                batch = []
+        if batch and not ingest_errors:
+            await flush(batch)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(headers=HEADERS, limits=limits, timeout=20.0, transport=transport) as client:
+        parse_task = asyncio.create_task(parse_worker())
+        ingest_task = asyncio.create_task(ingest_worker())
+        try:
+            await asyncio.gather(*(fetch_worker(client) for _ in range(concurrency)))
+        finally:
+            # 앞 단계부터 차례로 종료 신호를 보내 남은 페이지/행을 모두 처리한 뒤 끝냄
+            await html_queue.put(None)
+            await parse_task
+            await row_queue.put(None)
+            await ingest_task
+    if ingest_errors:
+        raise ingest_errors[0]
+
+    return stats
+
+
+def scrape(sdate: str, edate: str, max_page: int, **kwargs) -> dict:
+    """crawl()의 동기 래퍼 (스크립트 / 다른 모듈에서 호출용)"""
+    return asyncio.run(crawl(sdate, edate, max_page, **kwargs))
+
+
+def scrape_incremental(source: str = SOURCE, *, max_page: int = INCREMENTAL_MAX_PAGES,
+                       lookback_days: int = INITIAL_LOOKBACK_DAYS, **kwargs) -> dict:
+    """
+    high-water mark 이후의 새 리포트만 수집합니다.
+    - 기간: high-water mark 날짜(같은 날 늦게 올라온 리포트 포함) ~ 오늘
+      (기록이 없으면 오늘부터 lookback_days일 전까지)
+    - 이미 수집한 report_idx가 나오는 페이지에서 멈추므로 평소에는 몇 페이지만 요청
+    - 실패한 페이지가 없고, 이미 수집한 리포트나 목록 끝까지 닿았을 때만 high-water mark를 올림
+      (max_page에서 끊긴 경우 그 뒤와 예전 high-water mark 사이가 빠진 채로 건너뛰지 않도록)
+    """
+    last_date, last_idx = get_high_water_mark(source)
+    today = datetime.now().date()
+    sdate = last_date or today - timedelta(days=lookback_days)
+    print(f"증분 수집: {sdate} ~ {today} (high-water mark report_idx={last_idx})")
+
+    stats = scrape(sdate.strftime("%Y-%m-%d"), today.strftime("%Y-%m-%d"), max_page,
+                   known_report_idx=last_idx, **kwargs)
+    complete = stats["reached_known"] or stats["reached_end"]
+    if stats["failed_pages"] == 0 and complete and stats["max_report_idx"] is not None:
+        advance_high_water_mark(source, stats["max_written_date"], stats["max_report_idx"])
+        print(f"high-water mark 갱신: report_idx={stats['max_report_idx']} ({stats['max_written_date']})")
+    elif stats["failed_pages"]:
+        print("실패한 페이지가 있어 high-water mark를 유지합니다 (다음 실행에서 다시 수집)")
+    elif not complete:
+        print(f"{max_page}페이지 안에서 이미 수집한 리포트에 닿지 못해 high-water mark를 유지합니다 "
+              f"(--pages를 늘리거나 --backfill로 남은 구간을 수집)")
+    return stats
+
+
+def main():
+    today = datetime.now()
+    parser = argparse.ArgumentParser(description="한경 컨센서스 리포트 수집 (기본: high-water mark 이후 증분 수집)")
+    parser.add_argument("--backfill", action="store_true",
+                        help="--sdate~--edate 기간을 high-water mark와 관계없이 수집 (high-water mark는 바꾸지 않음)")
+    parser.add_argument("--sdate", default=(today - timedelta(days=INITIAL_LOOKBACK_DAYS)).strftime("%Y-%m-%d"))
+    parser.add_argument("--edate", default=today.strftime("%Y-%m-%d"))
+    parser.add_argument("--pages", type=int, default=None,
+                        help=f"최대 페이지 수 (기본: 백필 {BACKFILL_PAGES}, 증분 {INCREMENTAL_MAX_PAGES})")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="초당 최대 요청 수")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES)
+    args = parser.parse_args()
+
+    init_db()
+    options = {"concurrency": args.concurrency, "rate": args.rate, "retries": args.retries}
+    if args.backfill:
+        print(f"백필 기간: {args.sdate} ~ {args.edate}")
+        stats = scrape(args.sdate, args.edate, args.pages or BACKFILL_PAGES, **options)
+    else:
+        stats = scrape_incremental(max_page=args.pages or INCREMENTAL_MAX_PAGES, **options)
+    print(f"수집 완료: 페이지 {stats['pages']}개 (실패 {stats['failed_pages']}개), "
+          f"리포트 {stats['reports']}건 → 신규 {stats['inserted']}건, 중복 {stats['skipped']}건")
+    if stats["no_report_idx"]:
+        print(f"report_idx 없는 행 {stats['no_report_idx']}건 (이미 수집했는지 판단하지 않고 적재)")
+
+    # PDF 다운로드 실행 (필요하다면)
+    # print("PDF 다운로드를 시작합니다...")
+    # from db import get_all_report_urls
+    # from get_pdf import download_pdfs
+    # download_pdfs(get_all_report_urls())
+    # print("PDF 다운로드 완료.")
 
-print(f"총 {len(reports_data)}개의 리포트 데이터를 DB에 저장합니다.")
-save_reports(reports_data)
 
-# PDF 다운로드 실행 (필요하다면)
-# print("PDF 다운로드를 시작합니다...")
-# pdf_urls = [r['attachment_url'] for r in reports_data if r['attachment_url']]
-# download_pdfs(pdf_urls)
-# print("PDF 다운로드 완료.")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
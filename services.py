@@ -1,46 +1,326 @@
-from db import SessionLocal, Stock
-import FinanceDataReader as fdr
-from datetime import datetime, timedelta
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import date, datetime, time as dtime, timedelta
+from zoneinfo import ZoneInfo
 
-def update_stock_prices():
+from sqlalchemy import text
+
+from db import engine, read_engine, refresh_stock_summary, bump_data_version
+from accuracy import MAX_ENTRY_GAP_DAYS, refresh_report_accuracy
+from price_history import bar_date_ranges, fetch_start, latest_closes, needs_backfill, save_bars
+
+# ============================
+# 주가 갱신 설정
+# ============================
+PRICE_WORKERS = 8           # 동시에 시세를 조회하는 스레드 수
+PRICE_TTL = timedelta(hours=1)  # 이 시간 안에 갱신된 종목은 건너뜀
+PRICE_BATCH_SIZE = 100      # DB에 한 번에 반영하는 종목 수
+PRICE_REFRESH_INTERVAL = 30 * 60  # 백그라운드 주가 갱신 주기 (초)
+PRICE_STOP_TIMEOUT = 30.0   # 서버 종료 시 진행 중인 갱신이 받은 결과를 반영하고 끝나기를 기다리는 최대 시간 (초)
+MARKET_TZ = ZoneInfo("Asia/Seoul")
+MARKET_CLOSE = dtime(15, 30)  # 장 마감 이후에 받은 일봉은 그날 값이 확정된 것
+
+
+@dataclass
+class Quote:
+    price: int
+    change_rate: float | None = None  # 등락률 (%, 예: 1.2)
+
+
+# ============================
+# 시세 소스 (교체 가능)
+# ============================
+# 시세 소스는 (종목코드, 시작일)을 받아 그날부터의 일봉 목록
+# [{"date", "open", "high", "low", "close", "volume"}, ...]을 반환하는 함수입니다.
+# 받은 일봉은 price_history에 쌓이므로 다음 갱신에서는 마지막 저장 날짜부터만 요청합니다.
+# 테스트에서는 FinanceDataReader 대신 로컬 가짜 함수를 넘기면 됩니다.
+
+def _int_or_none(value):
+    return None if value is None or value != value else int(value)  # NaN → None
+
+
+def fdr_bar_source(stock_code: str, start: date) -> list[dict]:
+    import FinanceDataReader as fdr
+
+    df = fdr.DataReader(stock_code, start)
+    return [
+        {
+            "date": ts.date(),
+            "open": _int_or_none(row.Open),
+            "high": _int_or_none(row.High),
+            "low": _int_or_none(row.Low),
+            "close": int(row.Close),
+            "volume": _int_or_none(row.Volume),
+        }
+        for ts, row in zip(df.index, df.itertuples(index=False))
+        if row.Close == row.Close  # 종가 없는 행(NaN) 제외
+    ]
+
+
+def last_market_close(now: datetime | None = None) -> datetime:
+    """
+    now 이전의 가장 최근 장 마감 시각 (서버 로컬 시각, tz 없음). 주말은 건너뛰고 공휴일은 고려하지 않음
+    → 공휴일에는 한 번 더 받아 볼 뿐 결과는 같음.
+    """
+    now_kst = (now.astimezone() if now else datetime.now().astimezone()).astimezone(MARKET_TZ)
+    day = now_kst.date()
+    if now_kst.time() < MARKET_CLOSE:
+        day -= timedelta(days=1)
+    while day.weekday() >= 5:
+        day -= timedelta(days=1)
+    return datetime.combine(day, MARKET_CLOSE, tzinfo=MARKET_TZ).astimezone().replace(tzinfo=None)
+
+
+def quote_from_closes(close: int, prev_close: int | None) -> Quote:
+    # 등락률 (%, 소수 둘째 자리) = 전일 종가 대비
+    change_rate = None
+    if prev_close:
+        change_rate = round((close - prev_close) * 100.0 / prev_close, 2)
+    return Quote(price=close, change_rate=change_rate)
+
+
+# ============================
+# DB 반영 (배치 단위 set-based UPDATE)
+# ============================
+
+def _apply_quotes(conn, quotes: list[tuple[int, Quote]], updated_at: datetime):
+    conn.execute(text("""
+        CREATE TEMP TABLE IF NOT EXISTS price_updates (
+            stock_id INTEGER PRIMARY KEY,
+            price INTEGER NOT NULL,
+            change_rate FLOAT
+        )
+    """))
+    conn.execute(text("DELETE FROM price_updates"))
+    conn.execute(
+        text("INSERT INTO price_updates (stock_id, price, change_rate) VALUES (:stock_id, :price, :change_rate)"),
+        [{"stock_id": stock_id, "price": q.price, "change_rate": q.change_rate} for stock_id, q in quotes],
+    )
+
+    conn.execute(text("""
+        UPDATE stocks
+        SET current_price = u.price,
+            daily_change_rate = COALESCE(u.change_rate, stocks.daily_change_rate),
+            price_updated_at = :updated_at
+        FROM price_updates u
+        WHERE stocks.id = u.stock_id
+    """), {"updated_at": updated_at})
+
+    # 기대수익률 = (적정주가 - 현재주가) / 현재주가 * 100
+    conn.execute(text("""
+        UPDATE reports
+        SET current_price = u.price,
+            expected_return = CASE
+                WHEN reports.fair_price AND u.price > 0
+                THEN ROUND((reports.fair_price - u.price) * 100.0 / u.price, 2)
+                ELSE NULL
+            END
+        FROM price_updates u
+        WHERE reports.stock_id = u.stock_id
+    """))
+    conn.execute(text("DELETE FROM price_updates"))
+
+    # 현재가/기대수익률이 바뀐 종목만 요약 테이블 갱신
+    refresh_stock_summary(conn, [stock_id for stock_id, _ in quotes])
+    bump_data_version(conn)
+
+
+def update_stock_prices(bar_source=fdr_bar_source, *,
+                        max_workers: int = PRICE_WORKERS,
+                        ttl: timedelta | None = PRICE_TTL,
+                        batch_size: int = PRICE_BATCH_SIZE,
+                        force: bool = False,
+                        stop_event: threading.Event | None = None) -> dict[str, int]:
+    """
+    모든 종목의 일봉을 이어 받아 price_history에 쌓고, 현재가/등락률과 리포트의 기대수익률을 다시 계산합니다.
+    - 종목마다 마지막으로 저장된 날짜부터만 요청 (처음이면 그 종목의 가장 오래된 미평가 리포트 작성일부터,
+      저장된 첫 일봉보다 오래된 미평가 리포트가 있으면 그 작성일부터 다시)
+    - 시세 조회는 max_workers개 스레드에서 병렬로 실행
+    - ttl 안에 갱신된 종목, 마지막 장 마감 뒤에 이미 받은 종목은 건너뜀 (force=True면 전부 갱신).
+      단 앞쪽 일봉을 더 받아야 하는 종목은 장 마감 조건과 상관없이 받음 (ttl은 그대로 → 상장 전 리포트처럼
+      채울 수 없는 종목도 ttl마다 한 번만 요청)
+    - 조회 결과는 batch_size개 종목씩 한 트랜잭션으로 일봉 저장 + UPDATE ... FROM 반영
+    - stop_event가 set되면 남은 조회를 취소하고 그때까지 받은 결과만 반영
+    반환값: {"updated", "failed", "skipped", "bars"} (bars: 받아서 저장한 일봉 수)
+    """
     print("주가 업데이트 시작...")
-    session = SessionLocal()
-    try:
-        stocks = session.query(Stock).all()
-        total = len(stocks)
-        for i, stock in enumerate(stocks):
+    now = datetime.now()
+    with read_engine.connect() as conn:
+        stocks = conn.execute(text("""
+            SELECT s.id, s.stock_code, s.stock_name, s.price_updated_at,
+                   (SELECT MIN(r.written_date) FROM reports r
+                    LEFT JOIN report_accuracy a ON a.report_id = r.id
+                    WHERE r.stock_id = s.id AND r.fair_price > 0 AND (a.resolved IS NULL OR a.resolved = 0))
+            FROM stocks s
+        """)).all()
+    stored_ranges = bar_date_ranges()
+
+    # 마지막 장 마감 뒤에 이미 받은 종목은 새 일봉이 있을 수 없으므로 시세 소스를 부르지 않음
+    market_close = last_market_close(now)
+
+    targets = []
+    for stock_id, stock_code, stock_name, updated_at, first_report in stocks:
+        if isinstance(first_report, str):
+            first_report = date.fromisoformat(first_report)
+        stored = stored_ranges.get(stock_code)
+        if not force and updated_at is not None:
+            if isinstance(updated_at, str):
+                updated_at = datetime.fromisoformat(updated_at)
+            if ttl is not None and now - updated_at < ttl:
+                continue
+            if (updated_at >= market_close and stored is not None
+                    and not needs_backfill(stored, first_report, MAX_ENTRY_GAP_DAYS)):
+                continue
+        start = fetch_start(stored, first_report, now.date(), MAX_ENTRY_GAP_DAYS)
+        targets.append((stock_id, stock_code, stock_name, start))
+
+    stats = {"updated": 0, "failed": 0, "skipped": len(stocks) - len(targets), "bars": 0}
+    total = len(targets)
+    pending: list[tuple[int, str, list[dict]]] = []
+
+    def flush():
+        if not pending:
+            return
+        with engine.begin() as conn:
+            stats["bars"] += save_bars(conn, [
+                {"stock_code": stock_code, **bar} for _, stock_code, bars in pending for bar in bars
+            ])
+            # 현재가 / 등락률은 저장된 일봉의 최근 두 종가로 계산 (새 봉이 없으면 기존 봉 그대로)
+            closes = latest_closes(conn, [stock_code for _, stock_code, _ in pending])
+            quotes = [
+                (stock_id, quote_from_closes(*closes[stock_code]))
+                for stock_id, stock_code, _ in pending if stock_code in closes
+            ]
+            if quotes:
+                _apply_quotes(conn, quotes, datetime.now())
+        stats["updated"] += len(quotes)
+        stats["failed"] += len(pending) - len(quotes)
+        pending.clear()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {
+            pool.submit(bar_source, code, start): (stock_id, code, name)
+            for stock_id, code, name, start in targets
+        }
+        for i, future in enumerate(as_completed(futures)):
+            if stop_event is not None and stop_event.is_set():
+                pool.shutdown(wait=False, cancel_futures=True)
+                print("주가 업데이트 중단 요청, 남은 조회 취소")
+                break
+
+            stock_id, stock_code, stock_name = futures[future]
             try:
-                # 최근 1주일 데이터 조회
-                start_date = datetime.now() - timedelta(days=7)
-                df = fdr.DataReader(stock.stock_code, start_date)
-                if not df.empty:
-                    latest_price = int(df['Close'].iloc[-1])
-                    latest_price = int(df['Close'].iloc[-1])
-                    stock.current_price = latest_price
-                    
-                    # 등락률 업데이트 (Change 컬럼이 소수점 형태 ex: 0.012 -> 1.2%)
-                    if 'Change' in df.columns:
-                        stock.daily_change_rate = round(df['Change'].iloc[-1] * 100, 2)
-                    
-                    # 해당 종목의 리포트들도 업데이트 (기대수익률 재계산)
-                    for report in stock.reports:
-                        report.current_price = latest_price
-                        if report.fair_price and latest_price > 0:
-                            # 기대수익률 = (적정주가 - 현재주가) / 현재주가 * 100
-                            expected_return = (report.fair_price - latest_price) / latest_price * 100
-                            report.expected_return = round(expected_return, 2)
-                        else:
-                            report.expected_return = None
+                bars = future.result()
             except Exception as e:
-                print(f"Error fetching price for {stock.stock_name} ({stock.stock_code}): {e}")
-            
+                print(f"Error fetching price for {stock_name} ({stock_code}): {e}")
+                stats["failed"] += 1
+            else:
+                pending.append((stock_id, stock_code, bars))
+                if len(pending) >= batch_size:
+                    flush()
+
             if (i + 1) % 10 == 0:
                 print(f"주가 업데이트 진행 중: {i + 1}/{total}")
-        
-        session.commit()
-        print("주가 업데이트 완료")
-    except Exception as e:
-        session.rollback()
-        print(f"주가 업데이트 실패: {e}")
-    finally:
-        session.close()
+        flush()
+
+    # 새 일봉이 들어왔으면 기간이 남은 리포트의 목표주가 적중 지표도 다시 계산 (리더보드 캐시는 버전으로 무효화)
+    if stats["bars"] and not (stop_event is not None and stop_event.is_set()):
+        accuracy = refresh_report_accuracy()
+        print(f"목표주가 적중 지표 갱신: {accuracy}")
+
+    print(f"주가 업데이트 완료 (갱신 {stats['updated']}, 실패 {stats['failed']}, 건너뜀 {stats['skipped']}, "
+          f"일봉 {stats['bars']}개)")
+    return stats
+
+
+# ============================
+# 백그라운드 주가 갱신 스케줄러
+# ============================
+
+class PriceRefreshScheduler:
+    """
+    FastAPI lifespan에서 시작하는 주기 실행기.
+    update_stock_prices는 동기 함수이므로 스레드에서 실행해 이벤트 루프를 막지 않고,
+    서버는 첫 갱신이 끝나기를 기다리지 않고 바로 요청을 받습니다.
+    """
+
+    def __init__(self, refresh=update_stock_prices, interval: float = PRICE_REFRESH_INTERVAL):
+        self.refresh = refresh
+        self.interval = interval
+        self._task: asyncio.Task | None = None
+        self._stop_event = threading.Event()
+
+        self.running = False
+        self.runs = 0
+        self.failure_count = 0
+        self.last_started_at: datetime | None = None
+        self.last_finished_at: datetime | None = None
+        self.last_duration: float | None = None
+        self.last_result: dict | None = None
+        self.last_error: str | None = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._stop_event.clear()
+            self._task = asyncio.create_task(self._loop())
+
+    async def stop(self, timeout: float = PRICE_STOP_TIMEOUT):
+        if self._task is None:
+            return
+        # 스레드에서 돌고 있는 갱신 작업에 중단을 알리고, 남은 조회를 취소한 뒤 받은 결과를 반영하고 끝날 때까지 기다림
+        # (그냥 취소하면 스레드는 계속 돌면서 종료 중인 DB에 쓰게 됨)
+        self._stop_event.set()
+        if self.running:
+            try:
+                await asyncio.wait_for(asyncio.shield(self._task), timeout)  # 갱신이 끝나면 루프도 끝남
+            except asyncio.TimeoutError:
+                print(f"주가 업데이트가 {timeout:.0f}초 안에 끝나지 않아 기다리지 않고 종료")
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run_once(self):
+        self.running = True
+        self.last_started_at = datetime.now()
+        t0 = time.perf_counter()
+        try:
+            self.last_result = await asyncio.to_thread(self.refresh, stop_event=self._stop_event)
+            self.last_error = None
+        except Exception as e:
+            self.failure_count += 1
+            self.last_error = str(e)
+            print(f"주가 업데이트 실패: {e}")
+        finally:
+            self.running = False
+            self.runs += 1
+            self.last_duration = round(time.perf_counter() - t0, 3)
+            self.last_finished_at = datetime.now()
+
+    async def _loop(self):
+        while True:
+            await self.run_once()
+            if self._stop_event.is_set():
+                return
+            await asyncio.sleep(self.interval)
+
+    def status(self) -> dict:
+        return {
+            "running": self.running,
+            "interval": self.interval,
+            "runs": self.runs,
+            "failure_count": self.failure_count,
+            "last_started_at": self.last_started_at.isoformat() if self.last_started_at else None,
+            "last_finished_at": self.last_finished_at.isoformat() if self.last_finished_at else None,
+            "last_duration": self.last_duration,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+        }
+
+
+price_scheduler = PriceRefreshScheduler()
@@ -150,6 +150,8 @@ function initLoginUI() {
 
         // 이미 로그인된 상태면 → 로그아웃 처리
         if (btn.classList.contains("logged-in")) {
+          // 세션 쿠키 삭제 (응답을 기다리지 않음)
+          fetch(`${API_BASE}/api/logout`, { method: "POST" }).catch(err => console.error(err));
           setAuthState(false);      // 버튼 '로그인' 으로 변경
           if (messageEl) messageEl.textContent = "";
           return;
@@ -0,0 +1,103 @@
+# stock_matcher.py
+# 리포트 제목에서 종목명/종목코드를 찾아내는 인덱스
+import csv
+import os
+import time
+from functools import lru_cache
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+LISTING_CACHE_PATH = os.path.join(BASE_DIR, "krx_listing.csv")
+LISTING_MAX_AGE = 7 * 24 * 60 * 60  # 상장 종목 목록 캐시 유효기간 (초)
+CODE_LEN = 6                        # KRX 종목코드 길이
+
+
+# ============================
+# KRX 상장 종목 목록 (디스크 캐시)
+# ============================
+
+def _read_listing_cache(path: str) -> list[tuple[str, str]]:
+    with open(path, newline="", encoding="utf-8") as f:
+        return [(row["Code"], row["Name"]) for row in csv.DictReader(f)]
+
+
+def _write_listing_cache(path: str, listing: list[tuple[str, str]]):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Code", "Name"])
+        writer.writerows(listing)
+    os.replace(tmp_path, path)
+
+
+def load_stock_listing(cache_path: str = LISTING_CACHE_PATH, max_age: float = LISTING_MAX_AGE,
+                       refresh: bool = False) -> list[tuple[str, str]]:
+    """
+    KRX(코스피/코스닥/코넥스) 전체 종목의 (코드, 종목명) 목록을 반환합니다.
+    캐시 파일이 max_age보다 새것이면 네트워크 없이 캐시를 사용하고,
+    다운로드에 실패하면 오래된 캐시라도 사용합니다.
+    """
+    cache_exists = os.path.exists(cache_path)
+    if cache_exists and not refresh and time.time() - os.path.getmtime(cache_path) < max_age:
+        return _read_listing_cache(cache_path)
+
+    try:
+        import FinanceDataReader as fdr
+        df = fdr.StockListing('KRX')
+        listing = [(str(code), str(name)) for code, name in df[['Code', 'Name']].values]
+    except Exception as e:
+        if cache_exists:
+            print(f"종목 목록 다운로드 실패, 기존 캐시 사용: {e}")
+            return _read_listing_cache(cache_path)
+        raise
+
+    _write_listing_cache(cache_path, listing)
+    return listing
+
+
+# ============================
+# 제목 → (종목명, 종목코드) 매칭
+# ============================
+
+class StockMatcher:
+    """
+    종목코드 → 종목명 dict 기반 매처.
+    제목의 모든 6글자 구간을 dict에서 한 번씩만 찾아보므로 비용이 종목 수와 무관합니다.
+    (코드와 종목명이 둘 다 제목에 있어야 매칭으로 인정 — 기존 로직과 동일)
+    """
+
+    def __init__(self, listing: list[tuple[str, str]]):
+        self.code_to_name: dict[str, str] = {}
+        for code, name in listing:
+            if code and name:
+                self.code_to_name[code] = name
+
+    def __len__(self):
+        return len(self.code_to_name)
+
+    def match(self, title: str) -> tuple[str, str] | None:
+        """
+        제목에 들어있는 (종목명, 종목코드)를 반환합니다. 없으면 None.
+        후보가 여러 개면 가장 긴 종목명 → 제목에서 먼저 나온 코드 순으로 결정합니다.
+        (예: '삼성전자'와 '삼성전자우'가 모두 맞으면 '삼성전자우')
+        """
+        best = None
+        best_key = None
+        seen = set()
+        for i in range(len(title) - CODE_LEN + 1):
+            code = title[i:i + CODE_LEN]
+            if code in seen:
+                continue
+            seen.add(code)
+            name = self.code_to_name.get(code)
+            if name is None or name not in title:
+                continue
+            key = (-len(name), i)
+            if best_key is None or key < best_key:
+                best, best_key = (name, code), key
+        return best
+
+
+@lru_cache(maxsize=1)
+def get_matcher() -> StockMatcher:
+    """프로세스당 한 번만 종목 목록을 읽어 매처를 만듭니다 (첫 호출 시점에 로드)."""
+    return StockMatcher(load_stock_listing())
@@ -0,0 +1,165 @@
+# stock_suggest.py
+# 종목명 / 종목코드 / 초성 자동완성용 메모리 인덱스
+import heapq
+import threading
+import time
+from bisect import bisect_left
+from dataclasses import dataclass
+
+from sqlalchemy import text
+
+from db import read_engine
+from stock_matcher import load_stock_listing
+
+SUGGEST_LIMIT = 10
+SUGGEST_MAX_LIMIT = 50          # /api/stocks/suggest limit 상한
+SUGGEST_SHORT_PREFIX = 2        # 이 길이 이하 접두어(ㅅ, 00 등 후보가 많은 입력)는 빌드할 때 순위를 매겨 둠
+SUGGEST_REFRESH_INTERVAL = 60.0  # 새 종목 확인 주기 (초)
+
+CHOSUNG = [
+    "ㄱ", "ㄲ", "ㄴ", "ㄷ", "ㄸ", "ㄹ", "ㅁ", "ㅂ", "ㅃ", "ㅅ",
+    "ㅆ", "ㅇ", "ㅈ", "ㅉ", "ㅊ", "ㅋ", "ㅌ", "ㅍ", "ㅎ",
+]
+
+
+def chosung(s: str) -> str:
+    """한글 음절을 초성으로 바꿉니다 (예: '삼성전자' → 'ㅅㅅㅈㅈ'). 그 외 문자는 그대로 둡니다."""
+    out = []
+    for ch in s:
+        code = ord(ch) - 0xAC00
+        if 0 <= code < 11172:
+            out.append(CHOSUNG[code // 588])
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+def _normalize(s: str) -> str:
+    return s.replace(" ", "").lower()
+
+
+def _ranked(keys: list[str], entries: list["StockEntry"], ranks: list[tuple], prefix: str,
+            limit: int) -> list["StockEntry"]:
+    """prefix로 시작하는 키 범위 전체에서 종목별로 가장 좋은 순위를 골라 상위 limit개"""
+    lo = bisect_left(keys, prefix)
+    hi = bisect_left(keys, prefix + "\U0010ffff", lo)
+    best: dict[str, tuple] = {}
+    for i in range(lo, hi):
+        rank = (keys[i] != prefix, ranks[i])
+        code = entries[i].code
+        if code not in best or rank < best[code][0]:
+            best[code] = (rank, i)
+    return [entries[i] for _, i in heapq.nsmallest(limit, best.values())]
+
+
+@dataclass(frozen=True)
+class StockEntry:
+    code: str
+    name: str
+    has_reports: bool  # DB에 리포트가 있는 종목(stocks 테이블)이면 True
+
+
+class StockSuggestIndex:
+    """
+    (키, 종목) 쌍을 키 순서로 정렬해 두고 bisect로 접두어 범위를 찾는 인덱스.
+    키는 종목명 / 종목코드 / 종목명 초성 세 가지. 조회 시 DB를 전혀 읽지 않습니다.
+    범위 전체에 순위를 매기므로 후보가 많은 접두어에서도 리포트 있는 종목이 빠지지 않고,
+    후보가 많은 짧은 접두어(ㅅ, 00 등)는 빌드할 때 미리 순위를 매겨 둡니다.
+    """
+
+    def __init__(self):
+        # (키 목록, 종목 목록, 종목별 기본 순위, 짧은 접두어 → 순위순 종목) 한 벌.
+        # build()가 통째로 한 번에 바꾸고 suggest()는 한 번만 읽음
+        self._index: tuple[list[str], list[StockEntry], list[tuple], dict[str, list[StockEntry]]] = ([], [], [], {})
+        self._max_stock_id = 0
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+        self._refreshing = False
+
+    def __len__(self):
+        return len({e.code for e in self._index[1]})
+
+    # ----------------------------
+    # 빌드
+    # ----------------------------
+    def build(self, include_listing: bool = True):
+        """stocks 테이블(+ KRX 상장 목록)로 인덱스를 새로 만들어 통째로 교체합니다."""
+        with read_engine.connect() as conn:
+            db_stocks = conn.execute(text("SELECT stock_code, stock_name FROM stocks")).all()
+            max_id = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM stocks")).scalar_one()
+
+        stocks: dict[str, StockEntry] = {}
+        if include_listing:
+            try:
+                for code, name in load_stock_listing():
+                    stocks[code] = StockEntry(code, name, False)
+            except Exception as e:
+                print(f"자동완성: KRX 종목 목록 로드 실패, DB 종목만 사용: {e}")
+        for code, name in db_stocks:
+            stocks[code] = StockEntry(code, name, True)
+
+        pairs = []
+        for entry in stocks.values():
+            name_key = _normalize(entry.name)
+            for key in {name_key, entry.code.lower(), chosung(name_key)}:
+                pairs.append((key, entry))
+        pairs.sort(key=lambda p: p[0])
+
+        keys = [k for k, _ in pairs]
+        entries = [e for _, e in pairs]
+        ranks = [(not e.has_reports, len(e.name), e.name) for e in entries]
+        short_prefixes = {k[:n] for k in keys for n in range(1, SUGGEST_SHORT_PREFIX + 1)}
+        short = {p: _ranked(keys, entries, ranks, p, SUGGEST_MAX_LIMIT) for p in short_prefixes}
+        index = (keys, entries, ranks, short)
+        with self._lock:
+            self._index = index
+            self._max_stock_id = max_id
+            self._last_check = time.monotonic()
+
+    def refresh_if_changed(self):
+        """stocks에 새 종목이 들어왔으면 다시 빌드 (스크래퍼가 다른 프로세스에서 추가한 경우 포함)."""
+        with read_engine.connect() as conn:
+            max_id = conn.execute(text("SELECT COALESCE(MAX(id), 0) FROM stocks")).scalar_one()
+        if max_id != self._max_stock_id:
+            self.build()
+        else:
+            self._last_check = time.monotonic()
+
+    def _schedule_refresh(self):
+        # 요청 처리 경로에서는 DB를 읽지 않도록 확인 작업은 별도 스레드에서
+        with self._lock:
+            if self._refreshing or time.monotonic() - self._last_check < SUGGEST_REFRESH_INTERVAL:
+                return
+            self._refreshing = True
+
+        def run():
+            try:
+                self.refresh_if_changed()
+            except Exception as e:
+                print(f"자동완성 인덱스 갱신 실패: {e}")
+            finally:
+                self._last_check = time.monotonic()
+                self._refreshing = False
+
+        threading.Thread(target=run, daemon=True).start()
+
+    # ----------------------------
+    # 조회
+    # ----------------------------
+    def suggest(self, q: str, limit: int = SUGGEST_LIMIT) -> list[StockEntry]:
+        """
+        q로 시작하는 종목명 / 코드 / 초성을 가진 종목을 반환합니다.
+        정렬: 정확히 일치 → 리포트 있는 종목 → 짧은 이름 → 이름순
+        """
+        self._schedule_refresh()
+        prefix = _normalize(q)
+        if not prefix:
+            return []
+
+        keys, entries, ranks, short = self._index  # 속성 하나를 한 번 읽음 → 빌드 중 교체되어도 같은 벌
+        if len(prefix) <= SUGGEST_SHORT_PREFIX and limit <= SUGGEST_MAX_LIMIT:
+            return short.get(prefix, [])[:limit]
+        return _ranked(keys, entries, ranks, prefix, limit)
+
+
+stock_suggester = StockSuggestIndex()
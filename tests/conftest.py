@@ -0,0 +1,50 @@
+# tests/conftest.py
+# 테스트는 임시 DB 파일에 대해 실행되므로 reports.db는 건드리지 않음
+#
+#   python -m pytest tests
+import os
+import shutil
+import sys
+import tempfile
+
+import pytest
+
+# db 모듈이 임시 DB를 바라보도록 import 전에 설정 (앱 모듈은 저장소 최상위에 있음)
+_tmp_dir = tempfile.mkdtemp(prefix="hci_test_")
+os.environ["REPORTS_DB_URL"] = f"sqlite:///{os.path.join(_tmp_dir, 'test.db')}"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+from stock_matcher import StockMatcher  # noqa: E402
+from tests.helpers import real_titles, reset_db  # noqa: E402
+
+
+def pytest_sessionfinish(session, exitstatus):
+    db.engine.dispose()
+    db.read_engine.dispose()
+    shutil.rmtree(_tmp_dir, ignore_errors=True)
+
+
+@pytest.fixture
+def fresh_db():
+    """스키마를 만들고 모든 테이블을 비운 임시 DB"""
+    db.init_db()
+    reset_db()
+    return db
+
+
+@pytest.fixture(scope="session")
+def titles_and_listing():
+    """reports.db의 실제 제목 2,000건과 종목 목록 (KRX 캐시가 없으면 DB 종목 + 가짜 종목)"""
+    return real_titles(2_000)
+
+
+@pytest.fixture
+def titles(titles_and_listing, monkeypatch):
+    """목록 제목 픽스처. 제목 → 종목 매칭은 KRX 목록을 내려받지 않도록 고정 매처로"""
+    import list_parser
+
+    titles, listing = titles_and_listing
+    matcher = StockMatcher(listing)
+    monkeypatch.setattr(list_parser, "get_matcher", lambda: matcher)
+    return titles
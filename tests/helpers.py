@@ -0,0 +1,390 @@
+# tests/helpers.py
+# 테스트와 benchmark.py가 같이 쓰는 가짜 데이터 / 가짜 서버 / 예전 구현(골든 비교 기준)
+#
+# db 모듈을 import하므로, 이 모듈보다 먼저 REPORTS_DB_URL을 임시 DB로 설정해야 함
+# (tests/conftest.py, benchmark.py 맨 위)
+import hashlib
+import math
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import event, text
+
+import db
+from db import engine
+from stock_matcher import load_stock_listing
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REAL_DB_PATH = os.path.join(BASE_DIR, "reports.db")
+
+
+# ============================
+# 가짜 리포트 / DB
+# ============================
+
+def make_rows(n: int, seed: int = 0, start_idx: int = 600000, stocks: int = 2699) -> list[dict]:
+    rnd = random.Random(seed)
+    stocks = [(f"{i:06d}", f"종목{i}") for i in range(1, stocks + 1)]
+    brokers = [f"증권사{i}" for i in range(40)]
+    authors = [f"애널리스트{i}" for i in range(600)]
+    ratings = ["Buy", "매수", "Hold", "NR", "Sell"]
+    base = date(2020, 1, 1)
+
+    rows = []
+    for i in range(n):
+        code, name = rnd.choice(stocks)
+        rows.append({
+            "written_date": (base + timedelta(days=rnd.randrange(2000))).isoformat(),
+            "stock_name": name,
+            "stock_code": code,
+            "title": f"{name} 리포트 {i}",
+            "fair_price": rnd.randrange(1000, 500000, 100),
+            "current_price": None,
+            "expected_return": None,
+            "rating_code": rnd.choice(ratings),
+            "author_name": rnd.choice(authors),
+            "broker_name": rnd.choice(brokers),
+            "company_info_url": f"https://markets.hankyung.com/stock/{code}",
+            "attachment_url": f"https://consensus.hankyung.com/analysis/downpdf?report_idx={start_idx + i}",
+        })
+    return rows
+
+
+def reset_db():
+    with engine.begin() as conn:
+        for table in ("stock_summary", "report_pdfs", "price_history", "report_accuracy", "reports", "stocks", "brokers", "authors"):
+            conn.execute(text(f"DELETE FROM {table}"))
+
+
+def real_titles(n: int) -> tuple[list[str], list[tuple[str, str]]]:
+    """
+    reports.db의 실제 리포트로 목록 페이지 형식의 원본 제목('종목명(코드) 제목')을 복원해 n건으로 늘립니다.
+    종목 목록은 KRX 캐시를 쓰고, 없으면 DB 종목 + 가짜 종목으로 KRX 규모(~2,700)를 맞춥니다.
+    """
+    with sqlite3.connect(f"file:{REAL_DB_PATH}?mode=ro", uri=True) as conn:
+        rows = conn.execute(
+            "SELECT s.stock_name, s.stock_code, r.title FROM reports r JOIN stocks s ON s.id = r.stock_id"
+        ).fetchall()
+        db_stocks = conn.execute("SELECT stock_code, stock_name FROM stocks").fetchall()
+
+    titles = [f"{name}({code}) {title}" for name, code, title in rows]
+    titles = (titles * (n // max(len(titles), 1) + 1))[:n]
+
+    try:
+        listing = load_stock_listing()
+    except Exception as e:
+        print(f"KRX 종목 목록을 쓸 수 없어 DB 종목으로 대체: {e}")
+        listing = list(db_stocks) + [(f"9{i:05d}", f"가상종목{i}") for i in range(2700 - len(db_stocks))]
+    return titles, listing
+
+
+class StatementCounter:
+    """engine에서 실행되는 SQL 문 수를 센다."""
+
+    def __init__(self, target_engine):
+        self.count = 0
+        event.listen(target_engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, *args):
+        self.count += 1
+
+    def measure(self, fn, *args):
+        self.count = 0
+        fn(*args)
+        return self.count
+
+
+def app_client():
+    # lifespan(주가 스케줄러)은 띄우지 않고 라우트만 호출
+    from fastapi.testclient import TestClient
+    import main as web
+
+    os.chdir(BASE_DIR)  # static / templates 상대경로
+    return TestClient(web.app)
+
+
+# ============================
+# 목록 페이지
+# ============================
+
+LIST_ROW = (
+    '<tr><td>{date}</td><td>{title}</td><td>{fair_price:,}</td><td> Buy \r\n</td><td>홍길동</td><td>한경증권</td>'
+    '<td><a href="javascript:popup(\'https://markets.hankyung.com/stock/{code}\')">기업</a></td><td>chart</td>'
+    '<td><a href="/analysis/downpdf?report_idx={idx}">pdf</a></td></tr>'
+)
+# 실제 목록 페이지처럼 표 바깥의 메뉴 / 스크립트 / 검색 폼을 붙임 (전체 트리 파싱 비용을 현실적으로)
+LIST_PAGE_CHROME = (
+    "<head><title>컨센서스</title>" + "<script>var menu = [];</script>" * 10 + "</head><body>"
+    + "<ul class='gnb'>" + "".join(f"<li><a href='/menu/{i}'>메뉴 {i}</a></li>" for i in range(300)) + "</ul>"
+    + "<form><select>" + "".join(f"<option value='{i}'>증권사 {i}</option>" for i in range(60)) + "</select></form>"
+)
+
+
+def list_page_html(titles: list[str], page_no: int, pages: int) -> str:
+    """목록 페이지 HTML 픽스처. pages를 넘는 페이지는 빈 목록 (report_idx는 최신순으로 감소)"""
+    from scraper import PAGE_SIZE
+
+    rows = []
+    if page_no <= pages:
+        for i in range(PAGE_SIZE):
+            n = (page_no - 1) * PAGE_SIZE + i
+            title = titles[n % len(titles)]
+            code = title[title.index("(") + 1:title.index(")")]
+            rows.append(LIST_ROW.format(
+                date=(date(2025, 12, 31) - timedelta(days=n // 50)).isoformat(), title=title,
+                fair_price=10_000 + n % 500 * 100, code=code, idx=900_000 - n,
+            ))
+    return ("<html>" + LIST_PAGE_CHROME + '<div class="table_style01"><table><tr><th>h</th></tr>'
+            + "".join(rows) + "</table></div><div class='footer'>footer</div></body></html>")
+
+
+# 기존 BeautifulSoup 목록 파서 (비교 기준 / 결과가 같아야 함)
+def legacy_parse_list_page(html) -> list[list]:
+    from bs4 import BeautifulSoup
+    from list_parser import BASE_URL, remove_noise_and_split_title
+
+    soup = BeautifulSoup(html, 'lxml')
+    container = soup.find("div", {"class": "table_style01"})
+    if container is None or container.find('table') is None:
+        return []
+    data = []
+    for tr in container.find('table').find_all("tr")[1:]:
+        record = []
+        for i, td in enumerate(tr.find_all("td")):
+            if i == 1:
+                record += remove_noise_and_split_title(td.text)
+            elif i == 3:
+                record.append(td.text.replace(" ", "").replace("\r", "").replace("\n", ""))
+            elif i == 6:
+                a_tag = td.find('a')
+                if a_tag and a_tag.has_attr('href'):
+                    match = re.search(r"'(https?://[^']+)'", a_tag['href'])
+                    record.append(match.group(1) if match else None)
+            elif i == 8:
+                a_tag = td.find('a')
+                record.append(BASE_URL + a_tag['href'] if a_tag and a_tag.has_attr('href') else None)
+            elif i != 7:
+                record.append(td.text)
+        if record and None not in record:
+            data.append(record)
+    return data
+
+
+def legacy_record_to_report(record: list) -> dict:
+    try:
+        fair_price = int(str(record[4]).replace(',', '')) or None
+    except ValueError:
+        fair_price = None
+    return {
+        "written_date": record[0], "stock_name": record[1], "stock_code": record[2], "title": record[3],
+        "fair_price": fair_price, "current_price": None, "expected_return": None, "rating_code": record[5],
+        "author_name": record[6], "broker_name": record[7], "company_info_url": record[8],
+        "attachment_url": record[9],
+    }
+
+
+# 골든 비교용 경계 사례: 종목 없는 제목 / 기업정보 링크 없음 / 적정가격 0·빈칸 / 표 없음 / 빈 목록
+PARSE_EDGE_CASES = [
+    LIST_ROW.format(date="2025-12-01", title="시황 코멘트 12월", fair_price=0, code="000000", idx=1),
+    LIST_ROW.format(date="2025-12-01", title="{title}", fair_price=0, code="{code}", idx=2),
+    '<tr><td>2025-12-01</td><td>{title}</td><td>12,300</td><td>Hold</td><td>홍길동</td><td>한경증권</td>'
+    '<td>기업</td><td>chart</td><td><a href="/analysis/downpdf?report_idx=3">pdf</a></td></tr>',
+    LIST_ROW.format(date="2025-12-01", title="{title}", fair_price=0, code="{code}", idx=4)
+    .replace("<td>0</td>", "<td> - </td>"),
+]
+
+
+# ============================
+# PDF
+# ============================
+
+class FakePDFServer:
+    """
+    다운로드 벤치마크용 로컬 HTTP 서버. /downpdf?report_idx=N 에 결정적인 PDF 바이트를 돌려줌.
+    Range / If-Range / If-None-Match를 지원하고 요청마다 latency만큼 지연.
+    cut_once에 넣은 report_idx는 첫 응답을 절반만 보내고 연결을 끊은 뒤 파일 내용을 바꿈 (재시도 중 서버 파일 변경).
+    """
+
+    def __init__(self, size: int, latency: float):
+        import http.server
+        from urllib.parse import parse_qs, urlsplit
+
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server.requests += 1
+                idx = parse_qs(urlsplit(self.path).query)["report_idx"][0]
+                body = server.body(idx)
+                etag = f'"{hashlib.md5(body).hexdigest()}"'
+                time.sleep(latency)
+
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+
+                if idx in server.cut_once:
+                    server.cut_once.discard(idx)
+                    server.versions[idx] = server.versions.get(idx, 0) + 1
+                    self.send_response(200)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body[:len(body) // 2])
+                    self.close_connection = True
+                    return
+
+                start = 0
+                range_header = self.headers.get("Range")
+                if_range = self.headers.get("If-Range")
+                if range_header and (if_range is None or if_range == etag):
+                    start = int(range_header.split("=")[1].rstrip("-"))
+                    self.send_response(206)
+                    self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+                else:
+                    self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body) - start))
+                self.end_headers()
+                self.wfile.write(body[start:])
+
+            def log_message(self, *args):
+                pass
+
+        self.size = size
+        self.requests = 0
+        self.cut_once: set[str] = set()
+        self.versions: dict[str, int] = {}
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def body(self, idx: str) -> bytes:
+        version = self.versions.get(idx, 0)
+        head = f"%PDF-1.4\n% report {idx} v{version}\n".encode()
+        return head + random.Random(f"{idx}:{version}").randbytes(self.size - len(head))
+
+    def url(self, idx: int) -> str:
+        return f"http://127.0.0.1:{self.httpd.server_port}/analysis/downpdf?report_idx={idx}"
+
+
+def make_pdf(lines: list[str]) -> bytes:
+    """Helvetica 한 페이지짜리 최소 PDF (ASCII 텍스트만)"""
+    content = "BT /F1 10 Tf 40 800 Td 12 TL " + " ".join(f"({line}) '" for line in lines) + " ET"
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        "<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] /Contents 4 0 R "
+        "/Resources << /Font << /F1 5 0 R >> >> >>",
+        f"<< /Length {len(content)} >>\nstream\n{content}\nendstream",
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for i, obj in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{obj}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+REVIEW_WORDS = ["revenue", "margin", "guidance", "target", "upside", "memory", "demand", "capex", "order", "export"]
+
+
+def seed_pdfs(rows: list[dict], work_dir: str, duplicate_every: int = 10):
+    """
+    리포트마다 PDF를 만들어 work_dir/pdf/store 저장소에 넣고 report_pdfs에 연결
+    (duplicate_every건마다 앞 리포트와 같은 PDF)
+    """
+    import pdf_store
+
+    store = pdf_store.PDFStore(os.path.join(work_dir, "pdf", "store"))
+    links = []
+    digest = None
+    for i, row in enumerate(rows):
+        report_idx = db.parse_report_idx(row["attachment_url"])
+        if digest is None or i % duplicate_every:
+            rnd = random.Random(report_idx)
+            lines = [" ".join(rnd.choices(REVIEW_WORDS, k=8)) + " rises." for _ in range(40)]
+            path = os.path.join(work_dir, f"{report_idx}.pdf")
+            with open(path, "wb") as f:
+                f.write(make_pdf([f"Report {report_idx}"] + lines))
+            digest = store.put(path)
+        links.append({"report_idx": report_idx, "sha256": digest, "size": 0})
+    pdf_store.link_reports(links)
+    return store
+
+
+# ============================
+# 시세 / 목표주가 적중
+# ============================
+
+class FakeBarSource:
+    """가짜 시세 소스: 평일마다 종목코드로 정해지는 일봉. 호출당 latency + 봉당 per_bar 만큼 대기 (네트워크 흉내)"""
+
+    def __init__(self, today: date, latency: float, per_bar: float):
+        self.today = today
+        self.latency = latency
+        self.per_bar = per_bar
+        self.calls = 0
+        self.bars = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, stock_code: str, start: date) -> list[dict]:
+        seed = int(stock_code)
+        bars = []
+        day = start
+        while day <= self.today:
+            if day.weekday() < 5:
+                close = int(10_000 + seed % 500 * 100 + 3_000 * math.sin(day.toordinal() / 40 + seed))
+                bars.append({"date": day, "open": close - 50, "high": close + 100, "low": close - 100,
+                             "close": close, "volume": 1000 + seed})
+            day += timedelta(days=1)
+        with self._lock:
+            self.calls += 1
+            self.bars += len(bars)
+        time.sleep(self.latency + self.per_bar * len(bars))
+        return bars
+
+
+def legacy_evaluate_report(series, dates: list[date], written: date, fair: float, rating: str,
+                           horizon: int, max_entry_gap: int) -> dict | None:
+    """비교 기준: 리포트 하나씩 일봉을 앞에서부터 훑는 계산 (dates: series.dates를 date 목록으로)"""
+    i = next((k for k, d in enumerate(dates) if d >= written), None)
+    if i is None or (dates[i] - written).days > max_entry_gap:
+        return None
+    ep = series.close[i]
+    up = fair >= ep
+    hit, days, mfe, mae, last = False, None, None, None, None
+    for k in range(i + 1, len(dates)):
+        if dates[k] > written + timedelta(days=horizon):
+            break
+        high = series.close[k] if math.isnan(series.high[k]) else series.high[k]
+        low = series.close[k] if math.isnan(series.low[k]) else series.low[k]
+        fav = high / ep - 1 if up else -(low / ep - 1)
+        adv = low / ep - 1 if up else -(high / ep - 1)
+        mfe = fav if mfe is None else max(mfe, fav)
+        mae = adv if mae is None else min(mae, adv)
+        if not hit and (high >= fair if up else low <= fair):
+            hit, days = True, (dates[k] - written).days
+        last = series.close[k]
+    sign = {"Buy": 1, "Sell": -1}.get(rating)
+    ret = None if last is None else (last / ep - 1) * 100
+    return {
+        "entry_price": ep, "hit": hit, "days_to_target": days,
+        "mfe": None if mfe is None else mfe * 100, "mae": None if mae is None else mae * 100,
+        "horizon_return": ret, "rating_return": None if ret is None or sign is None else sign * ret,
+        "resolved": dates[-1] >= written + timedelta(days=horizon),
+    }
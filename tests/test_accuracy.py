@@ -0,0 +1,95 @@
+# 목표주가 적중 지표: NumPy 일괄 계산이 리포트별 루프(예전 방식)와 같은 값 (골든 비교) / 증분 갱신 / 기준 일봉 누락
+from datetime import date
+
+import numpy as np
+import pytest
+from sqlalchemy import text
+
+import accuracy
+import db
+from price_history import load_price_histories, load_price_table, save_bars
+from tests.helpers import FakeBarSource, legacy_evaluate_report, make_rows
+
+ROWS = 3_000
+STOCKS = 30
+
+
+@pytest.fixture
+def priced_reports(fresh_db):
+    """리포트 ROWS건 + 2019-12-01 ~ 2025-06-30 가짜 일봉. 반환값: 시세 소스"""
+    db.save_reports(make_rows(ROWS, stocks=STOCKS))
+    source = FakeBarSource(date(2025, 6, 30), 0.0, 0.0)
+    with db.engine.begin() as conn:
+        # 목표가를 가짜 주가 범위(약 7천~6만 3천) 안에 흩어 놓음 → 적중 / 미적중, 상승 / 하락 목표가가 섞이게
+        conn.execute(text("UPDATE reports SET fair_price = 8000 + (id * 7919) % 60000"))
+        codes = [row[0] for row in conn.execute(text("SELECT stock_code FROM stocks"))]
+        for code in codes:
+            save_bars(conn, [{"stock_code": code, **bar} for bar in source(code, date(2019, 12, 1))])
+    return source
+
+
+def _assert_matches_legacy(reports, metrics):
+    histories = load_price_histories()
+    history_dates = {code: series.dates.astype(object).tolist() for code, series in histories.items()}
+    for i in range(len(reports)):
+        code = reports["stock_code"][i]
+        expected = legacy_evaluate_report(histories[code], history_dates[code], reports["written_date"][i].item(),
+                                          reports["fair_price"][i], reports["rating_code"][i],
+                                          accuracy.HORIZON_DAYS, accuracy.MAX_ENTRY_GAP_DAYS)
+        if expected is None:
+            assert not metrics["evaluable"][i], i
+            continue
+        assert metrics["evaluable"][i], i
+        for column, want in expected.items():
+            got = metrics[column][i]
+            if want is None:
+                assert np.isnan(got), (i, column, got)
+            else:
+                assert np.isclose(got, want), (i, column, got, want)
+
+
+def test_evaluate_matches_legacy_loop(priced_reports):
+    reports = db.read_array(accuracy._REPORTS_SQL, {}, accuracy._REPORT_DTYPE)
+    metrics = accuracy.evaluate(reports, *load_price_table())
+    assert metrics["evaluable"].sum() > 0 and metrics["hit"][metrics["evaluable"]].any()
+    _assert_matches_legacy(reports, metrics)
+
+
+def test_missing_history_is_not_evaluated(priced_reports):
+    # 저장된 일봉이 작성일보다 한참 뒤에 시작하는 리포트 → 첫 일봉을 기준으로 삼지 않고 보류
+    old = make_rows(1, seed=1, start_idx=900_000, stocks=STOCKS)[0]
+    old["written_date"] = "2018-03-02"
+    db.save_reports([old])
+    reports = db.read_array(accuracy._REPORTS_SQL, {}, accuracy._REPORT_DTYPE)
+    metrics = accuracy.evaluate(reports, *load_price_table())
+    _assert_matches_legacy(reports, metrics)
+
+    stats = accuracy.refresh_report_accuracy(full=True)
+    assert stats["missing_history"] == 1
+    with db.engine.connect() as conn:
+        stored = conn.execute(text("""
+            SELECT COUNT(*) FROM report_accuracy a JOIN reports r ON r.id = a.report_id WHERE r.report_idx = 900000
+        """)).scalar_one()
+    assert stored == 0
+
+
+def test_incremental_refresh_matches_full(priced_reports):
+    accuracy.refresh_report_accuracy(full=True)
+    with db.engine.connect() as conn:
+        resolved = conn.execute(text("SELECT COUNT(*) FROM report_accuracy WHERE resolved = 1")).scalar_one()
+    # 다음 거래일 일봉이 하나씩 들어온 뒤 → 기간이 남은 리포트만 다시 계산
+    source = priced_reports
+    source.today = date(2025, 7, 1)
+    with db.engine.begin() as conn:
+        for code in [row[0] for row in conn.execute(text("SELECT stock_code FROM stocks"))]:
+            save_bars(conn, [{"stock_code": code, **bar} for bar in source(code, source.today)])
+    stats = accuracy.refresh_report_accuracy()
+    assert 0 < resolved and stats["evaluated"] + stats["pending"] == ROWS - resolved  # 기간이 끝난 리포트는 건너뜀
+
+    def snapshot():
+        with db.engine.connect() as conn:
+            return conn.execute(text("SELECT * FROM report_accuracy ORDER BY report_id")).all()
+
+    incremental = snapshot()
+    accuracy.refresh_report_accuracy(full=True)
+    assert incremental == snapshot()
@@ -0,0 +1,88 @@
+# 일괄 적재 / 종목 요약 테이블 / 예전 스키마(reports.db) 마이그레이션
+import math
+import os
+import shutil
+import sqlite3
+import subprocess
+import sys
+
+from sqlalchemy import text
+
+import db
+from tests.helpers import BASE_DIR, REAL_DB_PATH, make_rows
+
+
+def test_save_reports_skips_duplicates(fresh_db):
+    rows = make_rows(1_000)
+    assert db.save_reports(rows) == {"inserted": 1_000, "skipped": 0}
+    assert db.save_reports(rows) == {"inserted": 0, "skipped": 1_000}
+
+
+def test_incremental_summary_matches_rebuild(fresh_db):
+    rows = make_rows(5_000, stocks=300)
+    for i, row in enumerate(rows):
+        row["current_price"] = row["fair_price"] * (0.6 + i % 7 / 10) // 1
+        row["expected_return"] = round((row["fair_price"] - row["current_price"]) / row["current_price"] * 100, 2)
+    db.save_reports(rows)
+    db.save_reports(make_rows(100, seed=7, start_idx=10_000_000, stocks=300))  # 해당 종목만 다시 계산
+
+    def snapshot():
+        with db.engine.connect() as conn:
+            return conn.execute(text("SELECT * FROM stock_summary ORDER BY stock_id")).all()
+
+    incremental = snapshot()
+    db.rebuild_stock_summary()
+    rebuilt = snapshot()
+    assert len(incremental) == len(rebuilt) > 0
+    for a, b in zip(incremental, rebuilt):
+        # AVG의 합산 순서 차이로 인한 마지막 자리 오차는 무시
+        assert all(math.isclose(x, y) if isinstance(x, float) else x == y for x, y in zip(a, b)), (a, b)
+
+
+def _migrate_copy(tmp_path, prepare=None) -> sqlite3.Connection:
+    """reports.db 사본에 (prepare로 손본 뒤) 별도 프로세스에서 init_db()를 두 번 실행 (재시작 흉내)"""
+    path = str(tmp_path / "reports.db")
+    shutil.copyfile(REAL_DB_PATH, path)
+    if prepare is not None:
+        with sqlite3.connect(path) as conn:
+            prepare(conn)
+    env = {**os.environ, "REPORTS_DB_URL": f"sqlite:///{path}"}
+    subprocess.run([sys.executable, "-c", "import db; db.init_db(); db.init_db()"],
+                   cwd=BASE_DIR, env=env, check=True, capture_output=True)
+    return sqlite3.connect(path)
+
+
+def test_migration_fills_stock_summary(tmp_path):
+    # 예전 스키마의 stock_summary는 VIEW → 테이블로 바뀌고 기존 리포트로 채워져야 함
+    with sqlite3.connect(f"file:{REAL_DB_PATH}?mode=ro", uri=True) as conn:
+        assert conn.execute("SELECT type FROM sqlite_master WHERE name = 'stock_summary'").fetchone() == ("view",)
+        view_rows = conn.execute("SELECT stock_code, main_rating FROM stock_summary ORDER BY stock_code").fetchall()
+
+    conn = _migrate_copy(tmp_path)
+    assert conn.execute("SELECT type FROM sqlite_master WHERE name = 'stock_summary'").fetchone() == ("table",)
+    table_rows = conn.execute("SELECT stock_code, main_rating FROM stock_summary ORDER BY stock_code").fetchall()
+    assert len(view_rows) > 0 and table_rows == view_rows
+
+
+def test_migration_dedupes_keeping_reviewed_row(tmp_path):
+    duplicated = {}
+
+    def add_duplicate(conn):
+        # 같은 attachment_url의 뒤늦은 중복 행에만 리뷰가 있음 → 리뷰가 있는 행을 남겨야 함
+        first_id, url = conn.execute("SELECT id, attachment_url FROM reports ORDER BY id LIMIT 1").fetchone()
+        duplicated["url"] = url
+        conn.execute("""
+            INSERT INTO reports (written_date, title, fair_price, attachment_url, summary, expert_content,
+                                 stock_id, broker_id, author_id, rating_code)
+            SELECT written_date, title, fair_price, attachment_url, '요약', '전문가 리뷰',
+                   stock_id, broker_id, author_id, rating_code
+            FROM reports WHERE id = ?
+        """, (first_id,))
+        conn.execute("UPDATE reports SET summary = NULL, expert_content = NULL, novice_content = NULL WHERE id = ?",
+                     (first_id,))
+
+    conn = _migrate_copy(tmp_path, add_duplicate)
+    count, distinct = conn.execute("SELECT COUNT(*), COUNT(DISTINCT attachment_url) FROM reports").fetchone()
+    assert count == distinct
+    kept = conn.execute("SELECT summary FROM reports WHERE attachment_url = ?", (duplicated["url"],)).fetchall()
+    assert kept == [("요약",)]
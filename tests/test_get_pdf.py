@@ -0,0 +1,134 @@
+# PDF 다운로드: 재실행 건너뛰기 / 조건부 요청(304) / 이어받기 / 재시도 중 파일 변경 / 저장소 / 예전 레이아웃·manifest
+import hashlib
+import json
+import os
+
+import pytest
+from sqlalchemy import text
+
+import pdf_store
+from db import engine
+from get_pdf import CHUNK_SIZE, MANIFEST_NAME, PARTIAL_SUBDIR, STORE_SUBDIR, Manifest, download_pdfs
+from tests.helpers import FakePDFServer
+
+FILES = 6
+SIZE = 4 * CHUNK_SIZE  # 끊긴 응답에서도 .part에 한 블록 이상 쓰이도록
+RATE = 1000.0
+
+
+@pytest.fixture
+def server():
+    server = FakePDFServer(SIZE, latency=0.0)
+    yield server
+    server.httpd.shutdown()
+
+
+@pytest.fixture
+def downloaded(server, fresh_db, tmp_path):
+    """FILES건을 한 번 받아 둔 (pdf_dir, urls)"""
+    pdf_dir = str(tmp_path / "pdf")
+    urls = [server.url(700000 + i) for i in range(FILES)]
+    stats = download_pdfs(urls, pdf_dir, workers=4, rate=RATE)
+    assert stats["downloaded"] == FILES
+    return pdf_dir, urls
+
+
+def test_rerun_skips_without_requests(server, downloaded):
+    pdf_dir, urls = downloaded
+    before = server.requests
+    stats = download_pdfs(urls, pdf_dir, workers=4, rate=RATE)
+    assert stats["skipped"] == FILES and server.requests == before
+
+
+def test_revalidate_gets_304(downloaded):
+    pdf_dir, urls = downloaded
+    stats = download_pdfs(urls, pdf_dir, workers=4, rate=RATE, revalidate=True)
+    assert stats["not_modified"] == FILES
+
+
+def test_resume_from_part_after_torn_manifest_line(downloaded):
+    # 절반만 받은 .part + 실패 기록 → Range 요청으로 나머지만 받음
+    pdf_dir, urls = downloaded
+    store = pdf_store.PDFStore(os.path.join(pdf_dir, STORE_SUBDIR))
+    manifest = Manifest(os.path.join(pdf_dir, MANIFEST_NAME))
+    victim = urls[0]
+    entry = manifest.get(victim)
+    report_idx = entry["report_idx"]
+    digest = pdf_store.digests_for([report_idx])[report_idx]
+    assert "sha256" not in entry and "size" not in entry  # 파일 정보는 report_pdfs에만
+
+    path = store.path_for(digest)
+    with open(path, "rb") as f:
+        data = f.read()
+    os.remove(path)
+    with open(os.path.join(pdf_dir, PARTIAL_SUBDIR, f"{report_idx}.part"), "wb") as f:
+        f.write(data[:len(data) // 2])
+    manifest.set(victim, {"report_idx": report_idx, "status": "failed", "etag": entry["etag"]})
+    manifest.close()
+    with open(manifest.path, "a", encoding="utf-8") as f:
+        f.write('{"url": "http://cut')  # 쓰다가 죽은 줄 → 열 때 버리고 압축
+
+    stats = download_pdfs(urls, pdf_dir, workers=1, rate=RATE)
+    resumed = Manifest(os.path.join(pdf_dir, MANIFEST_NAME)).get(victim)
+    assert stats["downloaded"] == 1 and store.exists(digest)
+    assert resumed["resumed_from"] == len(data) // 2
+    assert pdf_store.digests_for([report_idx])[report_idx] == digest
+    with open(manifest.path, encoding="utf-8") as f:
+        assert sum(1 for _ in f) == FILES + 1  # 압축 후 URL당 한 줄 + 이번 실행의 한 줄
+
+
+def test_file_changed_during_retry(server, downloaded):
+    # 끊긴 응답의 ETag로 If-Range → 서버 파일이 바뀌었으면 200으로 새 파일을 처음부터 (섞이지 않음)
+    pdf_dir, _ = downloaded
+    changed_idx = 700000 + FILES
+    server.cut_once.add(str(changed_idx))
+    stats = download_pdfs([server.url(changed_idx)], pdf_dir, workers=1, rate=RATE, backoff=0.01)
+    want = hashlib.sha256(server.body(str(changed_idx))).hexdigest()
+    assert server.versions[str(changed_idx)] == 1
+    assert stats["downloaded"] == 1 and pdf_store.digests_for([changed_idx])[changed_idx] == want
+
+
+def test_store_dedupe_and_gc(downloaded, tmp_path):
+    pdf_dir, _ = downloaded
+    store = pdf_store.PDFStore(os.path.join(pdf_dir, STORE_SUBDIR))
+    report_idxs = [700000 + i for i in range(FILES)]
+    assert pdf_store.has_pdfs(report_idxs, store) == set(report_idxs)
+    digest = pdf_store.digests_for([700000])[700000]
+    assert pdf_store.pdf_path(700000, store) == store.path_for(digest)
+
+    pdf_store.link_reports([{"report_idx": 1, "sha256": digest, "size": SIZE}])  # 같은 내용
+    orphan = tmp_path / "orphan.pdf"
+    orphan.write_bytes(b"%PDF-1.4 orphan" * 100)
+    orphan_digest = store.put(str(orphan))
+    stats = pdf_store.gc(store, min_age=0)
+    assert stats["removed"] == 1 and not store.exists(orphan_digest)
+    assert stats["blobs"] == FILES + 1 and store.exists(digest)  # blobs: GC 전 블롭 수 (고아 포함, 중복은 한 개)
+
+
+def test_legacy_flat_layout(server, fresh_db, tmp_path):
+    # 예전 레이아웃(pdf/{report_idx}.pdf): 정상 파일은 저장소로 이동, 잘린 파일은 다시 받음
+    pdf_dir = tmp_path / "pdf"
+    pdf_dir.mkdir()
+    (pdf_dir / "700000.pdf").write_bytes(server.body("700000"))
+    (pdf_dir / "700001.pdf").write_bytes(b"%PDF-1.4 truncated")
+    urls = [server.url(700000 + i) for i in range(FILES)]
+    stats = download_pdfs(urls, str(pdf_dir), workers=4, rate=RATE)
+    assert stats["downloaded"] == FILES - 1 and stats["skipped"] == 1
+    assert not any(name.endswith(".pdf") for name in os.listdir(pdf_dir))
+
+
+def test_legacy_manifest_json(server, downloaded):
+    # 예전 manifest.json에만 기록된 파일 → report_pdfs에 등록하고 manifest에서는 sha256 / size를 뺌
+    pdf_dir, urls = downloaded
+    digest = pdf_store.digests_for([700002])[700002]
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM report_pdfs WHERE report_idx = 700002"))
+    os.remove(os.path.join(pdf_dir, MANIFEST_NAME))
+    with open(os.path.join(pdf_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        f.write(json.dumps({urls[2]: {"report_idx": 700002, "sha256": digest, "size": SIZE, "status": "done"}}))
+
+    before = server.requests
+    stats = download_pdfs(urls, pdf_dir, workers=1, rate=RATE)
+    entry = Manifest(os.path.join(pdf_dir, MANIFEST_NAME)).get(urls[2])
+    assert stats["skipped"] == FILES and server.requests == before
+    assert pdf_store.digests_for([700002]) == {700002: digest} and "sha256" not in entry
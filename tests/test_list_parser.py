@@ -0,0 +1,73 @@
+# 목록 페이지 파서: 기존 BeautifulSoup 파서와 같은 결과 (골든 비교) / 목록 표가 없는 페이지
+import pytest
+
+import list_parser
+from tests.helpers import (
+    PARSE_EDGE_CASES, legacy_parse_list_page, legacy_record_to_report, list_page_html,
+)
+
+# 스크립트/주석에 "table_style01" 문자열이 표보다 먼저 나오는 페이지
+DECOY = ('<script>var cls = "table_style01";</script><!-- div class="table_style01" -->'
+         '<p class="x-table_style01">광고</p>')
+
+
+def _edge_case_page(titles: list[str]) -> str:
+    title = titles[0]
+    code = title[title.index("(") + 1:title.index(")")]
+    rows = "".join(row.replace("{title}", title).replace("{code}", code) for row in PARSE_EDGE_CASES)
+    return f'<html><body><div class="table_style01"><table><tr><th>h</th></tr>{rows}</table></div></body></html>'
+
+
+def _fixtures(titles: list[str]) -> dict[str, str]:
+    pages = {f"page {n}": list_page_html(titles, n, 5) for n in range(1, 6)}
+    pages["edge cases"] = _edge_case_page(titles)
+    pages["decoy before table"] = list_page_html(titles, 1, 1).replace("<html>", "<html>" + DECOY, 1)
+    pages["empty listing"] = list_page_html(titles, 1, 0)
+    return pages
+
+
+def test_matches_legacy_parser(titles):
+    for name, html in _fixtures(titles).items():
+        # 기존 파서는 기업정보 링크가 없는 행을 짧은 레코드로 남겨 record_to_report에서 IndexError가 났음
+        # (새 파서는 그런 행을 건너뜀)
+        expected = [legacy_record_to_report(r) for r in legacy_parse_list_page(html) if len(r) == 10]
+        actual = [r.to_report() for r in list_parser.parse_list_page(html)]
+        for report in actual:
+            report["written_date"] = report["written_date"].isoformat()
+        assert actual == expected, name
+
+
+def test_record_fields(titles):
+    records = list_parser.parse_list_page(list_page_html(titles, 1, 1))
+    assert len(records) == 20
+    first = records[0]
+    assert first.report_idx == 900_000
+    assert first.attachment_url == list_parser.BASE_URL + "/analysis/downpdf?report_idx=900000"
+    assert first.rating == "Buy" and first.fair_price == 10_000
+
+
+@pytest.mark.parametrize("head, encoding", [
+    ('<meta charset="euc-kr">', "euc-kr"),
+    ('<meta http-equiv="Content-Type" content="text/html; charset=EUC-KR">', "euc-kr"),
+    ("", "utf-8"),  # 문자셋 선언 없음 → UTF-8
+])
+def test_bytes_follow_meta_charset(titles, head, encoding):
+    # 응답 본문(bytes)을 그대로 넘겨도 문자열로 파싱한 것과 같은 레코드
+    html = list_page_html(titles, 1, 1).replace("<head>", "<head>" + head, 1)
+    assert list_parser.parse_list_page(html.encode(encoding)) == list_parser.parse_list_page(html)
+
+
+def test_empty_listing_is_empty_list(titles):
+    assert list_parser.parse_list_page(list_page_html(titles, 1, 0)) == []
+
+
+@pytest.mark.parametrize("html", [
+    "<html><body><p>점검 중</p></body></html>",
+    "<html><body>" + DECOY + "</body></html>",
+    " ",
+    b" \r\n",
+])
+def test_page_without_table_raises(html):
+    # 점검/차단 페이지를 빈 목록(= 목록 끝)으로 읽으면 수집이 거기서 멈춤
+    with pytest.raises(list_parser.ListPageError):
+        list_parser.parse_list_page(html)
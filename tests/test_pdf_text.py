@@ -0,0 +1,47 @@
+# PDF 텍스트 추출 캐시: 한 번 추출한 PDF는 다시 파싱하지 않음
+import db
+import pdf_text
+from tests.helpers import make_rows, seed_pdfs
+
+
+def test_extract_then_cached(fresh_db, tmp_path):
+    rows = make_rows(20)
+    db.save_reports(rows)
+    store = seed_pdfs(rows, str(tmp_path), duplicate_every=len(rows) + 1)
+    digests = pdf_text.stored_digests()
+    cache_dir = str(tmp_path / "text")
+
+    stats = pdf_text.extract_texts(digests, store=store, cache_dir=cache_dir, workers=2)
+    assert stats["extracted"] == len(digests) == len(rows) and stats["failed"] == 0
+
+    stats = pdf_text.extract_texts(digests, store=store, cache_dir=cache_dir, workers=2)
+    assert stats["cached"] == len(digests) and stats["extracted"] == 0
+    loaded = pdf_text.load_text(digests[0], cache_dir)
+    assert loaded.chunks and "rises." in loaded.chunks[0].text
+
+
+def test_failed_pdf_is_not_retried(fresh_db, tmp_path, monkeypatch):
+    rows = make_rows(3)
+    db.save_reports(rows)
+    store = seed_pdfs(rows, str(tmp_path), duplicate_every=len(rows) + 1)
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"%PDF-1.4 truncated")
+    bad = store.put(str(broken))
+    digests = pdf_text.stored_digests() + [bad]
+    cache_dir = str(tmp_path / "text")
+
+    stats = pdf_text.extract_texts(digests, store=store, cache_dir=cache_dir, workers=1)
+    assert stats["extracted"] == len(rows) and stats["failed"] == 1
+    assert pdf_text.is_cached(bad, cache_dir) and pdf_text.load_text(bad, cache_dir) is None
+
+    # 다시 실행: 실패한 PDF도 처리한 것으로 보고, 할 일이 없으므로 프로세스 풀을 띄우지 않음
+    def no_pool(*args, **kwargs):
+        raise AssertionError("ProcessPoolExecutor started")
+
+    monkeypatch.setattr(pdf_text, "ProcessPoolExecutor", no_pool)
+    stats = pdf_text.extract_texts(digests, store=store, cache_dir=cache_dir, workers=1)
+    assert stats["cached"] == len(rows) and stats["previously_failed"] == 1 and stats["failed"] == 0
+
+    # 추출 규칙(버전)이 바뀌면 다시 시도
+    monkeypatch.setattr(pdf_text, "TEXT_CACHE_VERSION", pdf_text.TEXT_CACHE_VERSION + 1)
+    assert not pdf_text.is_cached(bad, cache_dir)
@@ -0,0 +1,86 @@
+# 일봉 증분 수집 (처음 / 같은 날 / 다음 날 / 오래된 리포트) + 일괄 기간 조회
+import contextlib
+import io
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+from sqlalchemy import text
+
+import db
+import price_history
+from price_history import latest_closes, load_price_histories, load_price_history
+from services import update_stock_prices
+from tests.helpers import FakeBarSource, make_rows
+
+STOCKS = 20
+
+
+@pytest.fixture
+def source(fresh_db):
+    db.save_reports(make_rows(200, stocks=STOCKS))
+    return FakeBarSource(date(2025, 6, 30), 0.0, 0.0)
+
+
+def refresh(source, **kwargs) -> dict:
+    source.calls = source.bars = 0
+    with contextlib.redirect_stdout(io.StringIO()):  # 진행 로그 생략
+        return update_stock_prices(source, ttl=None, **kwargs)
+
+
+def test_incremental_fetch(source):
+    stats = refresh(source, force=True)
+    assert source.calls == STOCKS and stats["updated"] == STOCKS and stats["bars"] == source.bars > 0
+
+    # 같은 날 다시: 마지막 장 마감 뒤에 이미 받은 종목은 요청하지 않음
+    stats = refresh(source)
+    assert source.calls == 0 and stats["skipped"] == STOCKS
+
+    # 다음 날: 마지막 저장 일봉(장중 값일 수 있음)과 새 일봉 하나만
+    with db.engine.begin() as conn:
+        conn.execute(text("UPDATE stocks SET price_updated_at = '2000-01-01 00:00:00'"))
+    source.today += timedelta(days=1)
+    stats = refresh(source)
+    assert source.calls == STOCKS and source.bars == 2 * STOCKS and stats["updated"] == STOCKS
+
+
+def test_old_report_backfills_history(source):
+    # 저장된 기간보다 오래된 리포트가 뒤늦게 들어옴 → 그 종목만 작성일부터 다시 받아 기준 일봉이 작성일에 맞춰짐
+    refresh(source, force=True)
+    old_report = make_rows(1, seed=1, start_idx=900_000, stocks=STOCKS)[0]
+    old_report["written_date"] = "2018-03-02"
+    db.save_reports([old_report])
+
+    refresh(source)
+    assert source.calls == 1
+    with db.engine.connect() as conn:
+        entry_date = conn.execute(text("""
+            SELECT a.entry_date FROM report_accuracy a JOIN reports r ON r.id = a.report_id
+            WHERE r.report_idx = 900000
+        """)).scalar()
+    assert str(entry_date) == "2018-03-02"
+
+
+def test_bulk_load_matches_per_stock(source):
+    refresh(source, force=True)
+    histories = load_price_histories()
+    assert len(histories) == STOCKS
+    for code, series in histories.items():
+        single = load_price_history(code)
+        assert np.array_equal(series.dates, single.dates) and np.array_equal(series.close, single.close)
+        assert np.all(np.diff(series.dates.astype(np.int64)) > 0)
+
+
+def test_latest_closes(source, monkeypatch):
+    refresh(source, force=True)
+    monkeypatch.setattr(price_history, "BULK_CHUNK_SIZE", 7)  # 여러 묶음으로 나뉘게
+    codes = list(load_price_histories())
+    with db.engine.begin() as conn:
+        conn.execute(text("DELETE FROM price_history WHERE stock_code = :code AND date < '2025-06-30'"),
+                     {"code": codes[0]})  # 일봉 하나만 남은 종목
+        closes = latest_closes(conn, codes + ["999999"])  # 일봉이 없는 종목은 빠짐
+    assert set(closes) == set(codes)
+    for code, series in load_price_histories().items():
+        expected = (int(series.close[-1]), int(series.close[-2]) if len(series.close) > 1 else None)
+        assert closes[code] == expected, code
+    assert closes[codes[0]][1] is None
@@ -0,0 +1,97 @@
+# 목록 페이지 SQL 문 수 (N+1 없음) / 전문 검색 / 이름 검색 도우미
+import contextlib
+import io
+
+import pytest
+from sqlalchemy import event, text
+
+import db
+from query import search_by_author, search_by_broker, search_by_stock_name, search_reports
+from tests.helpers import StatementCounter, app_client, make_rows, reset_db
+
+ENDPOINTS = ["/", "/index.html", "/data.html?q=삼성전자"]
+
+
+def test_statement_count_independent_of_result_size(fresh_db):
+    client = app_client()
+    counter = StatementCounter(db.read_engine)
+    counts: dict[str, set[int]] = {url: set() for url in ENDPOINTS}
+    for n in (10, 100, 500):
+        reset_db()
+        rows = make_rows(n)
+        # 절반은 한 종목에 몰아서 /data.html 결과 크기를 n에 비례하게 만듦
+        for row in rows[: n // 2]:
+            row["stock_code"], row["stock_name"] = "005930", "삼성전자"
+        db.save_reports(rows)
+
+        for url in ENDPOINTS:
+            def get():
+                assert client.get(url).status_code == 200
+            counts[url].add(counter.measure(get))
+    assert all(len(c) == 1 for c in counts.values()), counts
+
+
+@pytest.fixture
+def searchable(fresh_db):
+    rows = make_rows(2_000)
+    for i, row in enumerate(rows):
+        row["summary"] = f"{row['stock_name']}의 실적과 배당에 주목. " * 3
+        row["expert_content"] = "반도체 업황 회복 " * 4 if i % 2 else "수주 모멘텀 지속 " * 4
+    db.save_reports(rows)
+    with db.engine.begin() as conn:
+        oldest = conn.execute(text("SELECT MIN(id) FROM reports")).scalar_one()
+        conn.execute(text("UPDATE reports SET title = title || ' 희귀키워드' WHERE id = :id"), {"id": oldest})
+        conn.execute(text("UPDATE reports SET summary = summary || ' 희귀키워드' WHERE id > :id"), {"id": oldest})
+    return oldest
+
+
+def test_search_ranks_every_match(searchable):
+    # 모든 매칭이 순위에 들어가야 함: 제목에만 있는 가장 오래된 리포트가 1위
+    with db.ReadSession() as session:
+        items, next_offset, truncated = search_reports(session, "희귀키워드", limit=1)
+    assert items[0]["id"] == searchable and next_offset == 1 and not truncated
+
+
+def test_search_pagination_is_disjoint(searchable):
+    with db.ReadSession() as session:
+        first, next_offset, _ = search_reports(session, "반도체", limit=20)
+        second, _, _ = search_reports(session, "반도체", limit=20, offset=next_offset)
+    assert len(first) == len(second) == 20
+    assert not {r["id"] for r in first} & {r["id"] for r in second}
+
+
+def test_api_reports_keep_report_price(fresh_db):
+    rows = make_rows(5)
+    for i, row in enumerate(rows):
+        row["current_price"] = 1_000 + i
+    db.save_reports(rows)
+    with db.engine.begin() as conn:
+        conn.execute(text("UPDATE stocks SET current_price = 99"))
+    items = app_client().get("/api/reports").json()["items"]
+    assert sorted(item["current_price"] for item in items) == [1_000 + i for i in range(5)]
+    assert all(item["stock_current_price"] == 99 for item in items)
+
+
+def test_name_search_helpers(fresh_db):
+    rows = make_rows(300)
+    db.save_reports(rows)
+    statements = []
+
+    def on_execute(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.read_engine, "before_cursor_execute", on_execute)
+    try:
+        for search, column in [(search_by_stock_name, "stock_name"), (search_by_broker, "broker_name"),
+                               (search_by_author, "author_name")]:
+            name = rows[0][column]
+            statements.clear()
+            out = io.StringIO()
+            with contextlib.redirect_stdout(out):
+                search(name)
+            expected = sum(name in row[column] for row in rows)
+            assert f"({expected}건)" in out.getvalue(), column
+            # JOIN은 joinedload가 붙인 종목/증권사/애널리스트/평가의견 4개뿐 (같은 표를 두 번 붙이지 않음)
+            assert len(statements) == 1 and statements[0].count("JOIN") == 4, statements
+    finally:
+        event.remove(db.read_engine, "before_cursor_execute", on_execute)
@@ -0,0 +1,167 @@
+# 목록 수집기: httpx.MockTransport(네트워크 없음)로 crawl() 동작 확인
+# 동시 요청 수 상한 / 재시도 / 요청 순서와 속도 제한 / 목록 끝·수집한 리포트에서 멈춤 / high-water mark / 중단 시 보존
+import asyncio
+import random
+from collections import Counter
+
+import httpx
+from sqlalchemy import text
+
+import db
+import scraper
+from tests.helpers import list_page_html
+
+PAGES = 30
+CONCURRENCY = 4
+RETRIES = 3
+RATE = 200.0
+FLAKY_PAGE, BROKEN_PAGE = 3, 7  # flaky: 처음 두 번 503 후 성공 / broken: 항상 500
+
+
+def mock_site(titles: list[str], broken: int | None = BROKEN_PAGE, no_idx_page: int | None = None,
+              delay: float = 0.03, charset: str | None = None) -> tuple[dict, dict]:
+    """
+    (요청 기록, crawl 옵션) - 옵션에 MockTransport와 적재 대신 행을 모으는 on_reports가 들어 있음.
+    charset을 주면 본문을 그 문자셋으로 인코딩하고 <meta charset>으로만 알림 (Content-Type에는 charset 없음)
+    """
+    rnd = random.Random(0)
+    seen = {"attempts": Counter(), "first_order": [], "starts": [], "in_flight": 0, "max_in_flight": 0, "rows": []}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        page_no = int(request.url.params["now_page"])
+        if not seen["attempts"][page_no]:
+            seen["first_order"].append(page_no)
+        seen["attempts"][page_no] += 1
+        seen["starts"].append(asyncio.get_running_loop().time())
+        seen["in_flight"] += 1
+        seen["max_in_flight"] = max(seen["max_in_flight"], seen["in_flight"])
+        try:
+            await asyncio.sleep(rnd.uniform(0, delay))  # 응답 순서가 요청 순서와 달라지도록
+            if page_no == broken or (page_no == FLAKY_PAGE and seen["attempts"][page_no] <= 2):
+                return httpx.Response(503 if page_no == FLAKY_PAGE else 500)
+            html = list_page_html(titles, page_no, PAGES)
+            if page_no == no_idx_page:  # 첨부 링크에 report_idx가 없는 페이지
+                html = html.replace("?report_idx=", "?report_no=")
+            if charset is None:
+                return httpx.Response(200, text=html)
+            html = html.replace("<head>", f'<head><meta charset="{charset}">', 1)
+            return httpx.Response(200, content=html.encode(charset), headers={"Content-Type": "text/html"})
+        finally:
+            seen["in_flight"] -= 1
+
+    def collect(batch: list[dict]) -> dict:
+        seen["rows"].extend(batch)
+        return {"inserted": len(batch), "skipped": 0}
+
+    return seen, {"concurrency": CONCURRENCY, "rate": RATE, "retries": RETRIES, "backoff": 0.01,
+                  "on_reports": collect, "transport": httpx.MockTransport(handler)}
+
+
+def run(titles: list[str], no_idx_page: int | None = None, **kwargs) -> tuple[dict, dict]:
+    seen, options = mock_site(titles, no_idx_page=no_idx_page)
+    return scraper.scrape("2025-01-01", "2025-12-31", PAGES + 10, **options, **kwargs), seen
+
+
+def report_idxs(rows: list[dict]) -> list[int]:
+    return [db.parse_report_idx(r["attachment_url"]) for r in rows]
+
+
+def test_full_crawl(titles):
+    stats, seen = run(titles)
+    attempts = seen["attempts"]
+    expected = {900_000 - n for n in range(PAGES * scraper.PAGE_SIZE)
+                if n // scraper.PAGE_SIZE + 1 != BROKEN_PAGE}
+    got = report_idxs(seen["rows"])
+
+    assert 1 < seen["max_in_flight"] <= CONCURRENCY
+    assert attempts[FLAKY_PAGE] == 3 and attempts[BROKEN_PAGE] == RETRIES + 1
+    assert stats["failed_pages"] == 1 and stats["pages"] == len(attempts) - 1
+    assert stats["reached_end"] and not stats["reached_known"]
+    # 페이지 번호는 순서대로 배정되지만 속도 제한을 함께 통과한 요청끼리는 전송 순서가 바뀔 수 있음 (동시 요청 수 이내)
+    order = seen["first_order"]
+    assert all(page_no > max(order[:i], default=0) - CONCURRENCY for i, page_no in enumerate(order)), order
+    assert max(attempts) <= PAGES + 1 + CONCURRENCY  # 빈 페이지 뒤로는 이미 요청 중이던 것만
+    span = seen["starts"][-1] - seen["starts"][0]
+    assert span >= 0.9 * (len(seen["starts"]) - 1) / RATE  # 전역 속도 제한 (초당 RATE회)
+    assert len(got) == len(set(got)) and set(got) == expected
+    assert stats["max_report_idx"] == 900_000
+
+
+def test_euc_kr_pages(titles):
+    # EUC-KR 페이지: 응답 헤더에 charset이 없어도 <meta charset>을 따라 읽어 UTF-8 페이지와 같은 행
+    rows = {}
+    for charset in (None, "euc-kr"):
+        seen, options = mock_site(titles, broken=None, charset=charset)
+        stats = scraper.scrape("2025-01-01", "2025-12-31", 3, **options)
+        assert stats["pages"] == 3 and stats["failed_pages"] == 0
+        rows[charset] = sorted(seen["rows"], key=lambda row: row["attachment_url"])
+    assert len(rows["euc-kr"]) == 3 * scraper.PAGE_SIZE and rows["euc-kr"] == rows[None]
+
+
+def test_stops_at_known_report(titles):
+    known = 900_000 - (9 * scraper.PAGE_SIZE + 10)  # 10페이지 중간
+    stats, seen = run(titles, known_report_idx=known)
+    got = report_idxs(seen["rows"])
+    assert stats["reached_known"] and all(idx > known for idx in got)
+    assert set(got) == {idx for idx in range(known + 1, 900_001)
+                        if (900_000 - idx) // scraper.PAGE_SIZE + 1 != BROKEN_PAGE}
+    assert max(seen["attempts"]) <= 10 + CONCURRENCY
+
+
+def test_rows_without_report_idx_are_not_known(titles):
+    # report_idx가 없는 행은 이미 수집한 것으로 보지 않음 (1페이지에서 멈추지 않고 적재)
+    known = 900_000 - (9 * scraper.PAGE_SIZE + 10)
+    _, baseline = run(titles, known_report_idx=known)
+    stats, seen = run(titles, no_idx_page=1, known_report_idx=known)
+    assert stats["no_report_idx"] == scraper.PAGE_SIZE
+    assert len(seen["rows"]) == len(baseline["rows"])
+    assert stats["reached_known"] and max(seen["attempts"]) >= 10
+
+
+def test_high_water_mark(titles, fresh_db):
+    # max_page에서 끊기면(수집한 리포트에 못 닿음) 유지, 닿으면 올림
+    source = "test_scraper"
+    with db.engine.begin() as conn:
+        conn.execute(text("DELETE FROM crawl_state WHERE source = :source"), {"source": source})
+    known = 900_000 - (5 * scraper.PAGE_SIZE + 10)  # 6페이지 중간
+    db.advance_high_water_mark(source, "2025-12-01", known)
+
+    _, options = mock_site(titles, broken=None)
+    stats = scraper.scrape_incremental(source, max_page=3, **options)
+    assert not stats["reached_known"] and db.get_high_water_mark(source)[1] == known
+
+    _, options = mock_site(titles, broken=None)
+    stats = scraper.scrape_incremental(source, max_page=PAGES, **options)
+    assert stats["reached_known"] and db.get_high_water_mark(source)[1] == 900_000
+
+
+def test_high_water_mark_kept_on_failed_page(titles, fresh_db):
+    source = "test_scraper_failed"
+    with db.engine.begin() as conn:
+        conn.execute(text("DELETE FROM crawl_state WHERE source = :source"), {"source": source})
+    known = 900_000 - (9 * scraper.PAGE_SIZE + 10)
+    db.advance_high_water_mark(source, "2025-12-01", known)
+    _, options = mock_site(titles)  # 7페이지는 재시도 후에도 실패
+    stats = scraper.scrape_incremental(source, max_page=PAGES, **options)
+    assert stats["failed_pages"] == 1 and db.get_high_water_mark(source)[1] == known
+
+
+def test_interrupted_crawl_keeps_committed_batches(titles, fresh_db):
+    # 중간에 중단돼도 그때까지 적재한 배치는 남아 있어야 함
+    _, options = mock_site(titles, broken=None, delay=0.05)
+    del options["on_reports"]  # 기본값 db.save_reports로 실제 적재
+    options["concurrency"] = 1
+
+    async def interrupted():
+        try:
+            await asyncio.wait_for(scraper.crawl("2025-01-01", "2025-12-31", PAGES + 1, batch_size=scraper.PAGE_SIZE,
+                                                 **options), timeout=0.5)
+        except asyncio.TimeoutError:
+            pass
+
+    asyncio.run(interrupted())
+    with db.engine.connect() as conn:
+        committed = conn.execute(text("SELECT report_idx FROM reports")).scalars().all()
+    assert 0 < len(committed) < PAGES * scraper.PAGE_SIZE
+    # 최신 페이지부터 빠짐없이 (앞 페이지의 일부만 남는 일 없음)
+    assert sorted(committed, reverse=True) == list(range(900_000, 900_000 - len(committed), -1))
@@ -0,0 +1,43 @@
+# 백그라운드 주가 갱신 스케줄러: 종료 시 진행 중인 갱신이 받은 결과를 반영하고 끝날 때까지 기다림
+import asyncio
+import contextlib
+import functools
+import io
+import time
+from datetime import date
+
+from sqlalchemy import text
+
+import db
+from services import PriceRefreshScheduler, update_stock_prices
+from tests.helpers import FakeBarSource, make_rows
+
+STOCKS = 20
+
+
+def test_stop_waits_for_running_refresh(fresh_db):
+    db.save_reports(make_rows(100, stocks=STOCKS))
+    source = FakeBarSource(date(2025, 6, 30), 0.05, 0.0)
+    scheduler = PriceRefreshScheduler(
+        functools.partial(update_stock_prices, source, ttl=None, force=True, max_workers=2, batch_size=2),
+    )
+
+    async def start_then_stop():
+        scheduler.start()
+        while source.calls < 4:  # 조회가 몇 개 끝난 뒤 종료
+            await asyncio.sleep(0.01)
+        await scheduler.stop()
+
+    with contextlib.redirect_stdout(io.StringIO()):  # 진행 로그 생략
+        asyncio.run(start_then_stop())
+    calls = source.calls
+    time.sleep(0.2)
+
+    # stop()이 돌아온 시점에 갱신 스레드는 끝났고, 중단 전까지 받은 결과는 반영돼 있음
+    assert source.calls == calls < STOCKS
+    assert not scheduler.running and scheduler.last_error is None
+    result = scheduler.last_result
+    assert 0 < result["updated"] < STOCKS
+    with db.engine.connect() as conn:
+        priced = conn.execute(text("SELECT COUNT(*) FROM stocks WHERE price_updated_at IS NOT NULL")).scalar_one()
+    assert priced == result["updated"]
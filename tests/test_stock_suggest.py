@@ -0,0 +1,41 @@
+# 종목 자동완성: 후보가 많은 접두어에서도 접두어 범위 전체에 순위를 매김
+import pytest
+
+import db
+import stock_suggest
+from tests.helpers import make_rows
+
+# "삼" / "00"으로 시작하는 상장 종목 800개 (예전 훑기 상한 500개보다 많게)
+LISTING = [(f"00{i:04d}", "삼" + chr(0xAC00 + i)) for i in range(800)]
+LATE = ("009999", "삼흥")  # 키 순서로는 맨 뒤 → 리포트가 있으므로 1위여야 함
+LONGER = [("100001", "삼가나다"), ("100002", "삼가나")]
+
+
+@pytest.fixture
+def index(fresh_db, monkeypatch):
+    monkeypatch.setattr(stock_suggest, "load_stock_listing", lambda: LISTING + LONGER + [LATE])
+    code, name = LATE
+    db.save_reports([{**make_rows(1)[0], "stock_code": code, "stock_name": name}])
+    index = stock_suggest.StockSuggestIndex()
+    index.build()
+    return index
+
+
+@pytest.mark.parametrize("q", ["삼", "ㅅ", "0", "00"])
+def test_stock_with_reports_ranks_first(index, q):
+    result = index.suggest(q)
+    assert len(result) == stock_suggest.SUGGEST_LIMIT
+    assert (result[0].code, result[0].name, result[0].has_reports) == (*LATE, True)
+
+
+def test_exact_match_first_then_shorter_names(index):
+    result = index.suggest("삼가")
+    assert [e.name for e in result] == ["삼가", "삼가나", "삼가나다"]
+
+
+def test_short_prefix_matches_full_ranking(index):
+    # 짧은 접두어는 빌드 때 매겨 둔 순위 → 범위 전체를 매긴 결과와 같아야 함
+    keys, entries, ranks, _ = index._index
+    for q in ["삼", "ㅅ", "0", "00", "삼가", "ㅅㄱ"]:
+        full = stock_suggest._ranked(keys, entries, ranks, q, stock_suggest.SUGGEST_MAX_LIMIT)
+        assert index.suggest(q, limit=stock_suggest.SUGGEST_MAX_LIMIT) == full
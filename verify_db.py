@@ -4,8 +4,8 @@ engine = create_engine("sqlite:///reports.db")
 
 with engine.connect() as conn:
     # Check for a report that should have review data (e.g., from 644830.pdf)
-    # We need to find the report with attachment_url containing '644830'
-    result = conn.execute(text("SELECT id, title, summary, novice_content, expert_content FROM reports WHERE attachment_url LIKE '%644830%'"))
+    # report_idx는 attachment_url의 report_idx 값 (인덱스 조회)
+    result = conn.execute(text("SELECT id, title, summary, novice_content, expert_content FROM reports WHERE report_idx = 644830"))
     row = result.fetchone()
     
     if row: